@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Latenz-Benchmark für alle Controller.
+
+Misst für jede Oberfläche die Zeit vom Tastendruck bis zum Hub, ohne
+Roboter. Zwei Hub-Varianten stehen zur Wahl:
+
+- loopback: SimulatedHub; gemessen wird bis zum Eintreffen des Befehlsrahmens
+- program:  main.py läuft im Simulator (hub_sim); gemessen wird bis zum
+            Motorbefehl, also einschließlich der Hauptschleife auf dem Hub
+
+Ergebnis je Oberfläche: Latenz (p50/p95/p99), Durchsatz und CPU-Zeit pro
+Befehl. Der Durchsatz zählt die angenommenen Befehle pro Sekunde am Eingang
+der Oberfläche; daneben steht, wie viele davon beim Hub ankamen und wie
+viele unterwegs zusammengefasst (oder verworfen) wurden. Die Ergebnisse werden als JSON gespeichert;
+mit --compare werden sie einem früheren Lauf gegenübergestellt:
+
+    uv run python src/benchmark.py --hub program --output bench.json
+    uv run python src/benchmark.py --compare bench.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import threading
+import time
+
+from hub_session import HubSession, SimulatedHub
+
+COUNT = 200            # Messungen pro Oberfläche
+INTERVAL = 0.08        # s zwischen zwei Messungen (über dem Takt des CommandScheduler)
+EVENT_TIMEOUT = 2.0    # s, nach denen ein Befehl als verloren gilt
+DRAIN_TIMEOUT = 0.5    # s ohne neue Ereignisse, nach denen die Zustellung als beendet gilt
+
+# Wechselnde Befehle, damit der CommandScheduler nichts zusammenfasst
+COMMANDS = ('w', 'a', 's', 'd')
+
+FRONTENDS = ('simple', 'gui', 'web-http', 'web-ws', 'keyboard')
+
+
+class Probe:
+    """Zählt Ereignisse am Hub (eingetroffene Rahmen bzw. Motorbefehle)."""
+
+    def __init__(self):
+        self.count = 0
+        self.last = None
+        self._cond = threading.Condition()
+
+    def mark(self, *args):
+        with self._cond:
+            self.count += 1
+            self.last = time.perf_counter()
+            self._cond.notify_all()
+
+    def wait_for(self, count, timeout=EVENT_TIMEOUT):
+        with self._cond:
+            return self._cond.wait_for(lambda: self.count >= count, timeout)
+
+
+def make_transport(kind, probe):
+    """Transport für HubSession, der jedes Ereignis an probe meldet."""
+    if kind == 'loopback':
+        class LoopbackHub(SimulatedHub):
+            def on_frame(self, opcode, seq, arg):
+                super().on_frame(opcode, seq, arg)
+                probe.mark()
+
+        async def transport():
+            return LoopbackHub(startup_delay=0)
+    else:
+        from hub_sim.transport import ProgramHub
+
+        async def transport():
+            return ProgramHub('main.py', on_actuation=probe.mark)
+    return transport
+
+
+# --- Oberflächen -------------------------------------------------------------
+
+class SkipFrontend(Exception):
+    """Die Oberfläche lässt sich in dieser Umgebung nicht messen."""
+
+
+class SimpleFrontend:
+    """simple_controller: Taste -> CommandScheduler -> HubSession.
+
+    send() gibt bei allen Oberflächen zurück, ob der Befehl angenommen wurde;
+    frames ist die Zahl der Ereignisse am Hub, die ein Befehl auslöst.
+    """
+
+    frames = 1
+
+    def connect(self, transport):
+        from simple_controller import SimpleRobotController
+        self.controller = SimpleRobotController(transport=transport)
+        return self.controller.session.connect()
+
+    def send(self, cmd):
+        return self.controller.send_to_robot(cmd)
+
+    def after_sample(self):
+        return False
+
+    def close(self):
+        self.controller.session.disconnect()
+
+
+class GuiFrontend:
+    """gui_controller: KeyPress/KeyRelease -> VelocityStreamer -> HubSession.
+
+    Ohne Display (z. B. im CI) wird der VelocityStreamer der GUI direkt
+    angesprochen; das Ergebnis enthält dann "tk": false. Drücken und
+    Loslassen erzeugen je einen Rahmen, gezählt wird einer pro Befehl.
+    """
+
+    frames = 2
+
+    def connect(self, transport):
+        import tkinter as tk
+        from gui_controller import RELEASE_DELAY, RobotGUI
+        try:
+            self.gui = RobotGUI(transport=transport)
+            self.gui.root.withdraw()
+            self.session = self.gui.session
+            self.streamer = self.gui.streamer
+            self.release_delay = RELEASE_DELAY / 1000
+            self.tk = True
+        except tk.TclError:
+            from drive_stream import VelocityStreamer
+            self.gui = None
+            self.session = HubSession(transport=transport)
+            self.streamer = VelocityStreamer(self.session)
+            self.tk = False
+        self._key = None
+        return self.session.connect()
+
+    def send(self, cmd):
+        # Nur Fahrtasten: Drücken ändert den Sollwert und erzeugt einen Rahmen
+        self._key = 'w' if cmd in 'ws' else 'a'
+        if self.gui:
+            self.gui.root.event_generate(f'<KeyPress-{self._key}>')
+            self.gui.root.update()
+            return True
+        return self.streamer.press(self._key)
+
+    def after_sample(self):
+        # Taste wieder loslassen (erzeugt ebenfalls einen Rahmen)
+        if self.gui:
+            self.gui.root.event_generate(f'<KeyRelease-{self._key}>')
+            time.sleep(self.release_delay)
+            self.gui.root.update()
+        else:
+            self.streamer.release(self._key)
+        return True
+
+    def close(self):
+        self.streamer.stop()
+        self.session.disconnect()
+        if self.gui:
+            self.gui.root.destroy()
+
+
+class WebHttpFrontend:
+    """web_controller per POST /api/command (Rückfall ohne WebSocket)."""
+
+    frames = 1
+
+    def connect(self, transport):
+        import web_controller
+        self.web = web_controller
+        web_controller.controller = web_controller.RobotController(transport=transport)
+        self.client = web_controller.app.test_client()
+        return self.client.post('/api/connect').status_code == 200
+
+    def send(self, cmd):
+        response = self.client.post('/api/command', json={'command': cmd, 'client': 'benchmark'})
+        return response.get_json()['success']
+
+    def after_sample(self):
+        return False
+
+    def close(self):
+        self.client.post('/api/disconnect')
+
+
+class WebSocketFrontend(WebHttpFrontend):
+    """web_controller über /ws mit echtem Server und WebSocket-Client."""
+
+    def connect(self, transport):
+        from simple_websocket import Client
+        from werkzeug.serving import make_server
+
+        if not super().connect(transport):
+            return False
+        self.server = make_server('127.0.0.1', 0, self.web.app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.ws = Client.connect(f'ws://127.0.0.1:{self.server.server_port}/ws?client=benchmark')
+        return True
+
+    def send(self, cmd):
+        # Ohne Antwort pro Befehl: gilt als angenommen, sobald er verschickt ist
+        self.ws.send(json.dumps({'type': 'command', 'command': cmd}))
+        return True
+
+    def close(self):
+        self.ws.close()
+        self.server.shutdown()
+        super().close()
+
+
+class KeyboardFrontend:
+    def connect(self, transport):
+        # keyboard_controller schickt Texte an eine EV3-Mailbox
+        # (pybricks.messaging); die Hub-Programme lesen aber Befehlsrahmen
+        # von stdin, es gibt also keinen Weg bis zum Hub
+        raise SkipFrontend("pybricks.messaging-Mailbox, von den Hub-Programmen nicht unterstützt")
+
+
+FRONTEND_CLASSES = {
+    'simple': SimpleFrontend,
+    'gui': GuiFrontend,
+    'web-http': WebHttpFrontend,
+    'web-ws': WebSocketFrontend,
+    'keyboard': KeyboardFrontend,
+}
+
+
+# --- Messung -----------------------------------------------------------------
+
+def percentiles(values):
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {
+        'p50': cuts[49],
+        'p95': cuts[94],
+        'p99': cuts[98],
+        'mean': statistics.fmean(values),
+        'max': max(values),
+    }
+
+
+def measure(frontend, probe, count=COUNT, interval=INTERVAL):
+    """Misst Latenz (einzeln, mit Pause) und Durchsatz (Befehle am Stück).
+
+    Der Durchsatz sind die angenommenen Befehle pro Sekunde, gemessen am
+    Eingang der Oberfläche. delivered zählt die beim Hub angekommenen
+    Befehle, merged die übrigen angenommenen.
+    """
+    latencies = []
+    timeouts = 0
+    cpu_start = time.process_time()
+    for i in range(count):
+        expected = probe.count + 1
+        start = time.perf_counter()
+        frontend.send(COMMANDS[i % len(COMMANDS)])
+        if probe.wait_for(expected):
+            latencies.append((probe.last - start) * 1000)
+        else:
+            timeouts += 1
+        if frontend.after_sample():
+            probe.wait_for(probe.count + 1)
+        time.sleep(interval)
+    cpu = time.process_time() - cpu_start
+
+    # Durchsatz: alle Befehle ohne Pause, danach zählen, was ankommt
+    first = probe.count
+    accepted = 0
+    start = time.perf_counter()
+    for i in range(count):
+        if frontend.send(COMMANDS[i % len(COMMANDS)]):
+            accepted += 1
+        frontend.after_sample()
+    duration = time.perf_counter() - start
+    while probe.wait_for(probe.count + 1, DRAIN_TIMEOUT):
+        pass
+    delivered = (probe.count - first) // frontend.frames
+
+    result = {
+        'samples': len(latencies),
+        'timeouts': timeouts,
+        'latency_ms': percentiles(latencies) if len(latencies) > 1 else None,
+        'throughput_cmd_s': accepted / duration if duration else 0.0,
+        'sent': count,
+        'accepted': accepted,
+        'delivered': delivered,
+        'merged': max(0, accepted - delivered),
+        'cpu_ms_per_command': cpu * 1000 / count,
+    }
+    if isinstance(frontend, GuiFrontend):
+        result['tk'] = frontend.tk
+    return result
+
+
+def run_benchmark(frontends, hub, count=COUNT, interval=INTERVAL):
+    results = {}
+    for name in frontends:
+        print(f"▶ {name} ...", flush=True)
+        probe = Probe()
+        frontend = FRONTEND_CLASSES[name]()
+        try:
+            if not frontend.connect(make_transport(hub, probe)):
+                results[name] = {'skipped': 'Verbindung fehlgeschlagen'}
+                continue
+        except SkipFrontend as e:
+            results[name] = {'skipped': str(e)}
+            continue
+        try:
+            results[name] = measure(frontend, probe, count, interval)
+        finally:
+            frontend.close()
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'hub': hub,
+        'count': count,
+        'results': results,
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"\nHub: {report['hub']}, {report['count']} Befehle pro Oberfläche\n")
+    print(f"{'Oberfläche':<10} {'p50':>8} {'p95':>8} {'p99':>8} {'Befehle/s':>10} "
+          f"{'angekommen':>10} {'zusammengef.':>12} {'CPU/Befehl':>11}")
+    for name, result in report['results'].items():
+        if 'skipped' in result:
+            print(f"{name:<10} übersprungen: {result['skipped']}")
+            continue
+        latency = result['latency_ms'] or {'p50': 0, 'p95': 0, 'p99': 0}
+        line = (f"{name:<10} {latency['p50']:7.2f}ms {latency['p95']:7.2f}ms "
+                f"{latency['p99']:7.2f}ms {result['throughput_cmd_s']:10.1f} "
+                f"{result['delivered']:10d} {result['merged']:12d} "
+                f"{result['cpu_ms_per_command']:9.2f}ms")
+        old = (baseline or {}).get('results', {}).get(name, {}).get('latency_ms')
+        if old and result['latency_ms']:
+            change = (latency['p95'] - old['p95']) / old['p95'] * 100 if old['p95'] else 0
+            line += f"   p95 {change:+.0f}% gegenüber Vergleichslauf"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latenz-Benchmark der Controller")
+    parser.add_argument('--hub', choices=('loopback', 'program'), default='loopback',
+                        help="loopback: bis zum Rahmen; program: bis zum Motorbefehl in main.py")
+    parser.add_argument('--frontends', default=','.join(FRONTENDS),
+                        help="kommagetrennt, Standard: %(default)s")
+    parser.add_argument('--count', type=int, default=COUNT)
+    parser.add_argument('--interval', type=float, default=INTERVAL)
+    parser.add_argument('--output', help="Ergebnis als JSON speichern")
+    parser.add_argument('--compare', help="früheres JSON-Ergebnis zum Vergleich")
+    args = parser.parse_args()
+
+    frontends = [name.strip() for name in args.frontends.split(',') if name.strip()]
+    for name in frontends:
+        if name not in FRONTEND_CLASSES:
+            parser.error(f"unbekannte Oberfläche: {name}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    report = run_benchmark(frontends, args.hub, args.count, args.interval)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Gespeichert in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Befehlshistorie der Controller.
+
+CommandHistory ist ein Ringpuffer fester Größe: neue Einträge überschreiben
+die ältesten, der Speicherbedarf bleibt also auch bei tagelangem Betrieb
+gleich. Jeder Eintrag bekommt eine fortlaufende Sequenznummer, damit ein
+Client mit since() nur die Einträge abholen kann, die er noch nicht kennt.
+"""
+
+import threading
+import time
+
+CAPACITY = 256
+
+
+class CommandHistory:
+    """Ringpuffer für gesendete Befehle (thread-sicher)."""
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._next_seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._next_seq, self.capacity)
+
+    @property
+    def last_seq(self):
+        """Sequenznummer des neuesten Eintrags (-1, solange die Historie leer ist)."""
+        return self._next_seq - 1
+
+    def append(self, command, **fields):
+        """Trägt einen Befehl ein und gibt den neuen Eintrag zurück.
+
+        Der Eintrag enthält Sequenznummer, Befehl, Uhrzeit zur Anzeige,
+        time.monotonic_ns() sowie alle zusätzlich übergebenen Felder.
+        """
+        entry = {
+            'command': command,
+            'time': time.strftime('%H:%M:%S'),
+            'ns': time.monotonic_ns(),
+            **fields,
+        }
+        with self._lock:
+            entry['seq'] = self._next_seq
+            self._items[self._next_seq % self.capacity] = entry
+            self._next_seq += 1
+        return entry
+
+    def _range(self, start):
+        # Einträge ab Sequenznummer start bis zum neuesten; Lock wird gehalten
+        start = max(start, self._next_seq - self.capacity, 0)
+        items = self._items
+        capacity = self.capacity
+        return [items[seq % capacity] for seq in range(start, self._next_seq)]
+
+    def last(self, n):
+        """Die neuesten n Einträge, ältester zuerst."""
+        with self._lock:
+            return self._range(self._next_seq - n)
+
+    def since(self, seq):
+        """Alle noch vorhandenen Einträge mit einer Sequenznummer größer als seq."""
+        with self._lock:
+            return self._range(seq + 1)
@@ -0,0 +1,142 @@
+"""
+Gemeinsamer Sende-Takt für die Einzelbefehle der Controller.
+
+Hält man eine Taste gedrückt, liefert das Betriebssystem 30 und mehr
+Wiederholungen pro Sekunde. CommandScheduler sitzt zwischen Controller und
+HubSession und sorgt dafür, dass davon nur so viel beim Hub ankommt, wie die
+Bluetooth-Verbindung sinnvoll tragen kann:
+
+- Stop ('x') wird sofort gesendet und verwirft alle wartenden Befehle.
+- Gleiche Befehle kurz hintereinander werden zusammengefasst.
+- Von den Lenkbefehlen ('a', 'd', '0') zählt nur der letzte.
+- Insgesamt werden höchstens MAX_RATE Befehle pro Sekunde gesendet.
+- Unbekannte Befehle werden abgelehnt.
+
+Die Zähler (gesendet, zusammengefasst, verworfen, abgelehnt, fehlgeschlagen)
+liefert stats().
+"""
+
+import threading
+import time
+
+from protocol import COMMAND_OPCODES
+
+MAX_RATE = 20            # Befehle pro Sekunde
+REPEAT_INTERVAL = 0.25   # s, in denen ein gleicher Befehl nicht erneut gesendet wird
+MAX_PENDING = 8          # wartende Befehle, danach wird verworfen
+
+STOP_COMMANDS = ('x', ' ')
+
+# Befehle, von denen jeweils nur der neueste wartet
+SLOTS = {
+    'a': 'steering',
+    'd': 'steering',
+    '0': 'steering',
+}
+
+
+class CommandScheduler:
+    """Fasst Befehle zusammen und begrenzt die Senderate."""
+
+    def __init__(self, session, max_rate=MAX_RATE, repeat_interval=REPEAT_INTERVAL):
+        self.session = session
+        self.interval = 1 / max_rate
+        self.repeat_interval = repeat_interval
+
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self.rejected = 0         # unbekannte Befehle
+        self.failed = 0           # von der Sitzung nicht angenommen
+
+        self._pending = {}        # Slot -> Befehl, in Eingangsreihenfolge
+        self._next_send = 0.0     # frühester Zeitpunkt für den nächsten Befehl
+        self._last_cmd = None
+        self._last_time = 0.0
+        self._flush_scheduled = False
+        self._lock = threading.Lock()
+
+    def submit(self, cmd):
+        """Nimmt einen Befehl an. Gibt False zurück, wenn der Befehl unbekannt
+        ist, keine Verbindung besteht oder das sofortige Senden scheitert.
+
+        Während eine getrennte Verbindung wiederhergestellt wird (siehe
+        reconnect.py), werden Befehle weiter angenommen.
+        """
+        if not self.session.available:
+            return False
+
+        with self._lock:
+            if cmd not in COMMAND_OPCODES:
+                self.rejected += 1
+                return False
+
+            now = time.monotonic()
+
+            if cmd in STOP_COMMANDS:
+                self.dropped += len(self._pending)
+                self._pending.clear()
+                return self._send(cmd, now)
+
+            slot = SLOTS.get(cmd, cmd)
+            if slot in self._pending:
+                self._pending[slot] = cmd
+                self.merged += 1
+                return True
+            if cmd == self._last_cmd and now - self._last_time < self.repeat_interval:
+                self.merged += 1
+                return True
+            if len(self._pending) >= MAX_PENDING:
+                self.dropped += 1
+                return True
+
+            if not self._pending and now >= self._next_send:
+                # Leitung frei: ohne Verzögerung senden
+                return self._send(cmd, now)
+            self._pending[slot] = cmd
+            self._schedule_flush(now)
+        return True
+
+    def _send(self, cmd, now):
+        if not self.session.send_command(cmd):
+            self.failed += 1
+            return False
+        self.sent += 1
+        self._last_cmd = cmd
+        self._last_time = now
+        self._next_send = max(now, self._next_send) + self.interval
+        return True
+
+    def _schedule_flush(self, now):
+        if self._flush_scheduled:
+            return
+        self._flush_scheduled = True
+        delay = max(0.0, self._next_send - now)
+        loop = self.session.loop_thread.loop
+        loop.call_soon_threadsafe(loop.call_later, delay, self._flush)
+
+    def _flush(self):
+        # Läuft im Loop-Thread der Sitzung
+        with self._lock:
+            self._flush_scheduled = False
+            if not self._pending:
+                return
+            now = time.monotonic()
+            if now >= self._next_send:
+                slot = next(iter(self._pending))
+                self._send(self._pending.pop(slot), now)
+            if self._pending:
+                self._schedule_flush(now)
+
+    def stats(self):
+        """Zähler für gesendete, zusammengefasste, verworfene, abgelehnte und
+        fehlgeschlagene Befehle."""
+        with self._lock:
+            return {
+                'sent': self.sent,
+                'merged': self.merged,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'failed': self.failed,
+                'pending': len(self._pending),
+            }
@@ -0,0 +1,110 @@
+"""
+Kontinuierlicher Fahrmodus auf dem Mac.
+
+VelocityStreamer übersetzt gehaltene Tasten in Soll-Geschwindigkeiten und
+schickt sie in festem Takt über eine HubSession. Auf dem Hub setzt
+hub_drive.py die Werte mit Motor.run() um und stoppt von selbst, sobald die
+Updates ausbleiben – ein "klemmender" Befehl kann den Roboter also nicht
+unkontrolliert weiterfahren lassen.
+"""
+
+import asyncio
+
+from protocol import (
+    OP_DRIVE_SPEED, OP_STEER_ANGLE, OP_ARM_ROTATE_SPEED, OP_ARM_LIFT_SPEED,
+    OP_WATCHDOG,
+)
+
+STREAM_RATE = 10         # Updates pro Sekunde
+WATCHDOG_TIMEOUT = 300   # ms, nach denen der Hub ohne Update stoppt
+
+# Werte wie in main.py
+DRIVE_SPEED = 500
+STEERING_ANGLE = 45
+ARM_ROTATE_SPEED = 300
+ARM_LIFT_SPEED = 300
+
+# Taste -> (Achse, Beitrag zum Sollwert)
+KEY_TARGETS = {
+    'w': (OP_DRIVE_SPEED, DRIVE_SPEED),
+    's': (OP_DRIVE_SPEED, -DRIVE_SPEED),
+    'a': (OP_STEER_ANGLE, -STEERING_ANGLE),
+    'd': (OP_STEER_ANGLE, STEERING_ANGLE),
+    'i': (OP_ARM_LIFT_SPEED, ARM_LIFT_SPEED),
+    'k': (OP_ARM_LIFT_SPEED, -ARM_LIFT_SPEED),
+    'j': (OP_ARM_ROTATE_SPEED, -ARM_ROTATE_SPEED),
+    'l': (OP_ARM_ROTATE_SPEED, ARM_ROTATE_SPEED),
+}
+
+AXES = (OP_DRIVE_SPEED, OP_STEER_ANGLE, OP_ARM_ROTATE_SPEED, OP_ARM_LIFT_SPEED)
+
+# Achsen, die der Hub-Watchdog überwacht und die deshalb wiederholt werden
+SPEED_AXES = (OP_DRIVE_SPEED, OP_ARM_ROTATE_SPEED, OP_ARM_LIFT_SPEED)
+
+
+class VelocityStreamer:
+    """Schickt die Sollwerte gehaltener Tasten in festem Takt an den Hub.
+
+    Änderungen gehen sofort raus; solange eine Geschwindigkeit ungleich 0
+    ist, wird sie zusätzlich STREAM_RATE-mal pro Sekunde wiederholt, damit
+    der Watchdog auf dem Hub nicht auslöst.
+    """
+
+    def __init__(self, session, rate=STREAM_RATE, watchdog=WATCHDOG_TIMEOUT):
+        self.session = session
+        self.period = 1 / rate
+        self.watchdog = watchdog
+        self.targets = dict.fromkeys(AXES, 0)
+        self._pressed = set()
+        self._future = None
+
+    def press(self, key):
+        """Taste gedrückt. Gibt True zurück, wenn die Taste neu gedrückt wurde."""
+        if key not in KEY_TARGETS or key in self._pressed:
+            return False
+        self._pressed.add(key)
+        self._update()
+        return True
+
+    def release(self, key):
+        """Taste losgelassen."""
+        if key in self._pressed:
+            self._pressed.discard(key)
+            self._update()
+
+    def clear(self):
+        """Lässt alle Tasten los, z. B. nach einem Stop-Befehl."""
+        self._pressed.clear()
+        self._update()
+
+    def _update(self):
+        targets = dict.fromkeys(AXES, 0)
+        for key in self._pressed:
+            axis, value = KEY_TARGETS[key]
+            targets[axis] += value
+
+        changed = [axis for axis in AXES if targets[axis] != self.targets[axis]]
+        self.targets = targets
+        for axis in changed:
+            self.session.send_frame(axis, targets[axis])
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.period)
+            targets = self.targets
+            for axis in SPEED_AXES:
+                if targets[axis]:
+                    self.session.send_frame(axis, targets[axis])
+
+    def start(self):
+        """Startet das periodische Senden (nach dem Verbinden aufrufen)."""
+        if self._future is None:
+            self.session.send_frame(OP_WATCHDOG, self.watchdog)
+            self._future = self.session.loop_thread.submit(self._run())
+
+    def stop(self):
+        """Beendet das periodische Senden und setzt alle Sollwerte auf 0."""
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+        self.clear()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Mehrere Roboter aus einem Prozess steuern.
+
+Fleet hält je Hub, angesprochen über seinen Bluetooth-Namen, eine
+HubSession mit ReconnectSupervisor und CommandScheduler. Alle Sitzungen
+teilen sich den asyncio-Loop aus hub_session.py; es gibt also keinen
+Thread pro Roboter, auch nicht bei Dutzenden simulierter Hubs.
+
+- connect() verbindet alle Hubs gleichzeitig; nur die Bluetooth-Suche
+  läuft nacheinander, da sich gleichzeitige Scans gegenseitig stören
+- send_command(name, cmd) schickt einen Befehl an einen Roboter,
+  broadcast(cmd) an alle, z. B. 'x' als Stopp für die ganze Flotte
+- health() liefert je Hub Verbindungszustand, Antwortzeiten,
+  Wiederverbindungen und wie lange er nichts mehr gemeldet hat
+
+Kommandozeile (im Ordner src/):
+    python fleet.py buggy1 buggy2          # echte Hubs
+    python fleet.py --simulator 30         # 30 simulierte Hubs
+"""
+
+import asyncio
+import threading
+import time
+
+from command_scheduler import CommandScheduler
+from hub_session import DEFAULT_PROGRAM, HubSession, SimulatedHub, ble_transport, shared_loop
+from reconnect import ReconnectSupervisor
+
+CONNECT_TIMEOUT = 30.0   # s pro Hub
+
+
+class FleetMember:
+    """Ein Roboter der Flotte: Sitzung, Wiederverbinden und Sende-Takt."""
+
+    def __init__(self, name, session):
+        self.name = name
+        self.session = session
+        self.supervisor = ReconnectSupervisor(session)
+        self.scheduler = CommandScheduler(session)
+        self.last_seen = None   # time.monotonic() der letzten Ausgabe des Hubs
+        session.events.subscribe(self._on_event)
+
+    def _on_event(self, event):
+        self.last_seen = time.monotonic()
+
+    @property
+    def state(self):
+        if self.session.connected:
+            return 'connected'
+        if self.supervisor.reconnecting:
+            return 'reconnecting'
+        return 'disconnected'
+
+    def health(self, now=None):
+        """Zustand, Verbindungs- und Sende-Statistik dieses Roboters."""
+        now = time.monotonic() if now is None else now
+        return {
+            'state': self.state,
+            'silent_s': None if self.last_seen is None else now - self.last_seen,
+            'connect_ms': None if self.session.connect_time is None else self.session.connect_time * 1000,
+            'link': self.session.acks.stats(),
+            'reconnect': self.supervisor.stats(),
+            'scheduler': self.scheduler.stats(),
+        }
+
+
+class Fleet:
+    """Roboter nach Hub-Namen (thread-sicher)."""
+
+    def __init__(self, program=DEFAULT_PROGRAM, loop_thread=None):
+        self.program = program
+        self.loop_thread = loop_thread or shared_loop()
+        self._members = {}
+        self._lock = threading.Lock()
+        self._scan_lock = None   # asyncio.Lock, wird im Loop-Thread angelegt
+
+    def add(self, name, transport=None, program=None):
+        """Nimmt den Hub name auf (noch ohne zu verbinden) und gibt ihn zurück.
+
+        transport wie bei HubSession; ohne Angabe wird per Bluetooth gesucht.
+        """
+        session = HubSession(program=program or self.program, hub_name=name,
+                             transport=transport or (lambda: self._scan(name)),
+                             loop_thread=self.loop_thread)
+        member = FleetMember(name, session)
+        with self._lock:
+            if name in self._members:
+                raise ValueError(f"Roboter {name!r} gibt es schon")
+            self._members[name] = member
+        return member
+
+    def remove(self, name):
+        """Trennt den Hub name und nimmt ihn aus der Flotte."""
+        with self._lock:
+            member = self._members.pop(name)
+        member.session.disconnect()
+
+    async def _scan(self, name):
+        if self._scan_lock is None:
+            self._scan_lock = asyncio.Lock()
+        async with self._scan_lock:
+            return await ble_transport(name)
+
+    def __getitem__(self, name):
+        return self._members[name]
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def __len__(self):
+        return len(self._members)
+
+    @property
+    def names(self):
+        return sorted(self._members)
+
+    def _select(self, names):
+        with self._lock:
+            if names is None:
+                return list(self._members.values())
+            return [self._members[name] for name in names]
+
+    # --- Verbinden -----------------------------------------------------------
+
+    def connect(self, names=None, timeout=CONNECT_TIMEOUT):
+        """Verbindet die Hubs names (ohne Angabe: alle) gleichzeitig.
+
+        Gibt ein Dictionary Name -> True/False zurück.
+        """
+        members = self._select(names)
+        return self.loop_thread.call(self._connect_all(members, timeout), timeout + 10)
+
+    async def _connect_all(self, members, timeout):
+        async def connect(member):
+            if member.session.connected:
+                return True
+            try:
+                await asyncio.wait_for(member.session._connect(timeout), timeout + 5)
+                return True
+            except Exception as e:
+                print(f"{member.name}: Verbindungsfehler: {e}")
+                return False
+
+        results = await asyncio.gather(*(connect(member) for member in members))
+        return {member.name: ok for member, ok in zip(members, results)}
+
+    def disconnect(self, names=None):
+        """Trennt die Hubs names (ohne Angabe: alle)."""
+        members = self._select(names)
+        for member in members:
+            member.supervisor.cancel()
+        self.loop_thread.call(self._disconnect_all(members), 15)
+
+    async def _disconnect_all(self, members):
+        await asyncio.gather(*(member.session._disconnect() for member in members),
+                             return_exceptions=True)
+
+    # --- Befehle -------------------------------------------------------------
+
+    def send_command(self, name, cmd):
+        """Schickt cmd an den Roboter name. Gibt False ohne Verbindung zurück."""
+        return self[name].scheduler.submit(cmd)
+
+    def broadcast(self, cmd, names=None):
+        """Schickt cmd an alle Roboter (bzw. names); gibt Name -> angenommen zurück.
+
+        Hier werden die Befehle nur eingeplant, gesendet wird in den
+        Writer-Tasks aller Sitzungen gleichzeitig.
+        """
+        return {member.name: member.scheduler.submit(cmd) for member in self._select(names)}
+
+    def health(self):
+        """health() aller Roboter nach Namen."""
+        now = time.monotonic()
+        return {member.name: member.health(now) for member in self._select(None)}
+
+
+def simulated_fleet(count, link_latency=0.0):
+    """Flotte aus count SimulatedHubs (robot-1, robot-2, ...)."""
+    fleet = Fleet()
+    for i in range(1, count + 1):
+        async def transport():
+            return SimulatedHub(link_latency=link_latency)
+        fleet.add(f'robot-{i}', transport=transport)
+    return fleet
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mehrere Roboter verbinden und gemeinsam stoppen")
+    parser.add_argument('names', nargs='*', help="Bluetooth-Namen der Hubs")
+    parser.add_argument('--simulator', type=int, metavar='ANZAHL',
+                        help="so viele simulierte Hubs statt echter Roboter")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="simulierte Funk-Latenz in Sekunden")
+    parser.add_argument('--rounds', type=int, default=20,
+                        help="Anzahl Stopp-Befehle an die ganze Flotte")
+    args = parser.parse_args()
+
+    if args.simulator:
+        fleet = simulated_fleet(args.simulator, args.latency)
+    elif args.names:
+        fleet = Fleet()
+        for name in args.names:
+            fleet.add(name)
+    else:
+        parser.error("Hub-Namen oder --simulator angeben")
+
+    start = time.perf_counter()
+    results = fleet.connect()
+    print(f"{sum(results.values())}/{len(results)} Hubs verbunden in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    fan_out = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        fleet.broadcast('x')
+        fan_out.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.05)
+    time.sleep(0.2)   # letzte Bestätigungen abwarten
+
+    print(f"Stopp an alle: {max(fan_out):.2f} ms zum Einplanen (max), "
+          f"{threading.active_count()} Threads im Prozess")
+    print(f"{'Hub':<12} {'Zustand':<13} {'RTT p50':>9} {'RTT p95':>9} {'verloren':>9}")
+    for name, health in fleet.health().items():
+        link = health['link']
+        p50 = '-' if link['rtt_p50_ms'] is None else f"{link['rtt_p50_ms']:.2f}ms"
+        p95 = '-' if link['rtt_p95_ms'] is None else f"{link['rtt_p95_ms']:.2f}ms"
+        print(f"{name:<12} {health['state']:<13} {p50:>9} {p95:>9} {link['lost']:>9}")
+    fleet.disconnect()
+
+
+if __name__ == '__main__':
+    main()
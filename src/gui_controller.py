@@ -3,29 +3,118 @@
 Grafisches Interface für Lego Mindstorms Roboter-Steuerung.
 
 Klicke auf Buttons oder nutze die Tastatur (WASD/IJKL).
+
+Tk ist nicht thread-sicher: Widgets werden nur im Tk-Thread angefasst.
+Verbindungsaufbau und Hub-Ausgaben laufen in anderen Threads und reichen
+ihre Änderungen mit post() an eine Queue weiter, die der Tk-Thread in jedem
+UI-Frame (alle UI_INTERVAL ms) abarbeitet. Gesendet wird ohnehin nicht im
+Tk-Thread, sondern von der Writer-Task der HubSession. Die Telemetrie
+landet im Dashboard (siehe gui_dashboard.py), das nur wenige Male pro
+Sekunde neu zeichnet; die Zeitmessung der Frames steht unten im Fenster.
 """
 
+import collections
+import queue
 import tkinter as tk
 from tkinter import ttk
-import subprocess
 import threading
 import time
 
+from command_scheduler import CommandScheduler
+from drive_stream import VelocityStreamer
+from gui_dashboard import Dashboard, DistanceHistory
+from hub_events import EVENT_DISTANCE, EVENT_REFLEX, EVENT_TELEMETRY, EVENT_WATCHDOG
+from hub_session import HubSession
+from protocol import OP_TELEMETRY
+from reconnect import ReconnectSupervisor
+
+# Bei gehaltener Taste schickt das Betriebssystem Release/Press-Paare
+# (Auto-Repeat). Das Loslassen wird deshalb kurz verzögert ausgewertet.
+RELEASE_DELAY = 40   # ms
+LINK_CHECK_INTERVAL = 500   # ms zwischen zwei Prüfungen der Verbindung
+
+UI_INTERVAL = 16     # ms zwischen zwei UI-Frames (ca. 60 pro Sekunde)
+UI_BUDGET = 8        # ms, die ein Frame höchstens mit der Queue verbringt
+FRAME_WINDOW = 120   # Frames, über die die Zeitmessung mittelt
+FRAME_REPORT = 60    # Frames zwischen zwei Anzeigen der Zeitmessung
+TELEMETRY_RATE = 50  # Telemetrie-Zeilen pro Sekunde
+LOG_LINES = 200      # Zeilen, die das Log behält
+
+COMMAND_NAMES = {
+    'w': '⬆️ Vorwärts', 's': '⬇️ Rückwärts',
+    'a': '⬅️ Links', 'd': '➡️ Rechts',
+    'i': '⬆️ Arm hoch', 'k': '⬇️ Arm runter',
+    'j': '↪️ Arm links', 'l': '↩️ Arm rechts',
+    '0': '🎯 Zentrum', 'x': '🛑 Stop', 'm': '📏 Abstand'
+}
+
+
+class FrameTimer:
+    """Misst Abstand und Arbeitszeit der UI-Frames in ms."""
+    
+    def __init__(self, interval=UI_INTERVAL, window=FRAME_WINDOW):
+        self.interval = interval
+        self.frames = 0
+        self._periods = collections.deque(maxlen=window)
+        self._work = collections.deque(maxlen=window)
+        self._last = None
+    
+    def begin(self):
+        """Beginn eines Frames; gibt den Startzeitpunkt für end() zurück."""
+        now = time.perf_counter()
+        if self._last is not None:
+            self._periods.append((now - self._last) * 1000)
+        self._last = now
+        self.frames += 1
+        return now
+    
+    def end(self, started):
+        self._work.append((time.perf_counter() - started) * 1000)
+    
+    def stats(self):
+        """Median und Maximum von Frame-Abstand und Arbeitszeit, verspätete Frames."""
+        periods = sorted(self._periods)
+        work = sorted(self._work)
+        if not periods:
+            return None
+        return {
+            'frames': self.frames,
+            'period_p50_ms': periods[len(periods) // 2],
+            'period_max_ms': periods[-1],
+            'work_p50_ms': work[len(work) // 2],
+            'work_max_ms': work[-1],
+            # Frames, die mehr als doppelt so lange auf sich warten ließen wie geplant
+            'late': sum(1 for period in periods if period > 2 * self.interval),
+        }
+
 
 class RobotGUI:
     """Grafisches Interface für Roboter-Steuerung."""
     
-    def __init__(self):
+    def __init__(self, transport=None):
         self.root = tk.Tk()
         self.root.title("🤖 Lego Mindstorms Steuerung")
-        self.root.geometry("800x600")
+        self.root.geometry("840x860")
         self.root.configure(bg='#2c3e50')
         
-        self.process = None
-        self.connected = False
+        self.session = HubSession(transport=transport)
+        self.supervisor = ReconnectSupervisor(self.session)
+        self.streamer = VelocityStreamer(self.session)
+        self.scheduler = CommandScheduler(self.session)
+        self._release_timers = {}
+        
+        # Änderungen aus anderen Threads, im Tk-Thread ausgeführt
+        self._ui_queue = queue.SimpleQueue()
+        self._telemetry = None   # neuester Telemetrie-Wert
+        self.distance_history = DistanceHistory()
+        self.frame_timer = FrameTimer()
+        self.session.events.subscribe(self._on_telemetry, EVENT_TELEMETRY)
+        self.session.events.subscribe(self._on_hub_event, EVENT_DISTANCE, EVENT_REFLEX, EVENT_WATCHDOG)
         
         self.create_widgets()
         self.bind_keys()
+        self.root.after(LINK_CHECK_INTERVAL, self.watch_link)
+        self.root.after(UI_INTERVAL, self.process_ui_queue)
         
     def create_widgets(self):
         """Erstellt alle UI-Elemente."""
@@ -222,6 +311,10 @@ class RobotGUI:
             command=lambda: self.send_command('m')
         ).grid(row=0, column=2, padx=10)
         
+        # Dashboard: Abstandsverlauf und Motoren
+        self.dashboard = Dashboard(self.root, self.distance_history)
+        self.dashboard.canvas.pack(pady=5)
+        
         # Log
         self.log_text = tk.Text(
             self.root,
@@ -233,76 +326,167 @@ class RobotGUI:
         )
         self.log_text.pack(pady=10)
         
+        # Zeitmessung der UI-Frames
+        self.frame_label = tk.Label(
+            self.root,
+            text="",
+            font=("Courier", 9),
+            bg='#2c3e50',
+            fg='#95a5a6'
+        )
+        self.frame_label.pack()
+        
     def bind_keys(self):
-        """Bindet Tastatur-Shortcuts."""
-        keys = 'wasdijkl0xm'
-        for key in keys:
+        """Bindet Tastatur-Shortcuts.
+        
+        WASD/IJKL fahren im kontinuierlichen Modus, solange die Taste
+        gehalten wird. 0, X und M senden Einzelbefehle.
+        """
+        for key in 'wasdijkl':
+            for k in (key, key.upper()):
+                self.root.bind(f'<KeyPress-{k}>', lambda e, k=key: self.key_down(k))
+                self.root.bind(f'<KeyRelease-{k}>', lambda e, k=key: self.key_up(k))
+        for key in '0xm':
             self.root.bind(key, lambda e, k=key: self.send_command(k))
             self.root.bind(key.upper(), lambda e, k=key: self.send_command(k))
     
+    def key_down(self, key):
+        """Taste gedrückt: Sollwert an den Hub streamen."""
+        timer = self._release_timers.pop(key, None)
+        if timer is not None:
+            # Auto-Repeat - Taste wurde gar nicht losgelassen
+            self.root.after_cancel(timer)
+            return
+        if not self.session.available:
+            self.log("⚠️  Nicht verbunden!")
+            return
+        if self.streamer.press(key):
+            self.log(f"📤 {COMMAND_NAMES.get(key, key)}")
+    
+    def key_up(self, key):
+        """Taste losgelassen (verzögert wegen Auto-Repeat)."""
+        self._release_timers[key] = self.root.after(RELEASE_DELAY, self._release_key, key)
+    
+    def _release_key(self, key):
+        self._release_timers.pop(key, None)
+        self.streamer.release(key)
+    
     def log(self, message):
-        """Fügt Nachricht zum Log hinzu."""
+        """Fügt Nachricht zum Log hinzu; es behält nur die letzten LOG_LINES Zeilen."""
         self.log_text.insert('end', message + '\n')
+        lines = int(self.log_text.index('end-1c').split('.')[0]) - 1
+        if lines > LOG_LINES:
+            self.log_text.delete('1.0', f'{lines - LOG_LINES + 1}.0')
         self.log_text.see('end')
     
+    def post(self, action, *args):
+        """Führt action(*args) im nächsten UI-Frame im Tk-Thread aus (aus jedem Thread)."""
+        self._ui_queue.put((action, args))
+    
+    def process_ui_queue(self):
+        """Ein UI-Frame: Queue abarbeiten und Telemetrie anzeigen (läuft im Tk-Thread).
+        
+        Bleibt mehr liegen, als in UI_BUDGET passt, geht es im nächsten Frame
+        weiter, damit Tastendrücke dazwischen nicht warten müssen.
+        """
+        started = self.frame_timer.begin()
+        deadline = started + UI_BUDGET / 1000
+        while time.perf_counter() < deadline:
+            try:
+                action, args = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            action(*args)
+        
+        self.dashboard.render(self._telemetry)
+        if self.frame_timer.frames % FRAME_REPORT == 0:
+            self.show_frame_stats()
+        self.frame_timer.end(started)
+        self.root.after(UI_INTERVAL, self.process_ui_queue)
+    
+    def _on_telemetry(self, event):
+        # Loop-Thread: Abstand in den Verlauf, für die Motoranzeigen zählt
+        # nur der neueste Wert
+        self.distance_history.add(event['time'], event['distance'])
+        self._telemetry = event
+    
+    def _on_hub_event(self, event):
+        # Loop-Thread
+        kind = event['type']
+        if kind == EVENT_REFLEX:
+            self.post(self.log, f"🛑 Hindernis in {event['distance']} mm - gebremst")
+        elif kind == EVENT_WATCHDOG:
+            self.post(self.log, "⏱️  Watchdog: Motoren gestoppt")
+        elif event['distance'] is not None:
+            self.post(self.log, f"📏 Abstand: {event['distance']} mm")
+    
+    def show_frame_stats(self):
+        stats = self.frame_timer.stats()
+        if stats is None:
+            return
+        self.frame_label.config(
+            text=f"UI-Frames: alle {stats['period_p50_ms']:.0f} ms (max {stats['period_max_ms']:.0f}), "
+                 f"Arbeit {stats['work_p50_ms']:.2f} ms (max {stats['work_max_ms']:.1f}), "
+                 f"{stats['late']} verspätet | Telemetrie: {self.distance_history.samples} Werte, "
+                 f"{self.dashboard.renders}× gezeichnet")
+    
     def connect_robot(self):
-        """Verbindet mit dem Roboter."""
+        """Verbindet mit dem Roboter, ohne das Fenster zu blockieren."""
         self.status_label.config(text="⏳ Verbinde...", bg='#f39c12')
         self.connect_btn.config(state='disabled')
         self.log("🔍 Suche nach Roboter...")
         
         def connect_thread():
             try:
-                self.process = subprocess.Popen(
-                    ['uv', 'run', 'pybricksdev', 'run', 'ble', 'src/main.py', '--wait'],
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1
-                )
-                
-                time.sleep(3)
-                
-                if self.process.poll() is None:
-                    self.connected = True
-                    self.status_label.config(text="✅ Verbunden", bg='#27ae60')
-                    self.log("✅ Roboter verbunden!")
-                else:
-                    self.status_label.config(text="❌ Verbindung fehlgeschlagen", bg='#e74c3c')
-                    self.log("❌ Verbindung fehlgeschlagen")
-                    self.connect_btn.config(state='normal')
+                connected = self.session.connect()
             except Exception as e:
-                self.log(f"❌ Fehler: {e}")
-                self.status_label.config(text="❌ Fehler", bg='#e74c3c')
-                self.connect_btn.config(state='normal')
+                self.post(self.connect_failed, "❌ Fehler", f"❌ Fehler: {e}")
+                return
+            if connected:
+                self.streamer.start()
+                self.session.send_frame(OP_TELEMETRY, TELEMETRY_RATE)
+                self.post(self.on_connected)
+            else:
+                self.post(self.connect_failed, "❌ Verbindung fehlgeschlagen", "❌ Verbindung fehlgeschlagen")
         
         threading.Thread(target=connect_thread, daemon=True).start()
     
+    def on_connected(self):
+        self.status_label.config(text="✅ Verbunden", bg='#27ae60')
+        self.log("✅ Roboter verbunden!")
+    
+    def connect_failed(self, status, message):
+        self.status_label.config(text=status, bg='#e74c3c')
+        self.log(message)
+        self.connect_btn.config(state='normal')
+    
     def send_command(self, cmd):
         """Sendet Befehl zum Roboter."""
-        if not self.connected:
+        if not self.session.available:
             self.log("⚠️  Nicht verbunden!")
             return
         
-        command_names = {
-            'w': '⬆️ Vorwärts', 's': '⬇️ Rückwärts',
-            'a': '⬅️ Links', 'd': '➡️ Rechts',
-            'i': '⬆️ Arm hoch', 'k': '⬇️ Arm runter',
-            'j': '↪️ Arm links', 'l': '↩️ Arm rechts',
-            '0': '🎯 Zentrum', 'x': '🛑 Stop', 'm': '📏 Abstand'
-        }
+        if cmd == 'x':
+            # Gehaltene Tasten vergessen, sonst fährt der Stream weiter
+            self.streamer.clear()
         
-        try:
-            command = f"execute_command('{cmd}')\n"
-            self.process.stdin.write(command)
-            self.process.stdin.flush()
-            self.log(f"📤 {command_names.get(cmd, cmd)}")
-        except:
+        if self.scheduler.submit(cmd):
+            self.log(f"📤 {COMMAND_NAMES.get(cmd, cmd)}")
+        else:
             self.log("❌ Fehler beim Senden")
-            self.connected = False
             self.status_label.config(text="❌ Verbindung verloren", bg='#e74c3c')
     
+    def watch_link(self, was_reconnecting=False):
+        """Zeigt Abbruch und Wiederverbinden im Status an (läuft im Tk-Thread)."""
+        reconnecting = self.supervisor.reconnecting
+        if reconnecting and not was_reconnecting:
+            self.status_label.config(text="🔄 Verbinde neu...", bg='#f39c12')
+            self.log("⚠️  Verbindung verloren, verbinde neu...")
+        elif was_reconnecting and not reconnecting and self.session.connected:
+            self.status_label.config(text="✅ Verbunden", bg='#27ae60')
+            self.log(f"✅ Wieder verbunden ({self.supervisor.stats()['last_ms']:.0f} ms)")
+        self.root.after(LINK_CHECK_INTERVAL, self.watch_link, reconnecting)
+    
     def run(self):
         """Startet die GUI."""
         self.root.mainloop()
@@ -0,0 +1,192 @@
+"""
+Dashboard für gui_controller: Abstandsverlauf und Motoranzeigen auf einem tk.Canvas.
+
+Die Telemetrie kommt mit bis zu 50 Zeilen pro Sekunde, gezeichnet wird
+aber nur RENDER_RATE-mal pro Sekunde. Dazwischen fasst DistanceHistory die
+Messwerte zu CHART_POINTS Zeitabschnitten zusammen; je Abschnitt zählt der
+kleinste Abstand, damit ein kurz auftauchendes Hindernis nicht verschwindet.
+Beim Zeichnen werden nur die Koordinaten und Texte der einmal angelegten
+Canvas-Elemente geändert, und nur, wenn sich etwas geändert hat.
+"""
+
+import collections
+import math
+import threading
+import time
+import tkinter as tk
+
+from protocol import TELEMETRY_PORTS
+
+CHART_SECONDS = 10      # Zeitraum des Abstandsdiagramms
+CHART_POINTS = 200      # Zeitabschnitte (= Punkte der Linie) im Diagramm
+RENDER_RATE = 10        # Neuzeichnungen pro Sekunde
+MAX_DISTANCE = 2000     # mm am oberen Rand (Messbereich des Sensors)
+MAX_SPEED = 1000        # Grad/Sekunde für vollen Ausschlag
+
+CHART_WIDTH = 440
+CHART_HEIGHT = 150
+GAUGE_RADIUS = 28
+MARGIN = 30
+
+MOTOR_NAMES = {'A': "Lenkung", 'B': "Antrieb", 'C': "Arm Dreh.", 'D': "Arm Hub"}
+
+
+class DistanceHistory:
+    """Abstände, zusammengefasst zu Zeitabschnitten fester Länge (thread-sicher).
+
+    Ein Abschnitt ohne Messung (Sensor fehlt, Lücke in der Telemetrie)
+    steht als None im Verlauf.
+    """
+
+    def __init__(self, seconds=CHART_SECONDS, points=CHART_POINTS):
+        self.bucket_ms = seconds * 1000 / points
+        self.size = points
+        self.samples = 0
+        self.version = 0   # zählt abgeschlossene Abschnitte
+        self._points = collections.deque(maxlen=points)
+        self._bucket = None
+        self._minimum = None
+        self._lock = threading.Lock()
+
+    def add(self, time_ms, distance):
+        """Nimmt eine Messung auf (time_ms: Hub-Zeit der Telemetrie-Zeile)."""
+        bucket = int(time_ms // self.bucket_ms)
+        with self._lock:
+            self.samples += 1
+            if bucket == self._bucket:
+                if distance is not None and (self._minimum is None or distance < self._minimum):
+                    self._minimum = distance
+                return
+            if self._bucket is not None:
+                self._points.append(self._minimum)
+                # Übersprungene Abschnitte; nach einem Neustart des
+                # Hub-Programms beginnt die Hub-Zeit wieder bei 0
+                gap = min(bucket - self._bucket - 1, self._points.maxlen)
+                self._points.extend([None] * max(0, gap))
+                self.version += 1
+            self._bucket = bucket
+            self._minimum = distance
+
+    def snapshot(self):
+        """(version, Liste der Abschnitte, ältester zuerst)."""
+        with self._lock:
+            return self.version, list(self._points)
+
+
+class Dashboard:
+    """Abstandsdiagramm und je Motor eine Anzeige für Winkel und Tempo."""
+
+    def __init__(self, parent, history, rate=RENDER_RATE):
+        self.history = history
+        self.interval = 1 / rate
+        self.renders = 0
+        self._next_render = 0.0
+        self._version = None
+        self._motors = {}   # Port -> zuletzt gezeichnete (Winkel, Tempo)
+        self._distance = None
+
+        gauges_width = len(TELEMETRY_PORTS) * (2 * GAUGE_RADIUS + 30)
+        self.canvas = tk.Canvas(
+            parent,
+            width=CHART_WIDTH + gauges_width + 3 * MARGIN,
+            height=CHART_HEIGHT + 2 * MARGIN,
+            bg='#1a1a1a',
+            highlightthickness=0
+        )
+        self._create_chart()
+        self._create_gauges(CHART_WIDTH + 2 * MARGIN)
+
+    def _create_chart(self):
+        canvas = self.canvas
+        x0, y0 = MARGIN, MARGIN
+        for mm in range(0, MAX_DISTANCE + 1, 500):
+            y = self._y(mm)
+            canvas.create_line(x0, y, x0 + CHART_WIDTH, y, fill='#333333')
+            canvas.create_text(x0 - 4, y, text=str(mm), anchor='e', fill='#7f8c8d', font=("Arial", 7))
+        canvas.create_text(x0, y0 - 16, text=f"📏 Abstand (mm), letzte {CHART_SECONDS} s",
+                           anchor='w', fill='white', font=("Arial", 10, "bold"))
+        self._line = canvas.create_line(0, 0, 0, 0, fill='#00ff00', width=2)
+        self._distance_text = canvas.create_text(x0 + CHART_WIDTH, y0 - 16, text="– mm",
+                                                 anchor='e', fill='#00ff00', font=("Courier", 11, "bold"))
+
+    def _create_gauges(self, left):
+        canvas = self.canvas
+        self._gauges = {}
+        cy = MARGIN + GAUGE_RADIUS + 10
+        for i, port in enumerate(TELEMETRY_PORTS):
+            cx = left + i * (2 * GAUGE_RADIUS + 30) + GAUGE_RADIUS
+            r = GAUGE_RADIUS
+            canvas.create_text(cx, MARGIN - 16, text=f"{port} {MOTOR_NAMES.get(port, '')}",
+                               fill='white', font=("Arial", 8, "bold"))
+            canvas.create_oval(cx - r, cy - r, cx + r, cy + r, outline='#7f8c8d', width=2)
+            needle = canvas.create_line(cx, cy, cx, cy - r, fill='#3498db', width=3)
+            angle_text = canvas.create_text(cx, cy + r + 12, text="–", fill='white', font=("Courier", 9))
+            # Tempo als Balken, nach rechts vorwärts, nach links rückwärts
+            bar_y = cy + r + 28
+            canvas.create_rectangle(cx - r, bar_y - 4, cx + r, bar_y + 4, outline='#7f8c8d')
+            bar = canvas.create_rectangle(cx, bar_y - 4, cx, bar_y + 4, fill='#27ae60', width=0)
+            speed_text = canvas.create_text(cx, bar_y + 14, text="", fill='#95a5a6', font=("Courier", 8))
+            self._gauges[port] = (cx, cy, bar_y, needle, angle_text, bar, speed_text)
+
+    @staticmethod
+    def _y(distance):
+        return MARGIN + CHART_HEIGHT * (1 - min(distance, MAX_DISTANCE) / MAX_DISTANCE)
+
+    def render(self, frame):
+        """Zeichnet Diagramm und Anzeigen neu, höchstens RENDER_RATE-mal pro Sekunde.
+
+        frame ist der neueste Telemetrie-Wert (oder None). Läuft im Tk-Thread.
+        """
+        now = time.perf_counter()
+        if now < self._next_render:
+            return
+        self._next_render = now + self.interval
+        self.renders += 1
+        self._render_chart()
+        if frame is not None:
+            self._render_gauges(frame)
+
+    def _render_chart(self):
+        version, points = self.history.snapshot()
+        if version == self._version:
+            return
+        self._version = version
+        step = CHART_WIDTH / (self.history.size - 1)
+        right = MARGIN + CHART_WIDTH
+        count = len(points)
+        coords = []
+        for i, distance in enumerate(points):
+            if distance is not None:
+                coords.append(right - (count - 1 - i) * step)
+                coords.append(self._y(distance))
+        if len(coords) < 4:
+            coords = [0, 0, 0, 0]
+        self.canvas.coords(self._line, *coords)
+
+    def _render_gauges(self, frame):
+        canvas = self.canvas
+        distance = frame['distance']
+        if distance != self._distance:
+            self._distance = distance
+            canvas.itemconfig(self._distance_text, text="– mm" if distance is None else f"{distance} mm")
+        for port, (cx, cy, bar_y, needle, angle_text, bar, speed_text) in self._gauges.items():
+            motor = frame['motors'].get(port)
+            value = (motor['angle'], motor['speed']) if motor else None
+            if value == self._motors.get(port):
+                continue
+            self._motors[port] = value
+            if value is None:
+                canvas.itemconfig(angle_text, text="–")
+                canvas.itemconfig(speed_text, text="")
+                canvas.coords(needle, cx, cy, cx, cy)
+                canvas.coords(bar, cx, bar_y - 4, cx, bar_y + 4)
+                continue
+            angle, speed = value
+            r = GAUGE_RADIUS - 4
+            rad = math.radians(angle % 360)
+            canvas.coords(needle, cx, cy, cx + r * math.sin(rad), cy - r * math.cos(rad))
+            canvas.itemconfig(angle_text, text=f"{angle}°")
+            length = GAUGE_RADIUS * max(-1.0, min(1.0, speed / MAX_SPEED))
+            canvas.coords(bar, min(cx, cx + length), bar_y - 4, max(cx, cx + length), bar_y + 4)
+            canvas.itemconfig(bar, fill='#27ae60' if speed >= 0 else '#e67e22')
+            canvas.itemconfig(speed_text, text=f"{speed}°/s")
@@ -0,0 +1,29 @@
+"""
+Hub-Tasten mit Flankenerkennung.
+
+ButtonState vergleicht jede Abfrage mit der vorherigen. Die Hauptschleifen
+reagieren damit nur auf Drücken und Loslassen, statt bei gehaltener Taste
+in jedem Durchlauf dieselben Motorbefehle erneut zu senden.
+"""
+
+
+class ButtonState:
+    """Gedrückte Tasten und ihre Änderungen seit der letzten Abfrage."""
+
+    def __init__(self, buttons):
+        self._buttons = buttons
+        self.pressed = set()
+        self.down = ()   # seit der letzten Abfrage neu gedrückt
+        self.up = ()     # seit der letzten Abfrage losgelassen
+
+    def update(self):
+        """Fragt die Tasten ab. Gibt True zurück, wenn sich etwas geändert hat."""
+        pressed = set(self._buttons.pressed())
+        previous = self.pressed
+        if pressed == previous:
+            self.down = self.up = ()
+            return False
+        self.down = pressed - previous
+        self.up = previous - pressed
+        self.pressed = pressed
+        return True
@@ -0,0 +1,88 @@
+"""
+Geräte des Roboters und Start der Hub-Programme.
+
+DEVICES beschreibt in einer Tabelle, welches Gerät an welchem Port hängt.
+main.py, main_advanced.py und main_simple.py suchen ihre Geräte mit
+probe() und unterscheiden sich nur darin, wie sie Erfolg und Fehlschlag
+melden.
+
+BootTimer misst die Startschritte und schickt sie als "BOOT:"-Zeile an
+den Mac (Format siehe protocol.py), zusammen mit der Kennung des Programms.
+"""
+
+from pybricks.parameters import Port
+from pybricks.pupdevices import Motor, UltrasonicSensor
+from pybricks.tools import StopWatch
+
+try:
+    # Erzeugt program_cache.py beim Übersetzen für den Programm-Cache
+    from program_id import PROGRAM_ID
+except ImportError:
+    # Mit "pybricksdev run" aufgespielt oder im Simulator
+    PROGRAM_ID = ''
+
+# Rolle, Port, Klasse, Bezeichnung
+DEVICES = (
+    ('steering', 'A', Motor, "Lenkung"),
+    ('drive', 'B', Motor, "Antrieb"),
+    ('arm_rotate', 'C', Motor, "Greifarm Drehung"),
+    ('arm_lift', 'D', Motor, "Greifarm Hoch/Runter"),
+    ('distance', 'F', UltrasonicSensor, "Ultraschall-Abstandssensor"),
+)
+
+CENTER_SPEED = 300   # Grad/Sekunde beim Zentrieren der Lenkung
+
+
+class BootTimer:
+    """Misst die Dauer der einzelnen Startschritte in ms."""
+
+    def __init__(self):
+        self.steps = []
+        self._clock = StopWatch()
+        self._last = 0
+
+    def step(self, name):
+        """Schließt den Schritt name ab (Dauer seit dem vorigen Schritt)."""
+        now = self._clock.time()
+        self.steps.append((name, now - self._last))
+        self._last = now
+
+    def report(self):
+        """Schickt alle Schritte, die Gesamtzeit und die Programmkennung als "BOOT:"-Zeile an den Mac."""
+        parts = [name + '=' + str(ms) for name, ms in self.steps]
+        parts.append('total=' + str(self._last))
+        if PROGRAM_ID:
+            parts.append('id=' + PROGRAM_ID)
+        print('BOOT:' + ','.join(parts))
+
+
+def probe(report, timer=None):
+    """Öffnet alle Geräte aus DEVICES, einen Port nach dem anderen.
+
+    Gibt ein Dictionary Rolle -> Gerät zurück (None, wenn es fehlt).
+    report(port, label, found) wird für jedes Gerät aufgerufen; timer
+    bekommt je Port einen Schritt.
+
+    Gleichzeitig lassen sich die Ports nicht abfragen: Die Konstruktoren
+    von Motor und UltrasonicSensor blockieren, bis das Gerät erkannt ist,
+    und Pybricks hat keine Threads. Schneller bereit ist das Programm
+    stattdessen, weil das Zentrieren der Lenkung im Hintergrund läuft
+    (start_centering).
+    """
+    devices = {}
+    for role, port, kind, label in DEVICES:
+        try:
+            device = kind(getattr(Port, port))
+        except OSError:
+            device = None
+        devices[role] = device
+        report(port, label, device is not None)
+        if timer:
+            timer.step(port)
+    return devices
+
+
+def start_centering(steering_motor):
+    """Fährt die Lenkung in die Mitte, ohne darauf zu warten."""
+    if steering_motor:
+        steering_motor.run_target(CENTER_SPEED, 0, wait=False)
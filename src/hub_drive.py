@@ -0,0 +1,87 @@
+"""
+Kontinuierlicher Fahrmodus für die Hub-Programme.
+
+Der Mac schickt in festem Takt Soll-Geschwindigkeiten für Antrieb und
+Greifarm sowie den Soll-Lenkwinkel (siehe protocol.py). Ein Motorbefehl
+wird nur abgesetzt, wenn sich der Sollwert ändert. Kommt innerhalb der
+Watchdog-Zeit kein neuer Sollwert, werden die Motoren gestoppt
+(Totmann-Schaltung), z. B. wenn die Verbindung abreißt.
+"""
+
+from pybricks.tools import StopWatch
+
+WATCHDOG_TIMEOUT = 300   # ms ohne Sollwert, bis alle Motoren stoppen
+STEERING_SPEED = 500     # Geschwindigkeit beim Anfahren des Lenkwinkels
+
+
+class VelocityControl:
+    """Wendet Sollwerte mit Motor.run() an und überwacht die Updates."""
+
+    def __init__(self, timeout=WATCHDOG_TIMEOUT):
+        self.timeout = timeout
+        self.speeds = {}            # Motor -> gesetzte Geschwindigkeit
+        self.steering_angle = None  # zuletzt angefahrener Lenkwinkel
+        self.active = False
+        self._timer = StopWatch()
+
+    def feed(self):
+        """Setzt den Watchdog zurück."""
+        self._timer.reset()
+        self.active = True
+
+    def keep_alive(self):
+        """Setzt den Watchdog zurück, falls Sollwerte aktiv sind (z. B. aus einem Makro)."""
+        if self.active:
+            self._timer.reset()
+
+    def speed_action(self, motor):
+        """Gibt die Aktion für Geschwindigkeits-Befehle an motor zurück."""
+        speeds = self.speeds
+
+        def action(arg):
+            self.feed()
+            if speeds.get(motor, 0) != arg:
+                speeds[motor] = arg
+                if arg:
+                    motor.run(arg)
+                else:
+                    motor.stop()
+
+        return action
+
+    def steering_action(self, motor, limit):
+        """Gibt die Aktion für Lenkwinkel-Befehle zurück (begrenzt auf ±limit)."""
+
+        def action(arg):
+            self.feed()
+            angle = max(-limit, min(limit, arg))
+            if angle != self.steering_angle:
+                self.steering_angle = angle
+                motor.run_target(STEERING_SPEED, angle, wait=False)
+
+        return action
+
+    def set_timeout(self, arg):
+        """Aktion für OP_WATCHDOG: neue Watchdog-Zeit in ms."""
+        if arg > 0:
+            self.timeout = arg
+
+    def forget(self, motor):
+        """Vergisst den Sollwert von motor, z. B. nachdem ihn der Kollisionsschutz
+        gebremst hat. Der nächste Geschwindigkeits-Befehl startet ihn neu."""
+        self.speeds.pop(motor, None)
+
+    def reset(self):
+        """Vergisst alle Sollwerte, z. B. nachdem alle Motoren gestoppt wurden."""
+        self.speeds.clear()
+        self.steering_angle = None
+        self.active = False
+
+    def check(self):
+        """Stoppt alle laufenden Motoren, wenn zu lange kein Sollwert kam."""
+        if self.active and self._timer.time() > self.timeout:
+            for motor, speed in self.speeds.items():
+                if speed:
+                    motor.stop()
+            self.reset()
+            print("WATCHDOG:STOP")
@@ -0,0 +1,230 @@
+"""
+Ausgabezeilen der Hub-Programme als Ereignisse (läuft auf dem Mac).
+
+Die Hub-Programme melden sich mit maschinenlesbaren Zeilen: main_simple.py
+mit "OK:A", "FAIL:B", "READY", "CMD:forward", "DIST:123", "LOOP:START",
+"EXIT:USER", "DONE" usw., alle Programme mit "ACK:", "TEL:", "PROF:",
+"BOOT:", "REFLEX:" und "MACRO:" (siehe protocol.py). parse_line() macht aus jeder
+Zeile ein Ereignis: ein Dictionary mit dem Typ (EVENT_...) unter 'type' und
+den Werten der Zeile. Zeilen ohne bekanntes Format werden zu EVENT_TEXT.
+
+HubSession zerlegt jede Zeile genau einmal und verteilt das Ereignis über
+ihren EventBus (session.events) an alle, die diesen Typ abonniert haben.
+Das Bereit-Signal ist das Ereignis EVENT_READY.
+"""
+
+import threading
+
+from protocol import TELEMETRY_PORTS
+
+EVENT_READY = 'ready'          # Programm nimmt Befehle an
+EVENT_DEVICE = 'device'        # port, found
+EVENT_COMMAND = 'command'      # name: ausgeführter Befehl ("forward", ...)
+EVENT_DISTANCE = 'distance'    # distance: mm, None bei Sensor-Fehler
+EVENT_LOOP = 'loop'            # state: "START"
+EVENT_EXIT = 'exit'            # reason: "USER", "INTERRUPT"
+EVENT_CLEANUP = 'cleanup'
+EVENT_DONE = 'done'            # Programm ist beendet
+EVENT_ACK = 'ack'              # seq
+EVENT_DUP = 'dup'              # seq
+EVENT_ERROR = 'error'          # reason: "OPCODE", "CHECKSUM"
+EVENT_WATCHDOG = 'watchdog'    # action: "STOP"
+EVENT_TELEMETRY = 'telemetry'  # time, distance, motors (wie parse_telemetry)
+EVENT_PROFILE = 'profile'      # wie parse_profile
+EVENT_BOOT = 'boot'            # steps: Schritt -> ms, program: Kennung oder None
+EVENT_REFLEX = 'reflex'        # distance: mm
+EVENT_MACRO = 'macro'          # slot, state ("STORED", "RUN", "DONE", "CANCEL"), step, steps
+EVENT_TEXT = 'text'            # text: alle übrigen Zeilen
+
+# Bereit-Meldungen von main.py ("=== Roboter bereit! ===") und
+# main_advanced.py ("=== BEREIT ==="); main_simple.py schreibt "READY"
+READY_MARKERS = ('BEREIT', 'READY')
+
+# Zeilen ohne Werte
+_WORDS = {
+    'READY': {'type': EVENT_READY},
+    'CLEANUP': {'type': EVENT_CLEANUP},
+    'DONE': {'type': EVENT_DONE},
+}
+
+
+# Zeilen mit mehreren Werten (Format siehe protocol.py). Die Parser laufen
+# nur auf dem Mac und liegen deshalb nicht in protocol.py, das mit auf den
+# Hub geladen wird.
+
+def parse_telemetry(line):
+    """Zerlegt eine "TEL:"-Zeile in ein Dictionary, sonst None."""
+    if not line.startswith('TEL:'):
+        return None
+    fields = line[4:].split(',')
+    if len(fields) != 2 + 2 * len(TELEMETRY_PORTS):
+        return None
+    try:
+        values = [int(field) if field else None for field in fields]
+    except ValueError:
+        return None
+    motors = {}
+    for i, port in enumerate(TELEMETRY_PORTS):
+        angle = values[2 + 2 * i]
+        if angle is not None:
+            motors[port] = {'angle': angle, 'speed': values[3 + 2 * i]}
+    return {'time': values[0], 'distance': values[1], 'motors': motors}
+
+
+def parse_profile(line):
+    """Zerlegt eine "PROF:"-Zeile in ein Dictionary, sonst None."""
+    if not line.startswith('PROF:'):
+        return None
+    fields = line[5:].split(',')
+    try:
+        histogram = [int(count) for count in fields[3].split('/')]
+        phases = {}
+        for field in fields[4:]:
+            name, _, value = field.partition('=')
+            total, _, count = value.partition('/')
+            phases[name] = {'ms': int(total), 'count': int(count)}
+        return {
+            'iterations': int(fields[0]),
+            'missed': int(fields[1]),
+            'max_ms': int(fields[2]),
+            'histogram': histogram,
+            'phases': phases,
+        }
+    except (IndexError, ValueError):
+        return None
+
+
+def parse_boot(line):
+    """Zerlegt eine "BOOT:"-Zeile in ein Dictionary Schritt -> ms, sonst None."""
+    if not line.startswith('BOOT:'):
+        return None
+    steps = {}
+    try:
+        for field in line[5:].split(','):
+            name, _, ms = field.partition('=')
+            steps[name] = int(ms)
+    except ValueError:
+        return None
+    return steps
+
+
+def _device(found):
+    return lambda line, value: {'type': EVENT_DEVICE, 'port': value, 'found': found}
+
+
+def _text(kind, key):
+    return lambda line, value: {'type': kind, key: value}
+
+
+def _number(kind, key):
+    return lambda line, value: {'type': kind, key: int(value)}
+
+
+def _distance(line, value):
+    return {'type': EVENT_DISTANCE, 'distance': None if value == 'ERROR' else int(value)}
+
+
+def _measured(line, value):
+    # main.py: "Abstand: 123 mm"
+    return {'type': EVENT_DISTANCE, 'distance': int(value.split()[0])}
+
+
+def _macro(line, value):
+    slot, state, step, steps = value.split(',')
+    return {'type': EVENT_MACRO, 'slot': int(slot), 'state': state,
+            'step': int(step), 'steps': int(steps)}
+
+
+def _parsed(kind, parse):
+    def parser(line, value):
+        event = parse(line)
+        if event is None:
+            raise ValueError(line)
+        event['type'] = kind
+        return event
+    return parser
+
+
+def _boot(line, value):
+    line, _, program = line.partition(',id=')
+    steps = parse_boot(line)
+    if steps is None:
+        raise ValueError(line)
+    return {'type': EVENT_BOOT, 'steps': steps, 'program': program or None}
+
+
+# Text vor dem ersten ":" -> parser(zeile, text_danach)
+_PREFIXES = {
+    'OK': _device(True),
+    'FAIL': _device(False),
+    'CMD': _text(EVENT_COMMAND, 'name'),
+    'DIST': _distance,
+    'Abstand': _measured,
+    'LOOP': _text(EVENT_LOOP, 'state'),
+    'EXIT': _text(EVENT_EXIT, 'reason'),
+    'ACK': _number(EVENT_ACK, 'seq'),
+    'DUP': _number(EVENT_DUP, 'seq'),
+    'ERR': _text(EVENT_ERROR, 'reason'),
+    'WATCHDOG': _text(EVENT_WATCHDOG, 'action'),
+    'TEL': _parsed(EVENT_TELEMETRY, parse_telemetry),
+    'PROF': _parsed(EVENT_PROFILE, parse_profile),
+    'BOOT': _boot,
+    'REFLEX': _number(EVENT_REFLEX, 'distance'),
+    'MACRO': _macro,
+}
+
+
+def parse_line(line):
+    """Macht aus einer Ausgabezeile des Hubs ein Ereignis (Dictionary)."""
+    head, sep, value = line.partition(':')
+    parser = _PREFIXES.get(head) if sep else None
+    if parser is not None:
+        try:
+            return parser(line, value)
+        except (ValueError, IndexError):
+            pass
+    else:
+        word = _WORDS.get(line)
+        if word is not None:
+            return dict(word)
+    upper = line.upper()
+    if any(marker in upper for marker in READY_MARKERS):
+        return {'type': EVENT_READY}
+    return {'type': EVENT_TEXT, 'text': line}
+
+
+class EventBus:
+    """Verteilt Ereignisse an Abonnenten, je Typ oder für alle Typen (thread-sicher).
+
+    Die Abonnentenlisten werden beim (seltenen) An- und Abmelden neu
+    aufgebaut, publish() kommt daher ohne Lock und Kopie aus.
+    """
+
+    def __init__(self):
+        self._subscribers = {}   # Typ (None = alle) -> Tupel von Callbacks
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, *types):
+        """Registriert callback(event) für die Typen types (ohne Angabe: alle).
+
+        Der Callback läuft im Thread, der das Ereignis verteilt (bei
+        HubSession der Loop-Thread) und sollte daher nicht blockieren.
+        """
+        with self._lock:
+            for kind in types or (None,):
+                self._subscribers[kind] = self._subscribers.get(kind, ()) + (callback,)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = {
+                kind: tuple(c for c in callbacks if c != callback)
+                for kind, callbacks in self._subscribers.items()
+            }
+
+    def publish(self, event):
+        subscribers = self._subscribers
+        for callback in subscribers.get(event['type'], ()) + subscribers.get(None, ()):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Fehler im Ereignis-Abonnenten: {e}")
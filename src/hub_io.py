@@ -0,0 +1,148 @@
+"""
+Ein- und Ausgabe der Hub-Programme zum Mac.
+
+Läuft auf dem Hub (Pybricks MicroPython) und wird von main.py und
+main_simple.py importiert. pybricksdev lädt das Modul beim Start
+automatisch mit auf den Hub.
+"""
+
+from pybricks.tools import StopWatch
+from usys import stdin
+from uselect import poll
+
+from hub_profile import PHASE_COMMANDS, PHASE_OUTPUT, LoopProfiler
+from protocol import FrameDecoder
+
+# Höchstens so viele Bytes werden pro Aufruf von process() gelesen,
+# damit ein Befehlsschwall die Hub-Tasten nicht aushungert
+MAX_BATCH = 60
+
+
+def noop(arg=0):
+    """Aktion für Befehle, deren Gerät nicht angeschlossen ist."""
+    pass
+
+
+def build_dispatch(entries):
+    """Baut die Befehlstabelle Opcode -> Aktion.
+
+    entries enthält Tupel (opcode, gerät, aktion). Fehlt das Gerät (None),
+    wird stattdessen noop eingetragen, damit beim Ausführen keine Prüfung
+    mehr nötig ist.
+    """
+    dispatch = {}
+    for opcode, device, action in entries:
+        dispatch[opcode] = action if device else noop
+    return dispatch
+
+
+def unknown_opcode(arg=0):
+    print("ERR:OPCODE")
+
+
+class CommandReader:
+    """Liest Befehlsrahmen von stdin, ohne die Hauptschleife zu blockieren.
+
+    Für jeden neuen Befehl wird dispatch[opcode](arg) aufgerufen, danach
+    wird der Befehl mit "ACK:<seq>" bestätigt. Ein übergebener LoopProfiler
+    misst beides als Phase "commands" bzw. "output".
+
+    capture(opcode, arg) bekommt jeden Befehl vorab und gibt True zurück,
+    wenn er damit erledigt ist (MacroRunner.capture nimmt so Makros auf).
+    """
+
+    def __init__(self, dispatch, profiler=None, capture=None):
+        self.dispatch = dispatch
+        self.profiler = profiler or LoopProfiler(0)
+        self.capture = capture
+        self.decoder = FrameDecoder()
+        self._poll = poll()
+        self._poll.register(stdin)
+
+    def wait(self, timeout):
+        """Wartet höchstens timeout ms auf Daten. Gibt True zurück, wenn welche da sind."""
+        return bool(self._poll.poll(timeout))
+
+    def process(self):
+        """Liest alle bereits empfangenen Bytes und führt die Befehle aus.
+
+        Gibt die Anzahl ausgeführter Befehle zurück.
+        """
+        data = bytearray()
+        while len(data) < MAX_BATCH and self._poll.poll(0):
+            data.extend(stdin.buffer.read(1))
+        if not data:
+            return 0
+
+        errors = self.decoder.checksum_errors
+        dispatch = self.dispatch
+        profiler = self.profiler
+        capture = self.capture
+        count = 0
+        for opcode, seq, arg, duplicate in self.decoder.feed(data):
+            if duplicate:
+                print(f"DUP:{seq}")
+                continue
+            started = profiler.start()
+            if capture is None or not capture(opcode, arg):
+                dispatch.get(opcode, unknown_opcode)(arg)
+            profiler.stop(PHASE_COMMANDS, started)
+            started = profiler.start()
+            print(f"ACK:{seq}")
+            profiler.stop(PHASE_OUTPUT, started)
+            count += 1
+        if self.decoder.checksum_errors != errors:
+            print("ERR:CHECKSUM")
+        return count
+
+
+class Telemetry:
+    """Schickt in festem Takt eine "TEL:"-Zeile an den Mac (Format siehe protocol.py).
+
+    motors enthält die Motoren an den Ports A bis D (None, falls nicht
+    angeschlossen). Die Rate stellt der Mac mit OP_TELEMETRY ein.
+    """
+
+    def __init__(self, distance_sensor, motors):
+        self.distance_sensor = distance_sensor
+        self.motors = motors
+        self.interval = 0   # ms zwischen zwei Zeilen, 0 = aus
+        self._clock = StopWatch()
+        self._next = 0
+
+    def set_rate(self, arg):
+        """Aktion für OP_TELEMETRY: arg Zeilen pro Sekunde, 0 schaltet ab."""
+        self.interval = 1000 // arg if arg > 0 else 0
+        self._next = self._clock.time()
+
+    def time_to_next(self, default):
+        """ms bis zur nächsten fälligen Zeile, höchstens default."""
+        if not self.interval:
+            return default
+        return min(default, self._next - self._clock.time())
+
+    def poll(self):
+        """Sendet eine Zeile, falls sie fällig ist."""
+        if not self.interval:
+            return
+        now = self._clock.time()
+        if now < self._next:
+            return
+        self._next += self.interval
+        if self._next <= now:
+            # Zu weit hinterher - nicht nachholen
+            self._next = now + self.interval
+        self.send(now)
+
+    def send(self, now):
+        parts = [str(now)]
+        sensor = self.distance_sensor
+        parts.append(str(sensor.distance()) if sensor else '')
+        for motor in self.motors:
+            if motor:
+                parts.append(str(motor.angle()))
+                parts.append(str(motor.speed()))
+            else:
+                parts.append('')
+                parts.append('')
+        print('TEL:' + ','.join(parts))
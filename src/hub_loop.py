@@ -0,0 +1,29 @@
+"""
+Takt für die Hauptschleifen der Hub-Programme.
+
+LoopTimer rechnet mit festen Terminen statt mit festen Pausen: Was ein
+Durchlauf an Zeit verbraucht, wird von der Pause abgezogen. Ist ein
+Durchlauf zu spät dran, wird nicht nachgeholt, sondern ab jetzt neu getaktet.
+"""
+
+from pybricks.tools import StopWatch, wait
+
+
+class LoopTimer:
+    """Hält eine Schleife auf rate Durchläufen pro Sekunde."""
+
+    def __init__(self, rate):
+        self.interval = 1000 // rate   # ms
+        self.overruns = 0              # Durchläufe, die ihren Termin verpasst haben
+        self._clock = StopWatch()
+        self._next = self.interval
+
+    def wait(self):
+        """Wartet bis zum nächsten Termin."""
+        remaining = self._next - self._clock.time()
+        if remaining > 0:
+            wait(remaining)
+            self._next += self.interval
+        else:
+            self.overruns += 1
+            self._next = self._clock.time() + self.interval
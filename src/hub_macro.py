@@ -0,0 +1,179 @@
+"""
+Makros für die Hub-Programme: Befehlsfolgen, die der Hub selbst abspielt.
+
+Statt jeden Schritt einer Folge wie "vorwärts, 2 s warten, stopp" einzeln
+über Bluetooth zu schicken (ein Hin und Her pro Schritt, verzerrt durch die
+Schwankungen der Funkstrecke), lädt der Mac die ganze Folge auf einmal hoch:
+
+    OP_MACRO_BEGIN(platz), Befehl, OP_MACRO_WAIT(ms), Befehl, ..., OP_MACRO_END
+
+Die Rahmen dazwischen führt der Hub nicht aus, sondern speichert sie als
+Schritte (Befehl, Argument, Dauer) unter dem Platz. OP_MACRO_RUN(platz)
+spielt das Makro dann nach der Uhr des Hubs ab. Die Termine der Schritte
+zählen ab dem Start, ein blockierender Schritt verschiebt die folgenden
+also nicht.
+
+Ein Stop-Befehl wird nie aufgenommen: Er bricht die Aufnahme ab ("ERR:MACRO")
+und wird sofort ausgeführt. Einen Stop als Schritt schickt der Mac als
+OP_MACRO_STOP; außerhalb einer Aufnahme meldet der Hub dafür "ERR:OPCODE".
+Ebenso verwirft der Hub eine Aufnahme, in der
+länger als RECORD_TIMEOUT kein Rahmen kam (z. B. weil OP_MACRO_END beim
+Verbindungsabbruch verloren ging), und führt den nächsten Rahmen normal aus.
+
+Fortschritt und Ende meldet der Hub mit "MACRO:"-Zeilen (siehe
+protocol.py). OP_MACRO_CANCEL hält nur die Folge an; ein Stop-Befehl vom
+Mac bricht das Makro ab und stoppt die Motoren. Solange ein Makro läuft,
+hält es den Watchdog des kontinuierlichen Fahrmodus am Leben.
+
+Die Makros liegen im Arbeitsspeicher, bis das Programm endet.
+"""
+
+from pybricks.tools import StopWatch
+
+from hub_io import noop
+from protocol import (
+    MACRO_MAX_STEPS, MACRO_SLOTS, MACRO_START, OP_MACRO_BEGIN, OP_MACRO_CANCEL,
+    OP_MACRO_END, OP_MACRO_RUN, OP_MACRO_STOP, OP_MACRO_WAIT, OP_STOP,
+)
+
+# ms ohne Rahmen, nach denen eine offene Aufnahme verworfen wird. Der Mac
+# schickt ein Makro in einer Nachricht, die Rahmen kommen also dicht auf.
+RECORD_TIMEOUT = 1000
+
+
+class MacroRunner:
+    """Nimmt Makros auf und spielt sie mit den Aktionen aus dispatch ab.
+
+    velocity ist die VelocityControl des Programms (oder None).
+    """
+
+    def __init__(self, dispatch, velocity=None, slots=MACRO_SLOTS):
+        # Eigene Kopie: spätere Einträge (Makro-Befehle, abbrechender
+        # Stop) gelten nur für Befehle vom Mac
+        self.dispatch = dict(dispatch)
+        self.velocity = velocity
+        self.slots = slots
+        self.macros = {}          # Platz -> Liste von [opcode, arg, dauer]
+        self.slot = None          # Platz des laufenden Makros
+        self._steps = None
+        self._index = 0
+        self._due = 0
+        self._recording = None    # Schritte während der Aufnahme
+        self._record_slot = 0
+        self._record_time = 0     # Uhrzeit des letzten aufgenommenen Rahmens
+        self._clock = StopWatch()
+
+    # --- Aufnahme --------------------------------------------------------
+
+    def begin(self, arg):
+        """Aktion für OP_MACRO_BEGIN: nimmt die folgenden Rahmen unter Platz arg auf."""
+        if not 0 <= arg < self.slots:
+            print("ERR:MACRO")
+            return
+        self._record_slot = arg
+        self._recording = []
+        self._record_time = self._clock.time()
+
+    def capture(self, opcode, arg):
+        """Für CommandReader: nimmt einen Rahmen während der Aufnahme als Schritt auf.
+
+        Gibt True zurück, wenn der Rahmen damit erledigt ist.
+        """
+        steps = self._recording
+        if steps is None or opcode == OP_MACRO_END or opcode == OP_MACRO_CANCEL:
+            return False
+        now = self._clock.time()
+        if opcode == OP_STOP or now - self._record_time > RECORD_TIMEOUT:
+            # Aufnahme verloren; der Rahmen wird normal ausgeführt
+            self._recording = None
+            print("ERR:MACRO")
+            return False
+        self._record_time = now
+        if opcode == OP_MACRO_WAIT:
+            if not steps:
+                # Pause vor dem ersten Befehl
+                steps.append([OP_MACRO_WAIT, 0, 0])
+            steps[-1][2] += max(0, arg)
+        elif opcode == OP_MACRO_BEGIN or opcode == OP_MACRO_RUN or len(steps) >= MACRO_MAX_STEPS:
+            # Keine verschachtelten Makros; die Aufnahme ist verloren
+            self._recording = None
+            print("ERR:MACRO")
+        elif opcode == OP_MACRO_STOP:
+            steps.append([OP_STOP, arg, 0])
+        else:
+            steps.append([opcode, arg, 0])
+        return True
+
+    def end(self, arg):
+        """Aktion für OP_MACRO_END: speichert die Aufnahme, MACRO_START startet sie."""
+        steps = self._recording
+        if steps is None:
+            print("ERR:MACRO")
+            return
+        self._recording = None
+        slot = self._record_slot
+        self.macros[slot] = steps
+        print("MACRO:" + str(slot) + ",STORED,0," + str(len(steps)))
+        if arg == MACRO_START:
+            self.run(slot)
+
+    # --- Abspielen -------------------------------------------------------
+
+    def run(self, arg):
+        """Aktion für OP_MACRO_RUN: spielt das Makro auf Platz arg ab."""
+        steps = self.macros.get(arg)
+        if steps is None:
+            print("ERR:MACRO")
+            return
+        if self._steps is not None:
+            self._finish("CANCEL")
+        self.slot = arg
+        self._steps = steps
+        self._index = 0
+        self._due = self._clock.time()
+        self.poll()
+
+    def cancel(self, arg=0):
+        """Aktion für OP_MACRO_CANCEL: verwirft die Aufnahme und hält das Makro an."""
+        self._recording = None
+        if self._steps is not None:
+            self._finish("CANCEL")
+
+    def interrupt(self, action):
+        """Gibt eine Aktion zurück, die erst das Makro abbricht und dann action ausführt."""
+
+        def interrupting(arg):
+            self.cancel()
+            action(arg)
+
+        return interrupting
+
+    def time_to_next(self, default):
+        """ms bis zum nächsten fälligen Schritt, höchstens default."""
+        if self._steps is None:
+            return default
+        return min(default, self._due - self._clock.time())
+
+    def poll(self):
+        """Führt alle fälligen Schritte des laufenden Makros aus."""
+        steps = self._steps
+        if steps is None:
+            return
+        if self.velocity:
+            self.velocity.keep_alive()
+        now = self._clock.time()
+        while now >= self._due:
+            index = self._index
+            if index == len(steps):
+                self._finish("DONE")
+                return
+            opcode, arg, duration = steps[index]
+            self._index = index + 1
+            self._due += duration
+            print("MACRO:" + str(self.slot) + ",RUN," + str(index + 1) + "," + str(len(steps)))
+            self.dispatch.get(opcode, noop)(arg)
+
+    def _finish(self, state):
+        print("MACRO:" + str(self.slot) + "," + state + "," + str(self._index) + "," + str(len(self._steps)))
+        self.slot = None
+        self._steps = None
@@ -0,0 +1,103 @@
+"""
+Laufzeitmessung der Hauptschleife auf dem Hub.
+
+LoopProfiler zählt, wie lange die Schleifendurchläufe dauern (Histogramm,
+längste Periode, verpasste Termine) und wie viel Zeit auf einzelne Phasen
+entfällt, z. B. Tastenabfrage, Befehle, Motoren und Ausgaben. Ausgeschaltet
+kostet jeder Messpunkt nur einen Methodenaufruf.
+
+Der Mac schaltet die Messung mit OP_PROFILE ein und fordert die
+Zusammenfassung an (Format der "PROF:"-Zeile siehe protocol.py).
+StopWatch zählt in ganzen Millisekunden; kurze Phasen werden deshalb erst
+über viele Durchläufe aussagekräftig.
+"""
+
+from pybricks.tools import StopWatch
+
+from protocol import PROFILE_BUCKETS, PROFILE_OFF, PROFILE_ON, PROFILE_REPORT
+
+# Phasen der Hub-Programme
+PHASE_BUTTONS = 0    # Hub-Tasten abfragen
+PHASE_COMMANDS = 1   # Befehle vom Mac ausführen (mit den Motorbefehlen darin)
+PHASE_MOTORS = 2     # Motoren nach Tasten bzw. Watchdog ansteuern
+PHASE_OUTPUT = 3     # Ausgaben an den Mac (Bestätigungen, Telemetrie)
+PHASES = ('buttons', 'commands', 'motors', 'output')
+
+
+class LoopProfiler:
+    """Misst Periode und Phasen einer Hauptschleife.
+
+    deadline: längste erlaubte Periode in ms, darüber gilt ein Durchlauf
+    als verpasst. phases: Namen der Phasen; start()/stop() bekommen deren
+    Index (Standard: PHASES).
+    """
+
+    def __init__(self, deadline, phases=PHASES):
+        self.deadline = deadline
+        self.phases = phases
+        self.enabled = False
+        self._clock = StopWatch()
+        self.reset()
+
+    def reset(self):
+        self.iterations = 0
+        self.missed = 0
+        self.max_period = 0
+        self.histogram = [0] * (len(PROFILE_BUCKETS) + 1)
+        self.phase_ms = [0] * len(self.phases)
+        self.phase_count = [0] * len(self.phases)
+        self._last = None
+
+    def control(self, arg):
+        """Aktion für OP_PROFILE."""
+        if arg == PROFILE_REPORT:
+            self.report()
+        elif arg == PROFILE_ON:
+            self.reset()
+            self.enabled = True
+        elif arg == PROFILE_OFF:
+            self.enabled = False
+
+    def tick(self):
+        """Am Anfang jedes Durchlaufs aufrufen: misst die Periode seit dem letzten."""
+        if not self.enabled:
+            return
+        now = self._clock.time()
+        last = self._last
+        self._last = now
+        if last is None:
+            return
+        period = now - last
+        self.iterations += 1
+        if period > self.max_period:
+            self.max_period = period
+        if period > self.deadline:
+            self.missed += 1
+        bucket = 0
+        for limit in PROFILE_BUCKETS:
+            if period < limit:
+                break
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def start(self):
+        """Beginn einer Phase; das Ergebnis an stop() weitergeben."""
+        return self._clock.time() if self.enabled else None
+
+    def stop(self, phase, started):
+        """Ende der Phase mit Index phase."""
+        if self.enabled and started is not None:
+            self.phase_ms[phase] += self._clock.time() - started
+            self.phase_count[phase] += 1
+
+    def report(self):
+        """Schickt die Zusammenfassung als "PROF:"-Zeile an den Mac."""
+        parts = [
+            str(self.iterations),
+            str(self.missed),
+            str(self.max_period),
+            '/'.join(str(count) for count in self.histogram),
+        ]
+        for i, name in enumerate(self.phases):
+            parts.append(name + '=' + str(self.phase_ms[i]) + '/' + str(self.phase_count[i]))
+        print('PROF:' + ','.join(parts))
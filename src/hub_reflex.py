@@ -0,0 +1,111 @@
+"""
+Kollisionsschutz für die Hub-Programme.
+
+ObstacleReflex liest den Ultraschallsensor in festem Takt, glättet die
+Messwerte (Median der letzten drei) und bremst den Antrieb, sobald ein
+Hindernis näher ist als der Bremsweg bei der aktuellen Geschwindigkeit.
+Das passiert auf dem Hub selbst: Über Bluetooth käme ein Stop-Befehl vom
+Mac zu spät.
+
+Gebremst wird nur bei Vorwärtsfahrt, der Sensor schaut nach vorn. Der Hub
+meldet jeden Eingriff mit "REFLEX:<abstand>" (siehe protocol.py). Der
+Eingriff rastet nicht ein: Der Reflex vergisst den Sollwert des Antriebs in
+der VelocityControl, sodass der nächste Geschwindigkeits-Befehl (auch eine
+Wiederholung desselben Werts) ihn wieder anfahren lässt; die Programme
+fahren mit gehaltenen Hub-Tasten ebenso wieder an. Ist der Weg noch nicht
+frei, bremst der Reflex beim nächsten Messtakt erneut. Mit
+OP_REFLEX stellt der Mac den Sicherheitsabstand ein oder schaltet den
+Schutz ab, z. B. um mit dem Greifarm an einen Gegenstand heranzufahren.
+"""
+
+from pybricks.tools import StopWatch
+
+SAMPLE_INTERVAL = 30   # ms zwischen zwei Messungen
+MARGIN = 50            # mm, die nach dem Bremsen mindestens frei bleiben sollen
+MM_PER_DEGREE = 0.49   # Fahrstrecke pro Grad am Antrieb (Rad 56 mm, ohne Übersetzung)
+DECELERATION = 2000    # Grad/s², um die der Antrieb beim Bremsen sicher langsamer wird
+STANDSTILL = 10        # Grad/Sekunde, unter denen der Antrieb als stehend gilt
+
+
+class ObstacleReflex:
+    """Bremst motor, wenn sensor ein Hindernis im Bremsweg misst.
+
+    velocity ist die VelocityControl des Programms (oder None).
+    """
+
+    def __init__(self, sensor, motor, velocity=None, margin=MARGIN, interval=SAMPLE_INTERVAL):
+        self.sensor = sensor
+        self.motor = motor
+        self.velocity = velocity
+        self.interval = interval
+        self.margin = 0
+        self.triggered = 0   # Anzahl der Eingriffe
+        self._samples = None
+        self._index = 0
+        self._braking = False
+        self._clock = StopWatch()
+        self._next = 0
+        self.set_margin(margin)
+
+    def set_margin(self, arg):
+        """Aktion für OP_REFLEX: Sicherheitsabstand in mm, 0 schaltet ab."""
+        self.margin = arg if arg > 0 and self.sensor and self.motor else 0
+        self._samples = None
+        self._next = self._clock.time()
+
+    def time_to_next(self, default):
+        """ms bis zur nächsten fälligen Messung, höchstens default."""
+        if not self.margin:
+            return default
+        return min(default, self._next - self._clock.time())
+
+    def braking_distance(self, speed):
+        """Abstand in mm, ab dem bei speed Grad/Sekunde gebremst werden muss.
+
+        Reaktionszeit sind zwei Messtakte (einer bis zur Messung, einer
+        Verzögerung durch den Median).
+        """
+        reaction = speed * 2 * self.interval / 1000
+        stopping = speed * speed / (2 * DECELERATION)
+        return (reaction + stopping) * MM_PER_DEGREE + self.margin
+
+    def poll(self):
+        """Misst, falls fällig, und bremst bei einem Hindernis im Bremsweg.
+
+        Gibt True zurück, wenn in diesem Aufruf gebremst wurde.
+        """
+        if not self.margin:
+            return False
+        now = self._clock.time()
+        if now < self._next:
+            return False
+        self._next += self.interval
+        if self._next <= now:
+            # Zu weit hinterher - nicht nachholen
+            self._next = now + self.interval
+
+        reading = self.sensor.distance()
+        samples = self._samples
+        if samples is None:
+            samples = self._samples = [reading, reading, reading]
+        samples[self._index] = reading
+        self._index = (self._index + 1) % 3
+        a, b, c = samples
+        distance = max(min(a, b), min(max(a, b), c))
+
+        speed = self.motor.speed()
+        if speed <= STANDSTILL:
+            self._braking = False
+            return False
+        if distance > self.braking_distance(speed):
+            return False
+        # Bei jedem Takt bremsen, solange der Antrieb noch vorwärts dreht,
+        # aber nur den Beginn des Eingriffs melden
+        self.motor.brake()
+        if self.velocity:
+            self.velocity.forget(self.motor)
+        if not self._braking:
+            self._braking = True
+            self.triggered += 1
+            print("REFLEX:" + str(distance))
+        return True
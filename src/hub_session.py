@@ -0,0 +1,694 @@
+"""
+Dauerhafte Bluetooth-Sitzung zum Hub für die Mac-Controller.
+
+Statt bei jedem Verbinden `uv run pybricksdev run ble src/main.py` als
+Unterprozess zu starten, hält HubSession eine PybricksHub-Verbindung direkt
+in diesem Prozess offen. Alle Sitzungen teilen sich einen asyncio-Loop in
+einem Hintergrund-Thread, die öffentlichen Methoden können aber ganz normal
+aus Flask- oder Tk-Threads aufgerufen werden.
+
+Ohne Roboter kann SimulatedHub als Ersatz verwendet werden:
+    uv run python src/hub_session.py --simulator
+
+Laufzeitmessung der Hauptschleife (hier im Simulator, siehe hub_sim):
+    uv run python src/hub_session.py --program main.py --profile 5
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import math
+import threading
+import time
+from pathlib import Path
+
+from reactivex.subject import BehaviorSubject, Subject
+from pybricksdev.connections import ConnectionState
+
+from hub_events import (
+    EVENT_ACK, EVENT_BOOT, EVENT_DUP, EVENT_PROFILE, EVENT_READY, EventBus, parse_line,
+)
+from program_cache import hub_id, program_abi, program_id, shared_cache
+from protocol import (
+    COMMAND_OPCODES, OP_PROFILE, OP_TELEMETRY, PROFILE_ON, PROFILE_REPORT,
+    FrameDecoder, encode_frame,
+)
+
+# Standard-Programm, das auf den Hub geladen wird
+DEFAULT_PROGRAM = Path(__file__).parent / 'main.py'
+
+CONNECT_TIMEOUT = 30.0   # Sekunden bis zum Abbruch des Verbindungsaufbaus
+STORED_READY_TIMEOUT = 3.0   # Sekunden, die ein gespeichertes Programm zum Bereitmelden hat
+ACK_TIMEOUT = 1.0        # Sekunden, nach denen ein unbestätigter Befehl als verloren gilt
+RTT_WINDOW = 100         # Bestätigungen, über die die Antwortzeiten ausgewertet werden
+
+
+class EventLoopThread:
+    """asyncio-Loop in einem Daemon-Thread."""
+
+    def __init__(self, name='hub-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Plant eine Coroutine ein und gibt ein concurrent.futures.Future zurück."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, coro, timeout=None):
+        """Führt eine Coroutine aus und wartet blockierend auf das Ergebnis."""
+        return self.submit(coro).result(timeout)
+
+
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+
+def shared_loop():
+    """Gibt den gemeinsamen Hintergrund-Loop zurück (wird bei Bedarf gestartet)."""
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            _shared_loop = EventLoopThread()
+        return _shared_loop
+
+
+async def ble_transport(name=None, timeout=10):
+    """Sucht den Hub per Bluetooth und gibt einen (noch nicht verbundenen) PybricksHub zurück."""
+    from pybricksdev.ble import find_device
+    from pybricksdev.connections.pybricks import PybricksHubBLE
+
+    device = await find_device(name, timeout=timeout)
+    return PybricksHubBLE(device)
+
+
+class SimulatedHub:
+    """
+    Ersatz für PybricksHubBLE ohne Hardware.
+
+    Bietet die Teile der PybricksHub-Schnittstelle, die HubSession benutzt,
+    meldet nach `startup_delay` Sekunden "READY", merkt sich alle
+    empfangenen Daten mit Zeitstempel (time.perf_counter()) und bestätigt
+    Befehlsrahmen wie das Hub-Programm mit "ACK:<seq>". Auf Wunsch schickt
+    er auch Telemetrie-Zeilen mit erfundenen Werten.
+    """
+
+    _max_write_size = 20
+
+    def __init__(self, startup_delay=0.05, link_latency=0.0):
+        self.startup_delay = startup_delay
+        self.link_latency = link_latency
+        self.connection_state_observable = BehaviorSubject(ConnectionState.DISCONNECTED)
+        self._stdout_subject = Subject()
+        self.received = []   # Liste von (Zeitstempel, Bytes)
+        self.decoder = FrameDecoder()
+        self._telemetry_task = None
+
+    @property
+    def stdout_observable(self):
+        return self._stdout_subject
+
+    def emit_line(self, line):
+        """Simuliert eine print()-Ausgabe des Hub-Programms."""
+        self._stdout_subject.on_next((line + '\r\n').encode())
+
+    async def connect(self):
+        self.connection_state_observable.on_next(ConnectionState.CONNECTED)
+
+    async def disconnect(self):
+        self._set_telemetry_rate(0)
+        self.connection_state_observable.on_next(ConnectionState.DISCONNECTED)
+
+    async def run(self, py_path=None, wait=True, print_output=True, line_handler=True):
+        await asyncio.sleep(self.startup_delay)
+        self.emit_line("READY")
+
+    async def write(self, data):
+        if self.connection_state_observable.value != ConnectionState.CONNECTED:
+            raise RuntimeError("not connected")
+        if self.link_latency:
+            await asyncio.sleep(self.link_latency)
+        self.received.append((time.perf_counter(), bytes(data)))
+        for opcode, seq, arg, duplicate in self.decoder.feed(data):
+            if not duplicate:
+                self.on_frame(opcode, seq, arg)
+            self.emit_line(f"DUP:{seq}" if duplicate else f"ACK:{seq}")
+
+    def on_frame(self, opcode, seq, arg):
+        """Wird für jeden neuen Befehlsrahmen aufgerufen (für Unterklassen)."""
+        if opcode == OP_TELEMETRY:
+            self._set_telemetry_rate(arg)
+
+    def _set_telemetry_rate(self, rate):
+        if self._telemetry_task:
+            self._telemetry_task.cancel()
+            self._telemetry_task = None
+        if rate > 0:
+            self._telemetry_task = asyncio.ensure_future(self._send_telemetry(1 / rate))
+
+    async def _send_telemetry(self, interval):
+        start = time.monotonic()
+        while True:
+            elapsed = int((time.monotonic() - start) * 1000)
+            # Abstand schwankt langsam zwischen 100 und 900 mm
+            distance = 500 + int(400 * math.sin(elapsed / 2000))
+            self.emit_line(f"TEL:{elapsed},{distance},0,0,{elapsed // 2},500,0,0,0,0")
+            await asyncio.sleep(interval)
+
+
+class AckTracker:
+    """Verfolgt gesendete Sequenznummern und erkennt verlorene oder doppelte Befehle."""
+
+    def __init__(self, timeout=ACK_TIMEOUT):
+        self.timeout = timeout
+        self.pending = {}   # seq -> Sendezeitpunkt
+        self.sent = 0
+        self.acked = 0
+        self.duplicates = 0
+        self.lost = 0
+        self.last_rtt = None
+        self._rtts = collections.deque(maxlen=RTT_WINDOW)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def next_seq(self):
+        """Vergibt die nächste Sequenznummer und merkt sich den Sendezeitpunkt."""
+        with self._lock:
+            seq = self._seq
+            self._seq = (seq + 1) & 0xFF
+            if seq in self.pending:
+                # Nach 256 Befehlen immer noch keine Bestätigung
+                self.lost += 1
+            self.pending[seq] = time.perf_counter()
+            self.sent += 1
+            return seq
+
+    def on_event(self, event):
+        """Wertet ACK-/DUP-Ereignisse des Hubs aus."""
+        with self._lock:
+            start = self.pending.pop(event['seq'], None)
+            if event['type'] == EVENT_DUP:
+                self.duplicates += 1
+            elif start is not None:
+                self.acked += 1
+                self.last_rtt = time.perf_counter() - start
+                self._rtts.append(self.last_rtt)
+
+    def stats(self):
+        """Gibt die Zähler zurück; überfällige Befehle werden als verloren gezählt."""
+        with self._lock:
+            deadline = time.perf_counter() - self.timeout
+            for seq, start in list(self.pending.items()):
+                if start < deadline:
+                    del self.pending[seq]
+                    self.lost += 1
+            rtts = sorted(self._rtts)
+            return {
+                'sent': self.sent,
+                'acked': self.acked,
+                'pending': len(self.pending),
+                'duplicates': self.duplicates,
+                'lost': self.lost,
+                'last_rtt_ms': None if self.last_rtt is None else self.last_rtt * 1000,
+                # über die letzten RTT_WINDOW Bestätigungen
+                'rtt_p50_ms': rtts[len(rtts) // 2] * 1000 if rtts else None,
+                'rtt_p95_ms': rtts[int(len(rtts) * 0.95)] * 1000 if rtts else None,
+            }
+
+
+def _settle(future, exception=None):
+    """Erfüllt ein Future des Writers, außer der Aufrufer hat es schon abgebrochen."""
+    if future.cancelled():
+        return
+    try:
+        if exception is None:
+            future.set_result(None)
+        else:
+            future.set_exception(exception)
+    except concurrent.futures.InvalidStateError:
+        pass   # gerade eben aus einem anderen Thread abgebrochen
+
+
+async def simulated_transport():
+    """Transport für HubSession, der einen SimulatedHub liefert."""
+    return SimulatedHub()
+
+
+class HubSession:
+    """
+    Langlebige Verbindung zu einem Hub, auf dem ein Steuerprogramm läuft.
+
+    connect() kehrt zurück, sobald das Hub-Programm seine Bereit-Meldung
+    ausgegeben hat. Befehle gehen danach ohne Unterprozess direkt über die
+    offene Verbindung.
+
+    Geschrieben wird ausschließlich von einer Writer-Task im Loop-Thread.
+    write() legt die Daten nur in deren Queue, kann also aus beliebig vielen
+    Threads gleichzeitig aufgerufen werden, ohne dass sich Rahmen vermischen.
+    Was sich in der Queue angesammelt hat, geht gebündelt in einem Paket raus.
+    """
+
+    def __init__(self, program=DEFAULT_PROGRAM, hub_name=None, transport=None,
+                 loop_thread=None, program_cache=None):
+        self.program = str(program)
+        self.hub_name = hub_name
+        # transport: async Funktion ohne Argumente, die einen Hub liefert
+        self.transport = transport or (lambda: ble_transport(hub_name))
+        self.loop_thread = loop_thread or shared_loop()
+        # Übersetzte Programme und Stand je Hub (siehe program_cache.py)
+        self.program_cache = program_cache or shared_cache()
+
+        self.hub = None
+        self.connected = False
+        self.connect_time = None   # Dauer des letzten Verbindungsaufbaus (s)
+        self.boot = None           # Startschritte des Hub-Programms (ms), siehe hub_events.parse_boot
+        self.program_id = None     # Kennung, die das Hub-Programm gemeldet hat (siehe program_cache.py)
+        self.uploaded = None       # ob beim letzten Verbinden hochgeladen wurde
+
+        self.acks = AckTracker()
+        self.supervisor = None     # ReconnectSupervisor, falls automatisch neu verbunden wird
+        self._send_lock = threading.Lock()
+        self.events = EventBus()   # Ausgaben des Hubs als Ereignisse, siehe hub_events.py
+        self.events.subscribe(self.acks.on_event, EVENT_ACK, EVENT_DUP)
+        self._line_listeners = []
+        self._frame_listeners = []
+        self._drop_listeners = []
+        self._connect_listeners = []
+        self._stdout_buf = bytearray()
+        self._ready = None
+        self._subscriptions = []
+        self._write_queue = None
+        self._writer_task = None
+
+    # --- Ausgaben des Hubs -------------------------------------------------
+
+    def add_line_listener(self, callback):
+        """Registriert callback(line) für jede Ausgabezeile des Hubs (unzerlegt).
+
+        Der Callback läuft im Loop-Thread und sollte daher nicht blockieren.
+        Ausgewertete Zeilen liefert session.events.
+        """
+        self._line_listeners = self._line_listeners + [callback]
+
+    def remove_line_listener(self, callback):
+        self._line_listeners = [c for c in self._line_listeners if c != callback]
+
+    def _on_stdout(self, data):
+        # Alle vollständigen Zeilen eines Pakets auf einmal abtrennen; nur
+        # der unvollständige Rest bleibt im Puffer
+        if b'\n' not in data:
+            self._stdout_buf.extend(data)
+            return
+        buffer = self._stdout_buf
+        buffer.extend(data)
+        *lines, rest = buffer.split(b'\n')
+        self._stdout_buf = bytearray(rest)
+        for line in lines:
+            self._on_line(line.rstrip(b'\r').decode(errors='replace'))
+
+    def _on_line(self, line):
+        event = parse_line(line)
+        if self._ready is not None and not self._ready.is_set():
+            if event['type'] == EVENT_BOOT:
+                self.boot = event['steps']
+                self.program_id = event['program']
+            elif event['type'] == EVENT_READY:
+                self._ready.set()
+        for callback in self._line_listeners:
+            try:
+                callback(line)
+            except Exception as e:
+                print(f"Fehler im Zeilen-Listener: {e}")
+        self.events.publish(event)
+
+    def add_frame_listener(self, callback):
+        """Registriert callback(opcode, arg) für jeden gesendeten Befehlsrahmen.
+
+        Der Callback läuft im Thread, der den Rahmen sendet.
+        """
+        self._frame_listeners.append(callback)
+
+    def remove_frame_listener(self, callback):
+        if callback in self._frame_listeners:
+            self._frame_listeners.remove(callback)
+
+    def add_connect_listener(self, callback):
+        """Registriert callback() für jeden Verbindungsaufbau, sobald Befehle möglich sind.
+
+        Der Callback läuft im Loop-Thread.
+        """
+        self._connect_listeners.append(callback)
+
+    def add_drop_listener(self, callback):
+        """Registriert callback() für Verbindungsabbrüche (nicht für disconnect()).
+
+        Der Callback läuft im Loop-Thread.
+        """
+        self._drop_listeners.append(callback)
+
+    def _on_connection_state(self, state):
+        if state == ConnectionState.DISCONNECTED:
+            self._dropped()
+
+    def _dropped(self):
+        if not self.connected:
+            return
+        self.connected = False
+        for callback in self._drop_listeners:
+            self.loop_thread.loop.call_soon_threadsafe(callback)
+
+    # --- Verbindungsaufbau -------------------------------------------------
+
+    async def _connect(self, timeout):
+        start = time.perf_counter()
+        self._ready = asyncio.Event()
+        self._stdout_buf.clear()
+        self.boot = None
+        self.program_id = None
+
+        self.hub = await self.transport()
+        self._subscriptions = [
+            self.hub.stdout_observable.subscribe(self._on_stdout),
+            self.hub.connection_state_observable.subscribe(self._on_connection_state),
+        ]
+        await self.hub.connect()
+        try:
+            await self._start_program(timeout)
+        except BaseException:
+            await self._disconnect()
+            raise
+
+        self._write_queue = asyncio.Queue()
+        self._writer_task = asyncio.ensure_future(self._writer())
+        self.connected = True
+        self.connect_time = time.perf_counter() - start
+        for callback in self._connect_listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Fehler im Verbindungs-Listener: {e}")
+
+    async def _start_program(self, timeout):
+        """Startet das Programm und wartet, bis es sich bereit meldet.
+
+        Hochgeladen wird nur, wenn der Hub nicht schon denselben Stand hat;
+        übersetzt wird nur, wenn sich die Quelltexte geändert haben.
+        """
+        hub = self.hub
+        abi = program_abi(hub)
+        if abi is None:
+            # Simulator oder alte Firmware: wie bisher übersetzen und starten
+            self.uploaded = True
+            await hub.run(self.program, wait=False, print_output=False, line_handler=False)
+            await asyncio.wait_for(self._ready.wait(), timeout)
+            return
+
+        cache = self.program_cache
+        hub_key = hub_id(hub, self.hub_name)
+        digest = cache.digest(self.program, abi)
+        if hub_key and cache.uploaded(hub_key) == digest:
+            self.uploaded = False
+            await hub.run(None, wait=False, print_output=False, line_handler=False)
+            try:
+                await asyncio.wait_for(self._ready.wait(), min(timeout, STORED_READY_TIMEOUT))
+            except asyncio.TimeoutError:
+                pass
+            if self._ready.is_set() and self.program_id == program_id(digest):
+                return
+            # Auf dem Hub liegt ein anderes Programm (es meldet sich nicht
+            # bereit oder mit anderer Kennung, z. B. nach "pybricksdev run")
+            await hub.stop_user_program()
+            cache.forget(hub_key)
+            self._ready.clear()
+            self.boot = None
+            self.program_id = None
+
+        self.uploaded = True
+        await hub.download_user_program(await cache.compile(self.program, abi, digest))
+        if hub_key:
+            cache.remember(hub_key, digest)
+        await hub.run(None, wait=False, print_output=False, line_handler=False)
+        await asyncio.wait_for(self._ready.wait(), timeout)
+
+    async def _disconnect(self):
+        self.connected = False
+        if self._writer_task:
+            self._writer_task.cancel()
+            self._writer_task = None
+        if self._write_queue:
+            # Nicht mehr gesendete Daten verwerfen
+            while not self._write_queue.empty():
+                self._write_queue.get_nowait()[1].cancel()
+            self._write_queue = None
+        for subscription in self._subscriptions:
+            subscription.dispose()
+        self._subscriptions = []
+        if self.hub:
+            try:
+                await self.hub.disconnect()
+            finally:
+                self.hub = None
+
+    def connect(self, timeout=CONNECT_TIMEOUT):
+        """Verbindet mit dem Hub und startet das Programm. Gibt True bei Erfolg zurück."""
+        if self.connected:
+            return True
+        try:
+            self.loop_thread.call(self._connect(timeout), timeout + 5)
+            return True
+        except Exception as e:
+            print(f"Verbindungsfehler: {e}")
+            return False
+
+    @property
+    def available(self):
+        """True, solange Befehle angenommen werden (verbunden oder beim Wiederverbinden)."""
+        return self.connected or bool(self.supervisor and self.supervisor.reconnecting)
+
+    def disconnect(self):
+        """Trennt die Verbindung zum Hub."""
+        if self.supervisor:
+            self.supervisor.cancel()
+        try:
+            self.loop_thread.call(self._disconnect(), 10)
+        except Exception as e:
+            print(f"Fehler beim Trennen: {e}")
+
+    # --- Senden ------------------------------------------------------------
+
+    async def _writer(self):
+        size = self.hub._max_write_size - 1
+        queue = self._write_queue
+        carry = None
+        while True:
+            data, future = carry or await queue.get()
+            carry = None
+            batch = [future]
+            # Alles, was inzwischen dazugekommen ist und ins Paket passt, mitnehmen
+            while not queue.empty():
+                more, future = queue.get_nowait()
+                if len(data) + len(more) > size:
+                    carry = (more, future)
+                    break
+                data += more
+                batch.append(future)
+            try:
+                for i in range(0, len(data), size):
+                    await self.hub.write(data[i:i + size])
+            except Exception as e:
+                # Den Abbruch einmal je Paket melden, nicht je Befehl
+                print(f"Fehler beim Senden: {e}")
+                self._dropped()
+                for future in batch:
+                    _settle(future, e)
+                continue
+            for future in batch:
+                _settle(future)
+
+    def write(self, data):
+        """Schickt Bytes an stdin des Hub-Programms, ohne auf das Senden zu warten.
+
+        Gibt ein concurrent.futures.Future zurück, oder None ohne Verbindung.
+        """
+        if not self.connected:
+            return None
+        future = concurrent.futures.Future()
+        self.loop_thread.loop.call_soon_threadsafe(self._enqueue, bytes(data), future)
+        return future
+
+    def _enqueue(self, data, future):
+        # Läuft im Loop-Thread
+        if self._write_queue is None:
+            future.cancel()
+        else:
+            self._write_queue.put_nowait((data, future))
+
+    def send_frame(self, opcode, arg=0):
+        """Sendet einen Befehlsrahmen mit der nächsten Sequenznummer.
+
+        Gibt das Future von write() zurück, oder None ohne Verbindung.
+        Während der Supervisor neu verbindet, wartet der Rahmen in dessen
+        Warteschlange.
+        """
+        if not self.connected:
+            if self.supervisor and self.supervisor.reconnecting:
+                # Schon jetzt eintragen: der Supervisor stellt nach dem
+                # Wiederverbinden den zuletzt gewünschten Zustand her
+                future = self.supervisor.hold(opcode, arg)
+                self._notify_frame(opcode, arg)
+                return future
+            return None
+        future = self._write_frame(opcode, arg)
+        if future is not None:
+            self._notify_frame(opcode, arg)
+        return future
+
+    def _write_frame(self, opcode, arg):
+        # Sequenz vergeben und einplanen unter einer Sperre, damit die
+        # Rahmen in Sequenz-Reihenfolge beim Hub ankommen
+        with self._send_lock:
+            seq = self.acks.next_seq()
+            return self.write(encode_frame(opcode, seq, arg))
+
+    def _notify_frame(self, opcode, arg):
+        if self.supervisor:
+            self.supervisor.track(opcode, arg)
+        for callback in self._frame_listeners:
+            callback(opcode, arg)
+
+    def send_frames(self, frames):
+        """Sendet mehrere Befehlsrahmen (opcode, arg) als eine Nachricht.
+
+        Die Rahmen gehen mit einem write() an den Writer-Task, also am Stück
+        und in so wenigen Paketen wie möglich (z. B. ein Makro, siehe
+        macros.py). Gibt das Future zurück, oder None ohne Verbindung;
+        beim Wiederverbinden wird nichts zurückgelegt.
+        """
+        frames = list(frames)
+        if not self.connected:
+            return None
+        with self._send_lock:
+            data = b''.join(encode_frame(opcode, self.acks.next_seq(), arg) for opcode, arg in frames)
+            future = self.write(data)
+        if future is not None:
+            for opcode, arg in frames:
+                self._notify_frame(opcode, arg)
+        return future
+
+    def send_command(self, cmd):
+        """Sendet einen Steuerbefehl ('w', 'a', ...) an das Hub-Programm."""
+        opcode = COMMAND_OPCODES.get(cmd)
+        if opcode is None:
+            return False
+        return self.send_frame(opcode) is not None
+
+
+def measure_latency(session, count=200):
+    """Misst, wie lange Befehle von send_command() bis zum (simulierten) Hub brauchen.
+
+    Funktioniert nur mit SimulatedHub, da dieser Empfangszeitpunkte protokolliert.
+    Gibt ein Dictionary mit Zeiten in Millisekunden zurück.
+    """
+    hub = session.hub
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        session.send_frame(COMMAND_OPCODES['x']).result(5)
+        # Zeitpunkt, an dem das letzte Paket des Befehls angekommen ist
+        latencies.append((hub.received[-1][0] - start) * 1000)
+    latencies.sort()
+
+    time.sleep(0.05)   # letzte Bestätigungen abwarten
+    return {
+        'connect_ms': session.connect_time * 1000,
+        'commands': len(latencies),
+        'median_ms': latencies[len(latencies) // 2],
+        'max_ms': latencies[-1],
+        **session.acks.stats(),
+    }
+
+
+def request_profile(session, timeout=2.0):
+    """Fordert die Laufzeitmessung des Hub-Programms an (siehe hub_profile.py).
+
+    Gibt die ausgewertete "PROF:"-Zeile zurück, oder None ohne Antwort.
+    """
+    result = {}
+    received = threading.Event()
+
+    def on_profile(event):
+        result.update(event)
+        del result['type']
+        received.set()
+
+    session.events.subscribe(on_profile, EVENT_PROFILE)
+    try:
+        session.send_frame(OP_PROFILE, PROFILE_REPORT)
+        return result if received.wait(timeout) else None
+    finally:
+        session.events.unsubscribe(on_profile)
+
+
+def print_profile(profile):
+    from protocol import PROFILE_BUCKETS
+
+    print(f"  Durchläufe: {profile['iterations']}, verpasst: {profile['missed']}, "
+          f"längster: {profile['max_ms']} ms")
+    labels = [f"<{limit}" for limit in PROFILE_BUCKETS] + [f">={PROFILE_BUCKETS[-1]}"]
+    print("  Perioden (ms): " + "  ".join(
+        f"{label}: {count}" for label, count in zip(labels, profile['histogram'])))
+    for name, phase in profile['phases'].items():
+        print(f"  {name:<9} {phase['ms']:6d} ms in {phase['count']} Aufrufen")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Verbindungs- und Befehlslatenz messen")
+    parser.add_argument('--simulator', action='store_true',
+                        help="SimulatedHub statt echtem Roboter verwenden")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="simulierte Funk-Latenz in Sekunden")
+    parser.add_argument('--program', help="Hub-Programm im Simulator ausführen (hub_sim)")
+    parser.add_argument('--profile', type=float, metavar='SEKUNDEN',
+                        help="Hauptschleife so lange vermessen und Ergebnis anzeigen")
+    args = parser.parse_args()
+
+    if args.program:
+        from hub_sim.transport import ProgramHub
+
+        async def transport():
+            return ProgramHub(args.program)
+        session = HubSession(program=args.program, transport=transport)
+    elif args.simulator:
+        async def transport():
+            return SimulatedHub(link_latency=args.latency)
+        session = HubSession(transport=transport)
+    else:
+        session = HubSession()
+
+    print("Verbinde...")
+    if not session.connect():
+        raise SystemExit(1)
+    print(f"Bereit nach {session.connect_time * 1000:.1f} ms"
+          + (" (Programm hochgeladen)" if session.uploaded else " (Programm war schon auf dem Hub)"))
+    if session.boot:
+        print("  Start auf dem Hub: " + ", ".join(
+            f"{name} {ms} ms" for name, ms in session.boot.items()))
+
+    if args.profile:
+        session.send_frame(OP_PROFILE, PROFILE_ON)
+        time.sleep(args.profile)
+        profile = request_profile(session)
+        if profile is None:
+            print("Keine Antwort - unterstützt das Programm OP_PROFILE?")
+        else:
+            print_profile(profile)
+    elif args.simulator:
+        for key, value in measure_latency(session).items():
+            print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
+    session.disconnect()
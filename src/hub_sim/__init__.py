@@ -0,0 +1,95 @@
+"""
+Software-Simulator für die Hub-Programme.
+
+Führt main.py, main_advanced.py und main_simple.py unverändert auf dem Mac
+(oder im CI) aus: Statt der echten Pybricks-Module bekommen die Programme
+Nachbauten mit virtueller Uhr, Motoren mit kinematischem Modell, einem
+Ultraschallsensor mit vorgegebenen Messwerten, Hub-Tasten nach Drehbuch und
+einem stdin, über das Befehlsrahmen ankommen.
+
+Beispiel:
+    world = World(duration=5000)
+    world.press(Button.LEFT, at=1000, duration=500)
+    run_program('main.py', world)
+    print(world.lines())
+
+Oder von der Kommandozeile (im Ordner src/):
+    python -m hub_sim main.py --duration 5000 --press LEFT@1000+500
+"""
+
+import builtins
+import importlib.util
+from pathlib import Path
+
+from hub_sim.pybricks_api import Button, Color, Port, build_modules
+from hub_sim.world import OutputCapture, World
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+__all__ = ['World', 'Button', 'Color', 'Port', 'run_program']
+
+
+def run_program(program, world=None, **world_options):
+    """Führt ein Hub-Programm in der Simulation aus und gibt die World zurück.
+
+    program ist ein Pfad, relativ zu src/ oder absolut. Das Programm läuft,
+    bis es sich selbst beendet oder die virtuelle Zeit world.clock.duration
+    erreicht ist.
+
+    Das Programm bekommt eigene Builtins: print() schreibt in die World und
+    import liefert die Ersatz-Module bzw. eigene Kopien der Module neben dem
+    Programm (hub_io, protocol, ...). sys.modules und sys.stdout bleiben
+    unverändert, mehrere Programme können also gleichzeitig in eigenen
+    Threads laufen.
+    """
+    world = world or World(**world_options)
+    path = Path(program)
+    if not path.is_absolute():
+        path = SRC_DIR / path
+    path = path.resolve()
+
+    sim_builtins = _Importer(world, path.parent).builtins
+    code = compile(path.read_text(encoding='utf-8'), str(path), 'exec')
+    namespace = {'__name__': '__main__', '__file__': str(path), '__builtins__': sim_builtins}
+    try:
+        exec(code, namespace)
+    except KeyboardInterrupt:
+        # Zeitlimit erreicht, bevor das Programm einen eigenen Handler dafür hatte
+        pass
+    return world
+
+
+class _Importer:
+    """Eigene Builtins für ein simuliertes Programm (print und import)."""
+
+    def __init__(self, world, directory):
+        self.fake_modules = build_modules(world)
+        self.directory = directory
+        self.modules = {}   # Module neben dem Programm, einmal pro Lauf geladen
+        output = OutputCapture(world)
+
+        def sim_print(*args, sep=' ', end='\n', file=None, flush=False):
+            output.write(sep.join(str(arg) for arg in args) + end)
+
+        self.builtins = dict(builtins.__dict__, print=sim_print, __import__=self.import_)
+
+    def import_(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if name in self.fake_modules:
+            if fromlist or '.' not in name:
+                return self.fake_modules[name]
+            return self.fake_modules[name.split('.')[0]]
+        if level == 0 and '.' not in name:
+            module = self.modules.get(name)
+            if module is None and (self.directory / f'{name}.py').exists():
+                module = self._load(name)
+            if module is not None:
+                return module
+        return builtins.__import__(name, globals, locals, fromlist, level)
+
+    def _load(self, name):
+        spec = importlib.util.spec_from_file_location(name, self.directory / f'{name}.py')
+        module = importlib.util.module_from_spec(spec)
+        module.__builtins__ = self.builtins
+        self.modules[name] = module
+        spec.loader.exec_module(module)
+        return module
@@ -0,0 +1,76 @@
+"""
+Kommandozeile für den Hub-Simulator (im Ordner src/ aufrufen):
+
+    python -m hub_sim main.py --duration 5000 --press LEFT@1000+500 --send 2000:w
+
+--press TASTE@START+DAUER hält eine Hub-Taste gedrückt, --send ZEIT:BEFEHL
+schickt einen Tastenbefehl ('w', 'x', ...) als Befehlsrahmen über stdin.
+Alle Zeiten in Millisekunden virtueller Zeit.
+"""
+
+import argparse
+import time
+
+from hub_sim import Button, World, run_program
+from protocol import COMMAND_OPCODES, encode_frame
+
+
+def parse_press(text):
+    name, _, timing = text.partition('@')
+    start, _, duration = timing.partition('+')
+    return getattr(Button, name.upper()), float(start or 0), float(duration or 100)
+
+
+def parse_send(text):
+    at, _, cmd = text.partition(':')
+    if cmd not in COMMAND_OPCODES:
+        raise argparse.ArgumentTypeError(f"unbekannter Befehl: {cmd!r}")
+    return float(at), cmd
+
+
+def parse_angle(text):
+    port, _, angle = text.partition('=')
+    return port.upper(), float(angle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hub-Programm in der Simulation ausführen")
+    parser.add_argument('program', help="z. B. main.py, main_advanced.py oder main_simple.py")
+    parser.add_argument('--duration', type=float, default=10000,
+                        help="virtuelle Laufzeit in ms (Standard: %(default)s)")
+    parser.add_argument('--ports', default='ABCDF',
+                        help="Ports mit angeschlossenem Gerät (Standard: %(default)s)")
+    parser.add_argument('--distance', type=float, default=500,
+                        help="Messwert des Ultraschallsensors in mm")
+    parser.add_argument('--angle', type=parse_angle, action='append', default=[],
+                        metavar='PORT=GRAD', help="Motorwinkel beim Start, z. B. A=90")
+    parser.add_argument('--press', type=parse_press, action='append', default=[],
+                        metavar='TASTE@START+DAUER')
+    parser.add_argument('--send', type=parse_send, action='append', default=[],
+                        metavar='ZEIT:BEFEHL')
+    parser.add_argument('--realtime', action='store_true',
+                        help="virtuelle Uhr an die echte Zeit koppeln")
+    parser.add_argument('--quiet', action='store_true', help="Ausgaben nicht anzeigen")
+    args = parser.parse_args()
+
+    world = World(ports=args.ports, distance=args.distance,
+                  duration=args.duration, realtime=args.realtime,
+                  angles=dict(args.angle))
+    for button, start, duration in args.press:
+        world.press(button, start, duration)
+    for seq, (at, cmd) in enumerate(args.send):
+        world.stdin.feed(encode_frame(COMMAND_OPCODES[cmd], seq), at)
+
+    start = time.perf_counter()
+    run_program(args.program, world)
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        for t, line in world.output:
+            print(f"{t:9.1f}  {line}")
+    print(f"\n{world.now / 1000:.2f} s simuliert in {elapsed:.2f} s "
+          f"({world.now / 1000 / max(elapsed, 1e-9):.0f}x Echtzeit)")
+
+
+if __name__ == '__main__':
+    main()
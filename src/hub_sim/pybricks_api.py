@@ -0,0 +1,356 @@
+"""
+Nachbau der Teile der Pybricks-API, die die Hub-Programme benutzen.
+
+build_modules() liefert Modul-Objekte für pybricks.hubs, pybricks.pupdevices,
+pybricks.parameters, pybricks.tools, usys und uselect, die alle an dieselbe
+World gebunden sind.
+"""
+
+import math
+import types
+
+MAX_SPEED = 1000       # Grad/Sekunde
+ACCELERATION = 2000    # Grad/Sekunde², wie die Standardeinstellung von Pybricks
+COAST_DECEL = 1500     # Abbremsen ohne Regelung (stop)
+BRAKE_DECEL = 4000     # Abbremsen mit Kurzschlussbremse (brake)
+STEP = 1.0             # ms, Schrittweite der Bewegungsrechnung
+TARGET_TOLERANCE = 1   # Grad, ab denen ein Ziel als erreicht gilt
+
+
+class _Enum:
+    """Einfache Aufzählung mit lesbarer Darstellung (Port.A, Color.RED, ...)."""
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+
+    def __repr__(self):
+        return f"{self.kind}.{self.name}"
+
+
+def _enum(kind, names):
+    return type(kind, (), {name: _Enum(kind, name) for name in names})
+
+
+Port = _enum('Port', ('A', 'B', 'C', 'D', 'E', 'F'))
+Button = _enum('Button', ('LEFT', 'RIGHT', 'CENTER', 'BLUETOOTH'))
+Stop = _enum('Stop', ('COAST', 'BRAKE', 'HOLD', 'NONE'))
+Direction = _enum('Direction', ('CLOCKWISE', 'COUNTERCLOCKWISE'))
+Side = _enum('Side', ('TOP', 'BOTTOM', 'LEFT', 'RIGHT', 'FRONT', 'BACK'))
+Color = _enum('Color', ('NONE', 'BLACK', 'GRAY', 'WHITE', 'RED', 'ORANGE', 'BROWN',
+                        'YELLOW', 'GREEN', 'CYAN', 'BLUE', 'VIOLET', 'MAGENTA'))
+
+
+class SimMotor:
+    """Motor mit einfachem kinematischem Modell.
+
+    Geschwindigkeiten ändern sich höchstens mit ACCELERATION, run_target
+    bremst rechtzeitig vor dem Ziel (Trapez-Profil). Der Zustand wird erst
+    beim nächsten Zugriff bis zur aktuellen virtuellen Zeit nachgerechnet.
+    """
+
+    def __init__(self, world, port):
+        self.world = world
+        self.port = port
+        self._angle = float(world.angles.get(port.name, 0))
+        self._speed = 0.0
+        self._t = world.now
+        self._mode = 'coast'       # coast, brake, hold, speed, target
+        self._target_speed = 0.0
+        self._target_angle = 0.0
+        self._end = None           # Ende von run_time()
+        self._then = Stop.HOLD
+
+    # --- Bewegungsmodell ---------------------------------------------------
+
+    def _update(self):
+        now = self.world.now
+        while self._t < now:
+            if self._idle():
+                self._t = now
+                break
+            if self._cruising():
+                # Konstante Geschwindigkeit: in einem Schritt bis zum Ende rechnen
+                end = now if self._end is None else min(now, self._end)
+                self._angle += self._speed * (end - self._t) / 1000
+                self._t = end
+                self._check_end()
+                continue
+            dt = min(STEP, now - self._t)
+            self._step(dt / 1000)
+            self._t += dt
+            self._check_end()
+
+    def _idle(self):
+        return self._speed == 0 and self._mode in ('coast', 'brake', 'hold')
+
+    def _cruising(self):
+        return self._mode == 'speed' and self._speed == self._target_speed
+
+    def _check_end(self):
+        if self._end is not None and self._t >= self._end:
+            self._end = None
+            self._finish()
+
+    def _finish(self):
+        # Verhalten nach run_time()/run_target() je nach "then"
+        if self._then in (Stop.COAST, Stop.NONE):
+            self._mode = 'coast'
+        elif self._then == Stop.BRAKE:
+            self._mode = 'brake'
+        else:
+            self._mode = 'hold'
+
+    def _approach(self, desired, accel, dt):
+        delta = desired - self._speed
+        limit = accel * dt
+        self._speed = desired if abs(delta) <= limit else self._speed + math.copysign(limit, delta)
+
+    def _step(self, dt):
+        mode = self._mode
+        if mode == 'speed':
+            self._approach(self._target_speed, ACCELERATION, dt)
+        elif mode == 'coast':
+            self._approach(0.0, COAST_DECEL, dt)
+        elif mode == 'brake':
+            self._approach(0.0, BRAKE_DECEL, dt)
+        elif mode == 'hold':
+            self._approach(0.0, ACCELERATION, dt)
+        elif mode == 'target':
+            remaining = self._target_angle - self._angle
+            if abs(remaining) <= TARGET_TOLERANCE and abs(self._speed) <= ACCELERATION * dt:
+                self._angle = self._target_angle
+                self._speed = 0.0
+                self._finish()
+                return
+            # Höchstens so schnell, dass bis zum Ziel noch gebremst werden kann
+            reachable = math.sqrt(2 * ACCELERATION * abs(remaining))
+            desired = math.copysign(min(abs(self._target_speed), reachable), remaining)
+            self._approach(desired, ACCELERATION, dt)
+        self._angle += self._speed * dt
+
+    def _command(self, mode, speed=0.0, end=None, then=Stop.HOLD):
+        self.world.clock.tick()
+        self._update()
+        self._mode = mode
+        self._target_speed = max(-MAX_SPEED, min(MAX_SPEED, speed))
+        self._end = end
+        self._then = then
+        self.world.actuated(self.port.name, mode)
+
+    def _wait_done(self):
+        clock = self.world.clock
+        while not self.done():
+            clock.advance(STEP)
+
+    # --- Pybricks-Schnittstelle ---------------------------------------------
+
+    def angle(self):
+        self.world.clock.tick()
+        self._update()
+        return int(round(self._angle))
+
+    def speed(self):
+        self.world.clock.tick()
+        self._update()
+        return int(self._speed)
+
+    def reset_angle(self, angle=None):
+        self._update()
+        self._angle = 0.0 if angle is None else float(angle)
+        if self._mode == 'target':
+            self._mode = 'hold'
+
+    def run(self, speed):
+        self._command('speed', speed)
+
+    def run_time(self, speed, time, then=Stop.HOLD, wait=True):
+        self._command('speed', speed, end=self.world.now + time, then=then)
+        if wait:
+            self._wait_done()
+
+    def run_target(self, speed, target_angle, then=Stop.HOLD, wait=True):
+        self._command('target', abs(speed), then=then)
+        self._target_angle = float(target_angle)
+        if wait:
+            self._wait_done()
+
+    def run_angle(self, speed, rotation_angle, then=Stop.HOLD, wait=True):
+        self._update()
+        target = self._angle + math.copysign(rotation_angle, speed)
+        self.run_target(speed, target, then, wait)
+
+    def track_target(self, target_angle):
+        self._command('hold')
+        self._angle = float(target_angle)
+
+    def hold(self):
+        self._command('hold')
+
+    def stop(self):
+        self._command('coast')
+
+    def brake(self):
+        self._command('brake')
+
+    def dc(self, duty):
+        self._command('speed', MAX_SPEED * duty / 100)
+
+    def done(self):
+        self._update()
+        return self._mode not in ('speed', 'target')
+
+    def stalled(self):
+        return False
+
+    def load(self):
+        return 0
+
+
+class SimUltrasonicSensor:
+    """Ultraschallsensor, dessen Messwerte die World vorgibt."""
+
+    def __init__(self, world, port):
+        self.world = world
+        self.port = port
+        self.lights = types.SimpleNamespace(on=lambda brightness=100: None,
+                                            off=lambda: None)
+
+    def distance(self):
+        self.world.clock.tick()
+        return self.world.read_distance()
+
+    def presence(self):
+        return False
+
+
+class _Light:
+    def __init__(self, world):
+        self.world = world
+
+    def on(self, color):
+        self.world.clock.tick()
+        self.world.lights.append((self.world.now, color))
+
+    def off(self):
+        self.on(Color.NONE)
+
+    def blink(self, color, durations):
+        self.on(color)
+
+    def animate(self, colors, interval):
+        if colors:
+            self.on(colors[0])
+
+
+class _Buttons:
+    def __init__(self, world):
+        self.world = world
+
+    def pressed(self):
+        self.world.clock.tick()
+        return self.world.pressed_buttons()
+
+
+class _Silent:
+    """Platzhalter für Hub-Teile ohne Wirkung in der Simulation (Display, Lautsprecher)."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class SimInventorHub:
+    def __init__(self, world):
+        self.light = _Light(world)
+        self.buttons = _Buttons(world)
+        self.display = _Silent()
+        self.speaker = _Silent()
+        self.system = _Silent()
+        self.imu = _Silent()
+
+
+def build_modules(world):
+    """Erzeugt die Ersatz-Module für das Programm im Kontext von world."""
+
+    def device(cls, kind):
+        def create(port, *args, **kwargs):
+            world.clock.tick()
+            if port.name not in world.ports:
+                raise OSError(19, f"{kind} an Port {port.name} nicht gefunden")
+            instance = cls(world, port)
+            if cls is SimMotor:
+                world.motors[port.name] = instance
+            return instance
+        return create
+
+    class StopWatch:
+        def __init__(self):
+            self._start = world.now
+            self._paused = None
+
+        def time(self):
+            world.clock.tick()
+            end = world.now if self._paused is None else self._paused
+            return int(end - self._start)
+
+        def reset(self):
+            self._start = world.now
+            if self._paused is not None:
+                self._paused = world.now
+
+        def pause(self):
+            if self._paused is None:
+                self._paused = world.now
+
+        def resume(self):
+            if self._paused is not None:
+                self._start += world.now - self._paused
+                self._paused = None
+
+    def wait(time):
+        world.clock.advance(time)
+
+    class Poll:
+        def __init__(self):
+            self._streams = []
+
+        def register(self, stream, eventmask=1):
+            self._streams.append(stream)
+
+        def poll(self, timeout=-1):
+            world.clock.tick()
+            if world.stdin in self._streams and world.stdin.wait(timeout):
+                return [(world.stdin, POLLIN)]
+            return []
+
+    POLLIN = 1
+
+    modules = {
+        'pybricks': {},
+        'pybricks.parameters': {
+            'Port': Port, 'Button': Button, 'Color': Color, 'Stop': Stop,
+            'Direction': Direction, 'Side': Side,
+        },
+        'pybricks.tools': {'wait': wait, 'StopWatch': StopWatch},
+        'pybricks.hubs': {
+            'InventorHub': lambda *args, **kwargs: SimInventorHub(world),
+            'PrimeHub': lambda *args, **kwargs: SimInventorHub(world),
+        },
+        'pybricks.pupdevices': {
+            'Motor': device(SimMotor, 'Motor'),
+            'UltrasonicSensor': device(SimUltrasonicSensor, 'Sensor'),
+        },
+        'usys': {'stdin': world.stdin},
+        'uselect': {'poll': Poll, 'POLLIN': POLLIN},
+    }
+
+    result = {}
+    for name, attributes in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        result[name] = module
+    for name, module in result.items():
+        if name.startswith('pybricks.'):
+            setattr(result['pybricks'], name.split('.')[1], module)
+    result['pybricks'].__path__ = []
+    return result
@@ -0,0 +1,69 @@
+"""
+Simulierter Hub als Transport für HubSession.
+
+ProgramHub bietet dieselbe Schnittstelle wie SimulatedHub in hub_session.py,
+führt aber das echte Hub-Programm im Simulator aus (mit an die echte Zeit
+gekoppelter Uhr). So lässt sich der ganze Weg vom Controller bis zum
+Motorbefehl ohne Roboter messen.
+"""
+
+import asyncio
+import threading
+
+from pybricksdev.connections import ConnectionState
+from reactivex.subject import BehaviorSubject, Subject
+
+from hub_sim import run_program
+from hub_sim.world import World
+
+
+class ProgramHub:
+    """Führt program bei run() in einem eigenen Thread im Simulator aus."""
+
+    _max_write_size = 20
+
+    def __init__(self, program='main.py', ports='ABCDF', distance=500, on_actuation=None):
+        self.program = program
+        self.ports = ports
+        self.distance = distance
+        self.on_actuation = on_actuation
+        self.world = None
+        self.connection_state_observable = BehaviorSubject(ConnectionState.DISCONNECTED)
+        self._stdout_subject = Subject()
+        self._thread = None
+        self._loop = None
+
+    @property
+    def stdout_observable(self):
+        return self._stdout_subject
+
+    def _emit(self, line):
+        # Läuft im Programm-Thread; Ausgaben im Loop-Thread weitergeben
+        data = (line + '\r\n').encode()
+        self._loop.call_soon_threadsafe(self._stdout_subject.on_next, data)
+
+    async def connect(self):
+        self.connection_state_observable.on_next(ConnectionState.CONNECTED)
+
+    async def run(self, py_path=None, wait=True, print_output=True, line_handler=True):
+        self._loop = asyncio.get_running_loop()
+        self.world = World(ports=self.ports, distance=self.distance, realtime=True)
+        self.world.line_listeners.append(self._emit)
+        if self.on_actuation:
+            self.world.actuation_listeners.append(self.on_actuation)
+        self._thread = threading.Thread(target=run_program, args=(py_path or self.program, self.world),
+                                        name='hub-program', daemon=True)
+        self._thread.start()
+
+    async def write(self, data):
+        if self.connection_state_observable.value != ConnectionState.CONNECTED:
+            raise RuntimeError("not connected")
+        self.world.stdin.feed(data)
+
+    async def disconnect(self):
+        if self._thread:
+            # Wie die Stopp-Taste am Hub: KeyboardInterrupt beim nächsten Warten
+            self.world.clock.duration = self.world.now
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join, 5)
+            self._thread = None
+        self.connection_state_observable.on_next(ConnectionState.DISCONNECTED)
@@ -0,0 +1,196 @@
+"""
+Virtuelle Umgebung eines simulierten Hubs: Uhr, stdin, Tasten, Sensorwerte.
+
+Die Uhr läuft nur weiter, wenn das Hub-Programm wartet (wait(), poll())
+oder eine Hub-Funktion aufruft (jeder Aufruf kostet CALL_COST ms). Ohne
+realtime=True läuft ein Programm deshalb so schnell, wie der Rechner kann.
+"""
+
+import threading
+import time
+
+CALL_COST = 0.05   # ms virtuelle Rechenzeit pro Aufruf einer Hub-Funktion
+
+
+class VirtualClock:
+    """Millisekunden-Uhr des simulierten Hubs.
+
+    Erreicht die Uhr `duration`, wird einmalig KeyboardInterrupt ausgelöst –
+    so, als hätte jemand das Programm am Hub gestoppt. Die Aufräumarbeiten
+    im finally-Block des Programms laufen danach normal weiter.
+    """
+
+    def __init__(self, duration=None, realtime=False):
+        self.now = 0.0
+        self.duration = duration
+        self.realtime = realtime
+        self.interrupted = False
+        self._start = time.perf_counter()
+
+    def advance(self, ms):
+        """Lässt ms Millisekunden vergehen."""
+        if ms > 0:
+            self.now += ms
+            if self.realtime:
+                delay = self._start + self.now / 1000 - time.perf_counter()
+                if delay > 0.001:
+                    time.sleep(delay)
+        if self.duration is not None and self.now >= self.duration and not self.interrupted:
+            self.interrupted = True
+            raise KeyboardInterrupt
+
+    def advance_to(self, t):
+        self.advance(t - self.now)
+
+    def tick(self):
+        self.advance(CALL_COST)
+
+
+class SimStdin:
+    """stdin des Hub-Programms; Bytes kommen zu festgelegten Zeitpunkten an."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.buffer = self   # Programme lesen über stdin.buffer.read()
+        self._data = []      # Liste von (Ankunftszeit, Byte), nach Zeit sortiert
+        self._cond = threading.Condition()
+
+    def feed(self, data, at=None):
+        """Lässt data zum Zeitpunkt at (ms, Standard: jetzt) ankommen."""
+        at = self.clock.now if at is None else at
+        with self._cond:
+            self._data.extend((at, byte) for byte in data)
+            self._data.sort(key=lambda item: item[0])
+            self._cond.notify_all()
+
+    def available(self):
+        """Anzahl bereits angekommener Bytes."""
+        now = self.clock.now
+        with self._cond:
+            count = 0
+            for at, _ in self._data:
+                if at > now:
+                    break
+                count += 1
+            return count
+
+    def next_arrival(self):
+        with self._cond:
+            return self._data[0][0] if self._data else None
+
+    def wait(self, timeout):
+        """Wartet höchstens timeout ms (None: unbegrenzt) auf angekommene Bytes."""
+        clock = self.clock
+        deadline = None if timeout is None or timeout < 0 else clock.now + timeout
+        while not self.available():
+            if deadline is not None and clock.now >= deadline:
+                return False
+            if clock.realtime:
+                # Andere Threads können jederzeit Daten liefern
+                step = 10 if deadline is None else min(10, deadline - clock.now)
+                with self._cond:
+                    self._cond.wait(step / 1000)
+                clock.advance(max(0.0, (time.perf_counter() - clock._start) * 1000 - clock.now))
+                continue
+            arrival = self.next_arrival()
+            if arrival is None and deadline is None:
+                if clock.duration is None:
+                    raise RuntimeError("Programm wartet auf stdin, aber es kommen keine Daten mehr")
+                clock.advance_to(clock.duration)
+            elif arrival is None or (deadline is not None and arrival > deadline):
+                clock.advance_to(deadline)
+            else:
+                clock.advance_to(arrival)
+        return True
+
+    def read(self, size=1):
+        """Liest bis zu size angekommene Bytes."""
+        self.clock.tick()
+        now = self.clock.now
+        with self._cond:
+            count = 0
+            while count < size and count < len(self._data) and self._data[count][0] <= now:
+                count += 1
+            data = bytes(byte for _, byte in self._data[:count])
+            self._data = self._data[count:]
+        return data
+
+
+class World:
+    """Alles, was ein simuliertes Hub-Programm von außen sieht.
+
+    - ports: Ports mit angeschlossenem Gerät ('A'..'F'); fehlende Geräte
+      lösen wie auf dem Hub OSError aus
+    - distance: Abstand in mm, als Zahl oder Funktion f(zeit_ms)
+    - angles: Winkel der Motoren beim Programmstart, z. B. {'A': 90}
+      (Pybricks setzt ihn auf die absolute Position, Standard 0)
+    - press(): Tastendrücke zu festen Zeiten
+    - stdin.feed(): Bytes vom Mac zu festen Zeiten
+
+    Ausgaben des Programms landen mit Zeitstempel in `output`,
+    Farbwechsel der Hub-LED in `lights`. line_listeners bzw.
+    actuation_listeners werden für jede Ausgabezeile bzw. jeden Motorbefehl
+    aufgerufen.
+    """
+
+    def __init__(self, ports='ABCDF', distance=500, duration=None, realtime=False,
+                 angles=None):
+        self.clock = VirtualClock(duration, realtime)
+        self.stdin = SimStdin(self.clock)
+        self.ports = set(ports)
+        self.distance = distance
+        self.angles = dict(angles or {})
+        self.output = []    # Liste von (zeit_ms, zeile)
+        self.lights = []    # Liste von (zeit_ms, farbe)
+        self.motors = {}    # Port-Buchstabe -> SimMotor
+        self.line_listeners = []
+        self.actuation_listeners = []   # callback(port, modus)
+        self._presses = []  # Liste von (start, ende, taste)
+
+    @property
+    def now(self):
+        return self.clock.now
+
+    def press(self, button, at, duration=100):
+        """Hält button ab Zeitpunkt at (ms) für duration ms gedrückt."""
+        self._presses.append((at, at + duration, button))
+
+    def pressed_buttons(self):
+        now = self.clock.now
+        return {button for start, end, button in self._presses if start <= now < end}
+
+    def read_distance(self):
+        if callable(self.distance):
+            return int(self.distance(self.clock.now))
+        return int(self.distance)
+
+    def emit(self, line):
+        self.output.append((self.clock.now, line))
+        for callback in self.line_listeners:
+            callback(line)
+
+    def actuated(self, port, mode):
+        for callback in self.actuation_listeners:
+            callback(port, mode)
+
+    def lines(self):
+        """Nur die Ausgabezeilen, ohne Zeitstempel."""
+        return [line for _, line in self.output]
+
+
+class OutputCapture:
+    """Ersetzt sys.stdout während der Simulation und zerlegt die Ausgabe in Zeilen."""
+
+    def __init__(self, world):
+        self.world = world
+        self._buf = ''
+
+    def write(self, text):
+        self._buf += text
+        while '\n' in self._buf:
+            line, self._buf = self._buf.split('\n', 1)
+            self.world.emit(line.rstrip('\r'))
+        return len(text)
+
+    def flush(self):
+        pass
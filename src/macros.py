@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Makros vom Mac aus: Befehlsfolgen auf den Hub laden und dort abspielen.
+
+Ein Makro ist eine Folge von Schritten (befehl, dauer_ms). befehl ist ein
+Tastenbefehl wie 'w' oder 'x' oder ein Tupel (opcode, arg), z. B.
+(OP_DRIVE_SPEED, 400); dauer_ms ist die Zeit bis zum nächsten Schritt.
+Stop-Schritte gehen als OP_MACRO_STOP an den Hub: Ein echter Stop-Rahmen
+bricht dort jede Aufnahme ab.
+Das Makro geht als eine Nachricht an den Hub (HubSession.send_frames) und
+läuft dort nach der Uhr des Hubs ab (siehe hub_macro.py), unabhängig von
+den Schwankungen der Bluetooth-Verbindung.
+
+    library = MacroLibrary(session)
+    library.define('quadrat', [('w', 2000), ('d', 1000), ('0', 500)] * 4)
+    library.run('quadrat')                  # ein Rahmen
+    library.play([('w', 2000), ('x', 0)])   # einmalig, ohne Namen
+    library.cancel()
+
+Benannte Makros bekommen feste Plätze auf dem Hub und werden nach jedem
+Neustart des Hub-Programms (z. B. nach dem Wiederverbinden) neu geladen.
+
+Kommandozeile (im Ordner src/), spielt die Demo-Folge aus main.py ab:
+    python macros.py --program main_simple.py   # im Simulator (hub_sim)
+    python macros.py                            # echter Roboter
+"""
+
+import threading
+import time
+
+from hub_events import EVENT_ERROR, EVENT_MACRO
+from protocol import (
+    COMMAND_OPCODES, MACRO_MAX_STEPS, MACRO_SLOTS, MACRO_START, MACRO_STORE,
+    OP_MACRO_BEGIN, OP_MACRO_CANCEL, OP_MACRO_END, OP_MACRO_RUN, OP_MACRO_STOP,
+    OP_MACRO_WAIT, OP_STOP,
+)
+
+SCRATCH_SLOT = 0         # Platz für play(), benannte Makros ab 1
+MAX_WAIT = 0x7FFF        # ms je OP_MACRO_WAIT-Rahmen, längere Pausen werden geteilt
+FINISHED = ('DONE', 'CANCEL')
+
+# Die auskommentierte Demo-Sequenz aus main.py
+DEMO = [
+    ('w', 2000), ('x', 0),
+    ('a', 1000), ('0', 0),
+    ('w', 2000), ('x', 0),
+    ('d', 1000), ('0', 0),
+    ('s', 2000), ('x', 0),
+]
+
+
+def macro_frames(slot, steps, start=False):
+    """Rahmen (opcode, arg), die steps als Makro auf Platz slot laden.
+
+    Mit start=True spielt der Hub das Makro gleich nach dem Laden ab.
+    """
+    if not 0 <= slot < MACRO_SLOTS:
+        raise ValueError(f"Makro-Platz {slot} gibt es nicht (0..{MACRO_SLOTS - 1})")
+    if len(steps) > MACRO_MAX_STEPS:
+        raise ValueError(f"Makro hat {len(steps)} Schritte, höchstens {MACRO_MAX_STEPS}")
+    frames = [(OP_MACRO_BEGIN, slot)]
+    for command, duration in steps:
+        if isinstance(command, str):
+            if command not in COMMAND_OPCODES:
+                raise ValueError(f"Unbekannter Befehl: {command!r}")
+            command = (COMMAND_OPCODES[command], 0)
+        opcode, arg = command
+        if opcode == OP_STOP:
+            opcode = OP_MACRO_STOP
+        frames.append((opcode, arg))
+        duration = int(duration)
+        while duration > 0:
+            frames.append((OP_MACRO_WAIT, min(duration, MAX_WAIT)))
+            duration -= MAX_WAIT
+    frames.append((OP_MACRO_END, MACRO_START if start else MACRO_STORE))
+    return frames
+
+
+class MacroLibrary:
+    """Benannte Makros einer HubSession (thread-sicher)."""
+
+    def __init__(self, session):
+        self.session = session
+        self.progress = {}   # Platz -> letztes EVENT_MACRO
+        self.errors = 0      # "ERR:MACRO" vom Hub
+        self._macros = {}    # Name -> (Platz, Schritte)
+        self._changed = threading.Condition()
+        session.events.subscribe(self._on_event, EVENT_MACRO, EVENT_ERROR)
+        # Nach jedem Verbinden läuft ein neu gestartetes Hub-Programm ohne Makros
+        session.add_connect_listener(self.upload)
+
+    def _on_event(self, event):
+        if event['type'] == EVENT_MACRO:
+            with self._changed:
+                self.progress[event['slot']] = event
+                self._changed.notify_all()
+        elif event['reason'] == 'MACRO':
+            self.errors += 1
+
+    @property
+    def names(self):
+        return sorted(self._macros)
+
+    def slot(self, name):
+        return self._macros[name][0]
+
+    def define(self, name, steps):
+        """Legt das Makro name an (oder ersetzt es) und lädt es auf den Hub.
+
+        Gibt den Platz auf dem Hub zurück.
+        """
+        steps = list(steps)
+        with self._changed:
+            if name in self._macros:
+                slot = self._macros[name][0]
+            else:
+                used = {slot for slot, _ in self._macros.values()}
+                free = [slot for slot in range(SCRATCH_SLOT + 1, MACRO_SLOTS) if slot not in used]
+                if not free:
+                    raise ValueError(f"Alle {MACRO_SLOTS - 1} Makro-Plätze sind belegt")
+                slot = free[0]
+            frames = macro_frames(slot, steps)
+            self._macros[name] = (slot, steps)
+        self.session.send_frames(frames)
+        return slot
+
+    def upload(self):
+        """Lädt alle benannten Makros erneut auf den Hub (eine Nachricht)."""
+        with self._changed:
+            frames = [frame for slot, steps in self._macros.values()
+                      for frame in macro_frames(slot, steps)]
+        if frames:
+            self.session.send_frames(frames)
+
+    def run(self, name):
+        """Startet das Makro name auf dem Hub. Gibt das Future des Rahmens zurück."""
+        slot = self.slot(name)
+        self._forget(slot)
+        return self.session.send_frame(OP_MACRO_RUN, slot)
+
+    def play(self, steps):
+        """Lädt steps auf den freien Platz SCRATCH_SLOT und startet sie sofort."""
+        self._forget(SCRATCH_SLOT)
+        return self.session.send_frames(macro_frames(SCRATCH_SLOT, list(steps), start=True))
+
+    def cancel(self):
+        """Hält das laufende Makro an (die Motoren stoppt erst ein Stop-Befehl)."""
+        return self.session.send_frame(OP_MACRO_CANCEL)
+
+    def _forget(self, slot):
+        with self._changed:
+            self.progress.pop(slot, None)
+
+    def wait(self, slot, timeout=None):
+        """Wartet, bis das Makro auf Platz slot fertig ist oder abgebrochen wurde.
+
+        Gibt das letzte EVENT_MACRO zurück, oder None nach timeout Sekunden.
+        """
+        def finished():
+            event = self.progress.get(slot)
+            return event is not None and event['state'] in FINISHED
+
+        with self._changed:
+            if self._changed.wait_for(finished, timeout):
+                return self.progress[slot]
+            return None
+
+
+def main():
+    import argparse
+
+    from hub_session import HubSession
+
+    parser = argparse.ArgumentParser(description="Demo-Folge aus main.py als Makro abspielen")
+    parser.add_argument('--program', help="Hub-Programm im Simulator ausführen (hub_sim)")
+    args = parser.parse_args()
+
+    if args.program:
+        from hub_sim.transport import ProgramHub
+
+        async def transport():
+            return ProgramHub(args.program)
+        session = HubSession(program=args.program, transport=transport)
+    else:
+        session = HubSession()
+
+    start = time.perf_counter()
+
+    def on_macro(event):
+        print(f"{(time.perf_counter() - start) * 1000:8.0f} ms  Platz {event['slot']}: "
+              f"{event['state']} {event['step']}/{event['steps']}")
+
+    library = MacroLibrary(session)
+    session.events.subscribe(on_macro, EVENT_MACRO)
+    print("Verbinde...")
+    if not session.connect():
+        raise SystemExit(1)
+    library.define('demo', DEMO)
+    start = time.perf_counter()
+    library.run('demo')
+    total = sum(duration for _, duration in DEMO) / 1000
+    if library.wait(library.slot('demo'), total + 5) is None:
+        print("Keine Fertig-Meldung vom Hub - unterstützt das Programm Makros?")
+    session.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,26 @@ Nutze die Hub-Tasten für Links/Rechts-Lenkung.
 """
 
 from pybricks.hubs import InventorHub
-from pybricks.pupdevices import Motor, UltrasonicSensor
-from pybricks.parameters import Port, Button, Color
-from pybricks.tools import wait
+from pybricks.parameters import Button, Color
+from pybricks.tools import StopWatch
+
+from hub_buttons import ButtonState
+from hub_devices import BootTimer, probe, start_centering
+from hub_drive import VelocityControl
+from hub_io import CommandReader, Telemetry, build_dispatch, noop
+from hub_macro import MacroRunner
+from hub_profile import PHASE_BUTTONS, PHASE_MOTORS, PHASE_OUTPUT, LoopProfiler
+from hub_reflex import ObstacleReflex
+from protocol import (
+    COMMAND_OPCODES, OP_FORWARD, OP_BACKWARD, OP_LEFT, OP_RIGHT, OP_ARM_UP,
+    OP_ARM_DOWN, OP_ARM_LEFT, OP_ARM_RIGHT, OP_STOP, OP_CENTER, OP_MEASURE,
+    OP_DRIVE_SPEED, OP_STEER_ANGLE, OP_ARM_ROTATE_SPEED, OP_ARM_LIFT_SPEED,
+    OP_WATCHDOG, OP_TELEMETRY, OP_PROFILE, OP_REFLEX, OP_MACRO_BEGIN,
+    OP_MACRO_END, OP_MACRO_RUN, OP_MACRO_CANCEL,
+)
 
 # Hub initialisieren
+boot = BootTimer()
 hub = InventorHub()
 
 # Geschwindigkeiten und Winkel
@@ -18,51 +33,34 @@ STEERING_ANGLE = 45      # Maximaler Lenkwinkel
 ARM_ROTATE_SPEED = 300   # Greifarm Drehgeschwindigkeit
 ARM_LIFT_SPEED = 300     # Greifarm Hebe-Geschwindigkeit
 
+BUTTON_INTERVAL = 50     # Abstand zwischen zwei Abfragen der Hub-Tasten (ms)
+BUTTON_SLACK = 10        # ms Verspätung der Tastenabfrage, ab der ein Termin als verpasst gilt
+
 # Motoren und Sensoren mit Fehlerbehandlung initialisieren
 print("Initialisiere Geräte...")
 #hub.light.on((100, 100, 0))  # Gelb = wird initialisiert
 
-steering_motor = None
-drive_motor = None
-arm_rotate_motor = None
-arm_lift_motor = None
-distance_sensor = None
-
-try:
-    steering_motor = Motor(Port.A)
-    print("✓ Motor A (Lenkung) gefunden")
-except OSError:
-    print("✗ Motor A (Lenkung) nicht gefunden")
-
-try:
-    drive_motor = Motor(Port.B)
-    print("✓ Motor B (Antrieb) gefunden")
-except OSError:
-    print("✗ Motor B (Antrieb) nicht gefunden")
+def report_device(port, label, found):
+    if found:
+        print("✓ Port " + port + " (" + label + ") gefunden")
+    else:
+        print("✗ Port " + port + " (" + label + ") nicht gefunden")
 
-try:
-    arm_rotate_motor = Motor(Port.C)
-    print("✓ Motor C (Greifarm Drehung) gefunden")
-except OSError:
-    print("✗ Motor C (Greifarm Drehung) nicht gefunden")
 
-try:
-    arm_lift_motor = Motor(Port.D)
-    print("✓ Motor D (Greifarm Hoch/Runter) gefunden")
-except OSError:
-    print("✗ Motor D (Greifarm Hoch/Runter) nicht gefunden")
+devices = probe(report_device, boot)
+steering_motor = devices['steering']
+drive_motor = devices['drive']
+arm_rotate_motor = devices['arm_rotate']
+arm_lift_motor = devices['arm_lift']
+distance_sensor = devices['distance']
 
-try:
-    distance_sensor = UltrasonicSensor(Port.F)
-    print("✓ Sensor F (Ultraschall-Abstandssensor) gefunden")
-except OSError:
-    distance_sensor = None
-    print("✗ Sensor F (Ultraschall-Abstandssensor) nicht gefunden")
-
-# Lenkung in Mittelposition bringen, falls vorhanden
+# Lenkung in Mittelposition bringen, falls vorhanden. Das läuft im
+# Hintergrund weiter, während das Programm schon Befehle annimmt.
 if steering_motor:
     print("Zentriere Lenkung...")
-    steering_motor.run_target(300, 0, wait=True)
+    start_centering(steering_motor)
+boot.step('center')
+boot.report()
 
 print("\n=== Roboter bereit! ===")
 print("Hub-Tasten-Steuerung:")
@@ -73,174 +71,230 @@ print("  Bluetooth-Taste = Beenden")
 hub.light.on(Color.GREEN)  # Grün = bereit
 
 
+# Aktionen für die Befehle vom Mac. Jede Aktion bekommt das Argument des
+# Befehlsrahmens (siehe protocol.py) und wird nur für vorhandene Geräte in
+# die Befehlstabelle eingetragen.
+
+def forward(arg):
+    print("Vorwärts")
+    drive_motor.run_time(DRIVE_SPEED, 1000, wait=False)
+    hub.light.on(Color.BLUE)  # Blau
+
+
+def backward(arg):
+    print("Rückwärts")
+    drive_motor.run_time(-DRIVE_SPEED, 1000, wait=False)
+    hub.light.on(Color.YELLOW)  # Gelb
+
+
+def steer_left(arg):
+    print("Links")
+    steering_motor.run_target(500, -STEERING_ANGLE, wait=False)
+
+
+def steer_right(arg):
+    print("Rechts")
+    steering_motor.run_target(500, STEERING_ANGLE, wait=False)
+
+
+def arm_up(arg):
+    print("Arm hoch")
+    arm_lift_motor.run_time(ARM_LIFT_SPEED, 1000, wait=False)
+
+
+def arm_down(arg):
+    print("Arm runter")
+    arm_lift_motor.run_time(-ARM_LIFT_SPEED, 1000, wait=False)
+
+
+def arm_left(arg):
+    print("Arm links")
+    arm_rotate_motor.run_time(-ARM_ROTATE_SPEED, 1000, wait=False)
+
+
+def arm_right(arg):
+    print("Arm rechts")
+    arm_rotate_motor.run_time(ARM_ROTATE_SPEED, 1000, wait=False)
+
+
+def center_steering(arg):
+    print("Zentriere Lenkung")
+    steering_motor.run_target(500, 0, wait=True)
+
+
+def measure_distance(arg):
+    try:
+        distance = distance_sensor.distance()
+        print(f"Abstand: {distance} mm")
+    except Exception as e:
+        print(f"Sensor-Fehler: {e}")
+
+
+# Soll-Geschwindigkeiten mit Totmann-Schaltung (siehe hub_drive.py)
+velocity = VelocityControl()
+
+# Regelmäßige Sensor- und Motorwerte für den Mac
+telemetry = Telemetry(distance_sensor, (steering_motor, drive_motor, arm_rotate_motor, arm_lift_motor))
+
+# Kollisionsschutz: bremst den Antrieb vor Hindernissen (siehe hub_reflex.py)
+reflex = ObstacleReflex(distance_sensor, drive_motor, velocity)
+
+# Laufzeitmessung der Hauptschleife, vom Mac per OP_PROFILE gesteuert
+profiler = LoopProfiler(BUTTON_INTERVAL + BUTTON_SLACK)
+
+# Beim Stoppen nur die vorhandenen Motoren ansprechen
+stop_actions = [motor.stop for motor in (drive_motor, arm_rotate_motor, arm_lift_motor) if motor]
+if steering_motor:
+    stop_actions.append(steering_motor.hold)
+
+
+def stop_all(arg):
+    print("Stop")
+    for action in stop_actions:
+        action()
+    velocity.reset()
+    hub.light.on(Color.GREEN)  # Grün
+
+
+# Befehlstabelle: Opcode -> Aktion, einmalig beim Start aufgebaut
+dispatch = build_dispatch((
+    (OP_FORWARD, drive_motor, forward),
+    (OP_BACKWARD, drive_motor, backward),
+    (OP_LEFT, steering_motor, steer_left),
+    (OP_RIGHT, steering_motor, steer_right),
+    (OP_ARM_UP, arm_lift_motor, arm_up),
+    (OP_ARM_DOWN, arm_lift_motor, arm_down),
+    (OP_ARM_LEFT, arm_rotate_motor, arm_left),
+    (OP_ARM_RIGHT, arm_rotate_motor, arm_right),
+    (OP_STOP, hub, stop_all),
+    (OP_CENTER, steering_motor, center_steering),
+    (OP_MEASURE, distance_sensor, measure_distance),
+    # Kontinuierlicher Fahrmodus
+    (OP_DRIVE_SPEED, drive_motor, velocity.speed_action(drive_motor)),
+    (OP_STEER_ANGLE, steering_motor, velocity.steering_action(steering_motor, STEERING_ANGLE)),
+    (OP_ARM_ROTATE_SPEED, arm_rotate_motor, velocity.speed_action(arm_rotate_motor)),
+    (OP_ARM_LIFT_SPEED, arm_lift_motor, velocity.speed_action(arm_lift_motor)),
+    (OP_WATCHDOG, hub, velocity.set_timeout),
+    (OP_TELEMETRY, hub, telemetry.set_rate),
+    (OP_PROFILE, hub, profiler.control),
+    (OP_REFLEX, hub, reflex.set_margin),
+))
+
+# Makros: Befehlsfolgen, die der Hub nach eigener Uhr abspielt (siehe
+# hub_macro.py). Ein Stop vom Mac bricht ein laufendes Makro ab.
+macros = MacroRunner(dispatch, velocity)
+dispatch.update(build_dispatch((
+    (OP_MACRO_BEGIN, hub, macros.begin),
+    (OP_MACRO_END, hub, macros.end),
+    (OP_MACRO_RUN, hub, macros.run),
+    (OP_MACRO_CANCEL, hub, macros.cancel),
+    (OP_STOP, hub, macros.interrupt(stop_all)),
+)))
+
+
 def execute_command(cmd):
-    """Führt einen Steuerbefehl aus."""
-    cmd = cmd.lower().strip()
-    
-    if cmd == 'w':
-        # Vorwärts fahren
-        if drive_motor:
-            print("Vorwärts")
-            drive_motor.run_time(DRIVE_SPEED, 1000, wait=False)
-            hub.light.on(Color.BLUE)  # Blau
-        else:
-            print("Motor B nicht verfügbar")
-        
-    elif cmd == 's':
-        # Rückwärts fahren
-        if drive_motor:
-            print("Rückwärts")
-            drive_motor.run_time(-DRIVE_SPEED, 1000, wait=False)
-            hub.light.on(Color.YELLOW)  # Gelb
-        else:
-            print("Motor B nicht verfügbar")
-        
-    elif cmd == 'a':
-        # Links lenken
-        if steering_motor:
-            print("Links")
-            steering_motor.run_target(500, -STEERING_ANGLE, wait=False)
-        else:
-            print("Motor A nicht verfügbar")
-        
-    elif cmd == 'd':
-        # Rechts lenken
-        if steering_motor:
-            print("Rechts")
-            steering_motor.run_target(500, STEERING_ANGLE, wait=False)
-        else:
-            print("Motor A nicht verfügbar")
-        
-    elif cmd == 'i':
-        # Greifarm hoch
-        if arm_lift_motor:
-            print("Arm hoch")
-            arm_lift_motor.run_time(ARM_LIFT_SPEED, 1000, wait=False)
-        else:
-            print("Motor D nicht verfügbar")
-        
-    elif cmd == 'k':
-        # Greifarm runter
-        if arm_lift_motor:
-            print("Arm runter")
-            arm_lift_motor.run_time(-ARM_LIFT_SPEED, 1000, wait=False)
-        else:
-            print("Motor D nicht verfügbar")
-        
-    elif cmd == 'j':
-        # Greifarm links drehen
-        if arm_rotate_motor:
-            print("Arm links")
-            arm_rotate_motor.run_time(-ARM_ROTATE_SPEED, 1000, wait=False)
-        else:
-            print("Motor C nicht verfügbar")
-        
-    elif cmd == 'l':
-        # Greifarm rechts drehen
-        if arm_rotate_motor:
-            print("Arm rechts")
-            arm_rotate_motor.run_time(ARM_ROTATE_SPEED, 1000, wait=False)
-        else:
-            print("Motor C nicht verfügbar")
-        
-    elif cmd == 'x' or cmd == ' ':
-        # Alles stoppen
+    """Führt einen Steuerbefehl aus ('w', 'a', ... wie auf der Tastatur)."""
+    opcode = COMMAND_OPCODES.get(cmd.lower().strip())
+    if opcode is None:
+        print(f"Unbekannter Befehl: {cmd}")
+    else:
+        dispatch.get(opcode, noop)(0)
+
+
+# Fahren mit den Hub-Tasten: (links, rechts) -> (Lenkwinkel, Meldung, LED-Farbe).
+# Keine Taste bedeutet Stop.
+BUTTON_DRIVE = {
+    (True, True): (0, "Vorwärts geradeaus", Color.BLUE),
+    (True, False): (-STEERING_ANGLE, "Links + Vorwärts", Color.CYAN),
+    (False, True): (STEERING_ANGLE, "Rechts + Vorwärts", Color.MAGENTA),
+}
+
+
+def drive_by_buttons(drive, previous):
+    """Setzt den Fahrzustand drive aus BUTTON_DRIVE (None = Stop).
+
+    Motorbefehle gehen nur an Motoren, deren Sollwert sich gegenüber
+    previous ändert.
+    """
+    if drive is None:
         print("Stop")
+        hub.light.on(Color.GREEN)
         if drive_motor:
             drive_motor.stop()
         if steering_motor:
             steering_motor.hold()
-        if arm_rotate_motor:
-            arm_rotate_motor.stop()
-        if arm_lift_motor:
-            arm_lift_motor.stop()
-        hub.light.on(Color.GREEN)  # Grün
-        
-    elif cmd == 'm':
-        # Abstand messen
-        if distance_sensor:
-            try:
-                distance = distance_sensor.distance()
-                print(f"Abstand: {distance} mm")
-            except Exception as e:
-                print(f"Sensor-Fehler: {e}")
-        else:
-            print("Sensor F nicht verfügbar")
-    
-    elif cmd == '0':
-        # Lenkung zentrieren
-        if steering_motor:
-            print("Zentriere Lenkung")
-            steering_motor.run_target(500, 0, wait=True)
-        else:
-            print("Motor A nicht verfügbar")
-    
-    else:
-        print(f"Unbekannter Befehl: {cmd}")
+        return
+    angle, message, color = drive
+    print(message)
+    hub.light.on(color)
+    if drive_motor and previous is None:
+        drive_motor.run(DRIVE_SPEED)
+    if steering_motor:
+        steering_motor.run_target(500, angle, wait=False)
 
 
 # Hauptsteuerungsschleife mit Hub-Tasten
 try:
     print("\n🎮 Steuerung aktiv!")
     
-    # Fahrmodus-Variable
-    is_driving = False
+    # Aktueller Fahrzustand aus BUTTON_DRIVE (None = steht)
+    button_drive = None
+    
+    # Befehle vom Mac und Takt der Tastenabfrage
+    reader = CommandReader(dispatch, profiler, macros.capture)
+    buttons = ButtonState(hub.buttons)
+    button_timer = StopWatch()
     
     while True:
-        # Prüfe Hub-Tasten
-        pressed = hub.buttons.pressed()
+        # Befehle vom Mac sofort ausführen
+        reader.process()
+        started = profiler.start()
+        macros.poll()
+        velocity.check()
+        if reflex.poll() and button_drive is not None:
+            # Gebremst: mit weiter gehaltenen Tasten beim nächsten
+            # Tastentakt wieder anfahren
+            button_drive = None
+        profiler.stop(PHASE_MOTORS, started)
+        started = profiler.start()
+        telemetry.poll()
+        profiler.stop(PHASE_OUTPUT, started)
+        
+        # Bis zur nächsten Tastenabfrage (oder Telemetrie-Zeile,
+        # Abstandsmessung bzw. dem nächsten Makro-Schritt) auf weitere
+        # Befehle warten
+        remaining = BUTTON_INTERVAL - button_timer.time()
+        if remaining > 0:
+            timeout = reflex.time_to_next(telemetry.time_to_next(remaining))
+            reader.wait(max(0, macros.time_to_next(timeout)))
+            continue
+        button_timer.reset()
+        profiler.tick()
+        
+        # Prüfe Hub-Tasten; Motorbefehle nur, wenn sich etwas geändert hat
+        # (oder der Kollisionsschutz gebremst hat)
+        started = profiler.start()
+        changed = buttons.update()
+        profiler.stop(PHASE_BUTTONS, started)
+        if not changed and button_drive is not None:
+            continue
+        pressed = buttons.pressed
         
         if Button.BLUETOOTH in pressed:
             # Bluetooth-Taste beendet Programm
             print("Beende...")
             break
         
-        # Beide Tasten = Vorwärts geradeaus
-        elif Button.LEFT in pressed and Button.RIGHT in pressed:
-            if not is_driving:
-                print("Vorwärts geradeaus")
-                hub.light.on(Color.BLUE)
-            if drive_motor:
-                drive_motor.run(DRIVE_SPEED)
-            if steering_motor:
-                steering_motor.run_target(500, 0, wait=False)
-            is_driving = True
-            
-        # Nur linke Taste = Links lenken + vorwärts
-        elif Button.LEFT in pressed:
-            if not is_driving:
-                print("Links + Vorwärts")
-                hub.light.on(Color.CYAN)
-            if drive_motor:
-                drive_motor.run(DRIVE_SPEED)
-            if steering_motor:
-                steering_motor.run_target(500, -STEERING_ANGLE, wait=False)
-            is_driving = True
-            
-        # Nur rechte Taste = Rechts lenken + vorwärts
-        elif Button.RIGHT in pressed:
-            if not is_driving:
-                print("Rechts + Vorwärts")
-                hub.light.on(Color.MAGENTA)
-            if drive_motor:
-                drive_motor.run(DRIVE_SPEED)
-            if steering_motor:
-                steering_motor.run_target(500, STEERING_ANGLE, wait=False)
-            is_driving = True
-            
-        # Keine Taste = Stop
-        else:
-            if is_driving:
-                print("Stop")
-                hub.light.on(Color.GREEN)
-                if drive_motor:
-                    drive_motor.stop()
-                if steering_motor:
-                    steering_motor.hold()
-                is_driving = False
+        started = profiler.start()
+        drive = BUTTON_DRIVE.get((Button.LEFT in pressed, Button.RIGHT in pressed))
+        if drive != button_drive:
+            drive_by_buttons(drive, button_drive)
+            button_drive = drive
+        profiler.stop(PHASE_MOTORS, started)
         
         # Alternativ: Einfache Demo-Sequenz
         # Auskommentieren, um automatische Demo zu aktivieren
+        # (vom Mac aus geht das als Makro, siehe macros.py)
         """
         print("\nDemo-Sequenz:")
         execute_command('w')
@@ -266,8 +320,6 @@ try:
         print("Demo beendet.")
         break
         """
-        
-        wait(50)
 
 except KeyboardInterrupt:
     print("\nUnterbrochen")
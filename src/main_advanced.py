@@ -10,14 +10,26 @@ Hub-Tasten Steuerung:
 Modi:
 1. Fahr-Modus (Blau): Lenken + Fahren
 2. Arm-Modus (Lila): Greifarm steuern
+
+Vom Mac nimmt das Programm nur OP_PROFILE (Laufzeitmessung der
+Hauptschleife, siehe hub_profile.py) und OP_REFLEX (Kollisionsschutz,
+siehe hub_reflex.py) an.
 """
 
 from pybricks.hubs import InventorHub
-from pybricks.pupdevices import Motor, UltrasonicSensor
-from pybricks.parameters import Port, Button, Color
-from pybricks.tools import wait, StopWatch
+from pybricks.parameters import Button, Color
+from pybricks.tools import StopWatch
+
+from hub_buttons import ButtonState
+from hub_devices import BootTimer, probe, start_centering
+from hub_io import CommandReader, build_dispatch
+from hub_loop import LoopTimer
+from hub_profile import PHASE_BUTTONS, PHASE_MOTORS, LoopProfiler
+from hub_reflex import ObstacleReflex
+from protocol import OP_PROFILE, OP_REFLEX
 
 # Hub initialisieren
+boot = BootTimer()
 hub = InventorHub()
 
 # Geschwindigkeiten
@@ -26,48 +38,28 @@ STEERING_ANGLE = 45
 ARM_ROTATE_SPEED = 300
 ARM_LIFT_SPEED = 300
 
+LOOP_RATE = 20       # Schleifendurchläufe pro Sekunde (alle 50 ms)
+LOOP_SLACK = 10      # ms, um die ein Durchlauf länger dauern darf, bevor er als verpasst gilt
+MODE_DEBOUNCE = 500  # ms nach einem Moduswechsel, in denen Links/Rechts ignoriert werden
+
 # Geräte initialisieren
 print("Initialisiere...")
 
-steering_motor = None
-drive_motor = None
-arm_rotate_motor = None
-arm_lift_motor = None
-distance_sensor = None
+def report_device(port, label, found):
+    print(("✓ " if found else "✗ ") + label + " (" + port + ")")
 
-try:
-    steering_motor = Motor(Port.A)
-    print("✓ Lenkung (A)")
-except:
-    print("✗ Lenkung (A)")
 
-try:
-    drive_motor = Motor(Port.B)
-    print("✓ Antrieb (B)")
-except:
-    print("✗ Antrieb (B)")
+devices = probe(report_device, boot)
+steering_motor = devices['steering']
+drive_motor = devices['drive']
+arm_rotate_motor = devices['arm_rotate']
+arm_lift_motor = devices['arm_lift']
+distance_sensor = devices['distance']
 
-try:
-    arm_rotate_motor = Motor(Port.C)
-    print("✓ Arm-Drehung (C)")
-except:
-    print("✗ Arm-Drehung (C)")
-
-try:
-    arm_lift_motor = Motor(Port.D)
-    print("✓ Arm-Heben (D)")
-except:
-    print("✗ Arm-Heben (D)")
-
-try:
-    distance_sensor = UltrasonicSensor(Port.F)
-    print("✓ Sensor (F)")
-except:
-    print("✗ Sensor (F)")
-
-# Lenkung zentrieren
-if steering_motor:
-    steering_motor.run_target(300, 0, wait=True)
+# Lenkung zentrieren (läuft im Hintergrund weiter)
+start_centering(steering_motor)
+boot.step('center')
+boot.report()
 
 print("\n=== BEREIT ===")
 
@@ -92,137 +84,151 @@ print("Bluetooth kurz: Modus")
 print("Bluetooth lang: Ende")
 hub.light.on(mode_colors[current_mode])
 
+# Sollzustand je Tastenkombination (links, rechts); keine Taste bedeutet Stop
+# Fahr-Modus: (Meldung, LED-Farbe, Lenkwinkel)
+DRIVE_ACTIONS = {
+    (True, True): ("Vorwärts", Color.CYAN, 0),
+    (True, False): ("Links + Vor", Color.GREEN, -STEERING_ANGLE),
+    (False, True): ("Rechts + Vor", Color.YELLOW, STEERING_ANGLE),
+}
+# Arm-Modus: (Meldung, LED-Farbe, Drehgeschwindigkeit, Hebegeschwindigkeit)
+ARM_ACTIONS = {
+    (True, True): ("Arm HOCH", Color.WHITE, 0, ARM_LIFT_SPEED),
+    (True, False): ("Arm LINKS", Color.ORANGE, -ARM_ROTATE_SPEED, 0),
+    (False, True): ("Arm RECHTS", Color.VIOLET, ARM_ROTATE_SPEED, 0),
+}
+
+
+def run_or_stop(motor, speed, previous):
+    """Ändert die Geschwindigkeit von motor nur, wenn sie sich von previous unterscheidet."""
+    if motor and speed != previous:
+        if speed:
+            motor.run(speed)
+        else:
+            motor.stop()
+
+
+def apply_drive(action, previous):
+    """Setzt den Fahr-Sollzustand action (None = Stop)."""
+    if action is None:
+        print("Stop")
+        hub.light.on(mode_colors[MODE_DRIVE])
+        if drive_motor:
+            drive_motor.stop()
+        if steering_motor:
+            steering_motor.hold()
+        return
+    message, color, angle = action
+    print(message)
+    hub.light.on(color)
+    if drive_motor and previous is None:
+        drive_motor.run(DRIVE_SPEED)
+    if steering_motor:
+        steering_motor.run_target(500, angle, wait=False)
+
+
+def apply_arm(action, previous):
+    """Setzt den Arm-Sollzustand action (None = Stop)."""
+    if action is None:
+        print("Stop")
+        hub.light.on(mode_colors[MODE_ARM])
+        rotate = lift = 0
+    else:
+        message, color, rotate, lift = action
+        print(message)
+        hub.light.on(color)
+    old_rotate = old_lift = 0
+    if previous is not None:
+        old_rotate, old_lift = previous[2], previous[3]
+    run_or_stop(arm_rotate_motor, rotate, old_rotate)
+    run_or_stop(arm_lift_motor, lift, old_lift)
+
+
+mode_actions = {
+    MODE_DRIVE: (DRIVE_ACTIONS, apply_drive),
+    MODE_ARM: (ARM_ACTIONS, apply_arm),
+}
+
+# Takt der Hauptschleife und Laufzeitmessung (vom Mac per OP_PROFILE gesteuert)
+loop_timer = LoopTimer(LOOP_RATE)
+profiler = LoopProfiler(loop_timer.interval + LOOP_SLACK)
+
+# Kollisionsschutz: bremst den Antrieb vor Hindernissen. Er misst nur einmal
+# pro Durchlauf, der Bremsweg rechnet daher mit dem Takt der Schleife
+reflex = ObstacleReflex(distance_sensor, drive_motor, interval=loop_timer.interval)
+
+reader = CommandReader(build_dispatch((
+    (OP_PROFILE, hub, profiler.control),
+    (OP_REFLEX, hub, reflex.set_margin),
+)), profiler)
+
 # Hauptschleife
 try:
-    is_active = False
+    # Zuletzt gesetzter Sollzustand (None = alle Motoren stehen)
+    action = None
+    buttons = ButtonState(hub.buttons)
     bluetooth_timer = StopWatch()
-    bluetooth_pressed = False
+    mode_timer = StopWatch()
+    mode_settling = False
     
     while True:
-        pressed = hub.buttons.pressed()
+        profiler.tick()
+        reader.process()
+        
+        started = profiler.start()
+        buttons.update()
+        profiler.stop(PHASE_BUTTONS, started)
+        pressed = buttons.pressed
         
         # Bluetooth-Taste für Modus-Wechsel oder Beenden
-        if Button.BLUETOOTH in pressed:
-            if not bluetooth_pressed:
-                bluetooth_timer.reset()
-                bluetooth_pressed = True
-        else:
-            if bluetooth_pressed:
-                # Taste wurde losgelassen
-                press_time = bluetooth_timer.time()
-                
-                if press_time > 2000:
-                    # Lang gedrückt (>2s) = Beenden
-                    print("\nBeende...")
-                    break
-                else:
-                    # Kurz gedrückt = Modus wechseln
-                    current_mode = (current_mode + 1) % 2
-                    print(f"\n{mode_names[current_mode]}")
-                    hub.light.on(mode_colors[current_mode])
-                    
-                    # Stop alle Motoren beim Wechsel
-                    if drive_motor:
-                        drive_motor.stop()
-                    if steering_motor:
-                        steering_motor.hold()
-                    if arm_rotate_motor:
-                        arm_rotate_motor.stop()
-                    if arm_lift_motor:
-                        arm_lift_motor.stop()
-                    
-                    wait(500)  # Kurze Pause
-                
-                bluetooth_pressed = False
+        if Button.BLUETOOTH in buttons.down:
+            bluetooth_timer.reset()
+        elif Button.BLUETOOTH in buttons.up:
+            if bluetooth_timer.time() > 2000:
+                # Lang gedrückt (>2s) = Beenden
+                print("\nBeende...")
+                break
+            
+            # Kurz gedrückt = Modus wechseln
+            current_mode = (current_mode + 1) % 2
+            print(f"\n{mode_names[current_mode]}")
+            hub.light.on(mode_colors[current_mode])
+            
+            # Stop alle Motoren beim Wechsel
+            if drive_motor:
+                drive_motor.stop()
+            if steering_motor:
+                steering_motor.hold()
+            if arm_rotate_motor:
+                arm_rotate_motor.stop()
+            if arm_lift_motor:
+                arm_lift_motor.stop()
+            action = None
+            
+            # Kurze Pause für Links/Rechts, ohne die Schleife anzuhalten
+            mode_timer.reset()
+            mode_settling = True
+        
+        if mode_settling and mode_timer.time() >= MODE_DEBOUNCE:
+            mode_settling = False
         
-        # Steuerung je nach Modus
-        if current_mode == MODE_DRIVE:
-            # FAHR-MODUS
-            if Button.LEFT in pressed and Button.RIGHT in pressed:
-                # Beide Tasten = Geradeaus
-                if not is_active:
-                    print("Vorwärts")
-                    hub.light.on(Color.CYAN)
-                if drive_motor:
-                    drive_motor.run(DRIVE_SPEED)
-                if steering_motor:
-                    steering_motor.run_target(500, 0, wait=False)
-                is_active = True
-                
-            elif Button.LEFT in pressed:
-                # Links + Vorwärts
-                if not is_active:
-                    print("Links + Vor")
-                    hub.light.on(Color.GREEN)
-                if drive_motor:
-                    drive_motor.run(DRIVE_SPEED)
-                if steering_motor:
-                    steering_motor.run_target(500, -STEERING_ANGLE, wait=False)
-                is_active = True
-                
-            elif Button.RIGHT in pressed:
-                # Rechts + Vorwärts
-                if not is_active:
-                    print("Rechts + Vor")
-                    hub.light.on(Color.YELLOW)
-                if drive_motor:
-                    drive_motor.run(DRIVE_SPEED)
-                if steering_motor:
-                    steering_motor.run_target(500, STEERING_ANGLE, wait=False)
-                is_active = True
-                
-            else:
-                # Keine Taste = Stop
-                if is_active:
-                    print("Stop")
-                    hub.light.on(Color.BLUE)
-                    if drive_motor:
-                        drive_motor.stop()
-                    if steering_motor:
-                        steering_motor.hold()
-                    is_active = False
+        # Steuerung je nach Modus; Motorbefehle nur bei geändertem Sollzustand
+        if not mode_settling:
+            started = profiler.start()
+            actions, apply = mode_actions[current_mode]
+            desired = actions.get((Button.LEFT in pressed, Button.RIGHT in pressed))
+            if desired != action:
+                apply(desired, action)
+                action = desired
+            profiler.stop(PHASE_MOTORS, started)
         
-        elif current_mode == MODE_ARM:
-            # ARM-MODUS
-            if Button.LEFT in pressed and Button.RIGHT in pressed:
-                # Beide Tasten = Arm hoch
-                if not is_active:
-                    print("Arm HOCH")
-                    hub.light.on(Color.WHITE)
-                if arm_lift_motor:
-                    arm_lift_motor.run(ARM_LIFT_SPEED)
-                is_active = True
-                
-            elif Button.LEFT in pressed:
-                # Links = Arm links drehen
-                if not is_active:
-                    print("Arm LINKS")
-                    hub.light.on(Color.ORANGE)
-                if arm_rotate_motor:
-                    arm_rotate_motor.run(-ARM_ROTATE_SPEED)
-                is_active = True
-                
-            elif Button.RIGHT in pressed:
-                # Rechts = Arm rechts drehen
-                if not is_active:
-                    print("Arm RECHTS")
-                    hub.light.on(Color.VIOLET)
-                if arm_rotate_motor:
-                    arm_rotate_motor.run(ARM_ROTATE_SPEED)
-                is_active = True
-                
-            else:
-                # Keine Taste = Stop
-                if is_active:
-                    print("Stop")
-                    hub.light.on(Color.MAGENTA)
-                    if arm_rotate_motor:
-                        arm_rotate_motor.stop()
-                    if arm_lift_motor:
-                        arm_lift_motor.stop()
-                    is_active = False
+        started = profiler.start()
+        if reflex.poll() and current_mode == MODE_DRIVE:
+            # Gebremst: mit weiter gehaltenen Tasten im nächsten Takt wieder anfahren
+            action = None
+        profiler.stop(PHASE_MOTORS, started)
         
-        wait(50)
+        loop_timer.wait()
 
 except KeyboardInterrupt:
     print("\nUnterbrochen")
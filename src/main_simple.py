@@ -1,16 +1,30 @@
 """
-Roboter-Steuerung die Befehle über print() empfängt.
+Roboter-Steuerung die Befehle über stdin empfängt.
 
-Dieser Ansatz nutzt die Tatsache, dass wir Text über die
-Verbindung senden können, den das Programm dann liest.
+Der Mac schickt Befehlsrahmen (siehe protocol.py) über die
+Bluetooth-Verbindung, das Programm antwortet mit maschinenlesbaren
+Zeilen wie "OK:A", "READY", "CMD:forward" oder "ACK:12".
 """
 
 from pybricks.hubs import InventorHub
-from pybricks.pupdevices import Motor, UltrasonicSensor
-from pybricks.parameters import Port, Button, Color
+from pybricks.parameters import Button, Color
 from pybricks.tools import wait, StopWatch
 
+from hub_devices import BootTimer, probe, start_centering
+from hub_drive import VelocityControl
+from hub_io import CommandReader, Telemetry, build_dispatch
+from hub_macro import MacroRunner
+from hub_reflex import ObstacleReflex
+from protocol import (
+    OP_FORWARD, OP_BACKWARD, OP_LEFT, OP_RIGHT, OP_ARM_UP, OP_ARM_DOWN,
+    OP_ARM_LEFT, OP_ARM_RIGHT, OP_STOP, OP_CENTER, OP_MEASURE,
+    OP_DRIVE_SPEED, OP_STEER_ANGLE, OP_ARM_ROTATE_SPEED, OP_ARM_LIFT_SPEED,
+    OP_WATCHDOG, OP_TELEMETRY, OP_REFLEX, OP_MACRO_BEGIN, OP_MACRO_END,
+    OP_MACRO_RUN, OP_MACRO_CANCEL,
+)
+
 # Hub initialisieren
+boot = BootTimer()
 hub = InventorHub()
 
 # Geschwindigkeiten
@@ -22,114 +36,153 @@ ARM_LIFT_SPEED = 300
 print("Initialisiere...")
 
 # Geräte initialisieren
-steering_motor = None
-drive_motor = None
-arm_rotate_motor = None
-arm_lift_motor = None
-distance_sensor = None
+def report_device(port, label, found):
+    print(("OK:" if found else "FAIL:") + port)
 
-try:
-    steering_motor = Motor(Port.A)
-    print("OK:A")
-except:
-    print("FAIL:A")
 
-try:
-    drive_motor = Motor(Port.B)
-    print("OK:B")
-except:
-    print("FAIL:B")
+devices = probe(report_device, boot)
+steering_motor = devices['steering']
+drive_motor = devices['drive']
+arm_rotate_motor = devices['arm_rotate']
+arm_lift_motor = devices['arm_lift']
+distance_sensor = devices['distance']
 
-try:
-    arm_rotate_motor = Motor(Port.C)
-    print("OK:C")
-except:
-    print("FAIL:C")
+# Lenkung zentrieren (läuft im Hintergrund weiter)
+start_centering(steering_motor)
+boot.step('center')
+boot.report()
 
-try:
-    arm_lift_motor = Motor(Port.D)
-    print("OK:D")
-except:
-    print("FAIL:D")
+print("READY")
+hub.light.on(Color.GREEN)
 
-try:
-    distance_sensor = UltrasonicSensor(Port.F)
-    print("OK:F")
-except:
-    print("FAIL:F")
 
-# Lenkung zentrieren
-if steering_motor:
-    steering_motor.run_target(300, 0, wait=True)
+# Aktionen für die Befehle vom Mac (Argument siehe protocol.py)
 
-print("READY")
-hub.light.on(Color.GREEN)
+def forward(arg):
+    print("CMD:forward")
+    drive_motor.run_time(DRIVE_SPEED, 1000, wait=False)
+    hub.light.on(Color.BLUE)
 
 
-def execute_cmd(cmd):
-    """Führt Befehl aus."""
-    if cmd == 'w' and drive_motor:
-        print("CMD:forward")
-        drive_motor.run_time(DRIVE_SPEED, 1000, wait=False)
-        hub.light.on(Color.BLUE)
-        
-    elif cmd == 's' and drive_motor:
-        print("CMD:backward")
-        drive_motor.run_time(-DRIVE_SPEED, 1000, wait=False)
-        hub.light.on(Color.YELLOW)
-        
-    elif cmd == 'a' and steering_motor:
-        print("CMD:left")
-        steering_motor.run_target(500, -STEERING_ANGLE, wait=False)
-        
-    elif cmd == 'd' and steering_motor:
-        print("CMD:right")
-        steering_motor.run_target(500, STEERING_ANGLE, wait=False)
-        
-    elif cmd == 'i' and arm_lift_motor:
-        print("CMD:arm_up")
-        arm_lift_motor.run_time(ARM_LIFT_SPEED, 1000, wait=False)
-        
-    elif cmd == 'k' and arm_lift_motor:
-        print("CMD:arm_down")
-        arm_lift_motor.run_time(-ARM_LIFT_SPEED, 1000, wait=False)
-        
-    elif cmd == 'j' and arm_rotate_motor:
-        print("CMD:arm_left")
-        arm_rotate_motor.run_time(-ARM_ROTATE_SPEED, 1000, wait=False)
-        
-    elif cmd == 'l' and arm_rotate_motor:
-        print("CMD:arm_right")
-        arm_rotate_motor.run_time(ARM_ROTATE_SPEED, 1000, wait=False)
-        
-    elif cmd == 'x':
-        print("CMD:stop")
-        if drive_motor:
-            drive_motor.stop()
-        if steering_motor:
-            steering_motor.hold()
-        if arm_rotate_motor:
-            arm_rotate_motor.stop()
-        if arm_lift_motor:
-            arm_lift_motor.stop()
-        hub.light.on(Color.GREEN)
-        
-    elif cmd == '0' and steering_motor:
-        print("CMD:center")
-        steering_motor.run_target(500, 0, wait=True)
-        
-    elif cmd == 'm' and distance_sensor:
-        try:
-            dist = distance_sensor.distance()
-            print(f"DIST:{dist}")
-        except:
-            print("DIST:ERROR")
+def backward(arg):
+    print("CMD:backward")
+    drive_motor.run_time(-DRIVE_SPEED, 1000, wait=False)
+    hub.light.on(Color.YELLOW)
+
+
+def steer_left(arg):
+    print("CMD:left")
+    steering_motor.run_target(500, -STEERING_ANGLE, wait=False)
+
+
+def steer_right(arg):
+    print("CMD:right")
+    steering_motor.run_target(500, STEERING_ANGLE, wait=False)
+
+
+def arm_up(arg):
+    print("CMD:arm_up")
+    arm_lift_motor.run_time(ARM_LIFT_SPEED, 1000, wait=False)
+
+
+def arm_down(arg):
+    print("CMD:arm_down")
+    arm_lift_motor.run_time(-ARM_LIFT_SPEED, 1000, wait=False)
 
 
-# Hauptschleife - prüft Hub-Tasten als Fallback
+def arm_left(arg):
+    print("CMD:arm_left")
+    arm_rotate_motor.run_time(-ARM_ROTATE_SPEED, 1000, wait=False)
+
+
+def arm_right(arg):
+    print("CMD:arm_right")
+    arm_rotate_motor.run_time(ARM_ROTATE_SPEED, 1000, wait=False)
+
+
+# Soll-Geschwindigkeiten mit Totmann-Schaltung (siehe hub_drive.py)
+velocity = VelocityControl()
+
+# Regelmäßige Sensor- und Motorwerte für den Mac
+telemetry = Telemetry(distance_sensor, (steering_motor, drive_motor, arm_rotate_motor, arm_lift_motor))
+
+# Kollisionsschutz: bremst den Antrieb vor Hindernissen (siehe hub_reflex.py)
+reflex = ObstacleReflex(distance_sensor, drive_motor, velocity)
+
+stop_actions = [motor.stop for motor in (drive_motor, arm_rotate_motor, arm_lift_motor) if motor]
+if steering_motor:
+    stop_actions.append(steering_motor.hold)
+
+
+def stop_all(arg):
+    print("CMD:stop")
+    for action in stop_actions:
+        action()
+    velocity.reset()
+    hub.light.on(Color.GREEN)
+
+
+def center(arg):
+    print("CMD:center")
+    steering_motor.run_target(500, 0, wait=True)
+
+
+def measure(arg):
+    try:
+        dist = distance_sensor.distance()
+        print(f"DIST:{dist}")
+    except:
+        print("DIST:ERROR")
+
+
+# Befehlstabelle, einmalig aus den gefundenen Geräten aufgebaut
+dispatch = build_dispatch((
+    (OP_FORWARD, drive_motor, forward),
+    (OP_BACKWARD, drive_motor, backward),
+    (OP_LEFT, steering_motor, steer_left),
+    (OP_RIGHT, steering_motor, steer_right),
+    (OP_ARM_UP, arm_lift_motor, arm_up),
+    (OP_ARM_DOWN, arm_lift_motor, arm_down),
+    (OP_ARM_LEFT, arm_rotate_motor, arm_left),
+    (OP_ARM_RIGHT, arm_rotate_motor, arm_right),
+    (OP_STOP, hub, stop_all),
+    (OP_CENTER, steering_motor, center),
+    (OP_MEASURE, distance_sensor, measure),
+    # Kontinuierlicher Fahrmodus
+    (OP_DRIVE_SPEED, drive_motor, velocity.speed_action(drive_motor)),
+    (OP_STEER_ANGLE, steering_motor, velocity.steering_action(steering_motor, STEERING_ANGLE)),
+    (OP_ARM_ROTATE_SPEED, arm_rotate_motor, velocity.speed_action(arm_rotate_motor)),
+    (OP_ARM_LIFT_SPEED, arm_lift_motor, velocity.speed_action(arm_lift_motor)),
+    (OP_WATCHDOG, hub, velocity.set_timeout),
+    (OP_TELEMETRY, hub, telemetry.set_rate),
+    (OP_REFLEX, hub, reflex.set_margin),
+))
+
+# Makros (siehe hub_macro.py); ein Stop vom Mac bricht sie ab
+macros = MacroRunner(dispatch, velocity)
+dispatch.update(build_dispatch((
+    (OP_MACRO_BEGIN, hub, macros.begin),
+    (OP_MACRO_END, hub, macros.end),
+    (OP_MACRO_RUN, hub, macros.run),
+    (OP_MACRO_CANCEL, hub, macros.cancel),
+    (OP_STOP, hub, macros.interrupt(stop_all)),
+)))
+
+# Befehlsrahmen vom Mac (siehe protocol.py)
+reader = CommandReader(dispatch, capture=macros.capture)
+
+
+# Hauptschleife - Befehle vom Mac, Hub-Tasten als Fallback
 print("LOOP:START")
 try:
     while True:
+        # Befehle vom Mac
+        reader.process()
+        macros.poll()
+        velocity.check()
+        reflex.poll()
+        telemetry.poll()
+        
         # Hub-Tasten als Fallback
         pressed = hub.buttons.pressed()
         
@@ -137,13 +190,16 @@ try:
             print("EXIT:USER")
             break
         elif Button.LEFT in pressed:
-            execute_cmd('a')
+            dispatch[OP_LEFT](0)
             wait(100)
         elif Button.RIGHT in pressed:
-            execute_cmd('d')
+            dispatch[OP_RIGHT](0)
             wait(100)
         
-        wait(50)
+        # Nicht länger warten, als bis zur nächsten Telemetrie-Zeile,
+        # Abstandsmessung bzw. zum nächsten Makro-Schritt
+        timeout = reflex.time_to_next(telemetry.time_to_next(50))
+        wait(max(0, macros.time_to_next(timeout)))
 
 except KeyboardInterrupt:
     print("EXIT:INTERRUPT")
@@ -0,0 +1,167 @@
+"""
+Cache für übersetzte Hub-Programme.
+
+pybricksdev übersetzt bei jedem hub.run(pfad) das Programm mit mpy-cross
+und lädt es neu auf den Hub. ProgramCache legt die übersetzten Programme
+unter dem SHA-256 ihrer Quelltexte ab (Programm und alle lokal importierten
+Module, also z. B. hub_io.py und protocol.py) und merkt sich je Hub, welcher
+Stand zuletzt hochgeladen wurde. HubSession startet dann das auf dem Hub
+gespeicherte Programm, ohne zu übersetzen oder hochzuladen.
+
+Beim Übersetzen kommt ein zusätzliches Modul program_id dazu, das die
+Kennung des Stands enthält (Anfang des Hashs). Das Hub-Programm meldet sie
+in seiner "BOOT:"-Zeile (siehe hub_devices.py). Hat jemand in der
+Zwischenzeit ein anderes Programm aufgespielt (z. B. mit Pybricks Code oder
+"pybricksdev run"), meldet sich dieses ohne oder mit anderer Kennung;
+HubSession lädt dann neu hoch.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from modulefinder import ModuleFinder
+from pathlib import Path
+
+import pybricksdev
+from pybricksdev.ble.pybricks import HubCapabilityFlag
+from pybricksdev.compile import compile_file, compile_multi_file
+
+CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'lego-mindstorms-roboter'
+PROGRAM_ID_MODULE = 'program_id'
+PROGRAM_ID_LENGTH = 16   # Zeichen des Hashs, die das Hub-Programm meldet
+
+
+def program_id(digest):
+    """Kennung, mit der sich das Programm zum Hash digest auf dem Hub meldet."""
+    return digest[:PROGRAM_ID_LENGTH]
+
+
+def program_abi(hub):
+    """MPY-ABI, das hub für gespeicherte Programme annimmt.
+
+    None, wenn der Hub keine gespeicherten Programme starten kann (alte
+    Firmware) oder kein echter Pybricks-Hub ist (Simulator).
+    """
+    # Wie PybricksHub.download(); die Felder sind in pybricksdev nicht öffentlich
+    flags = getattr(hub, '_capability_flags', None)
+    if flags is None or getattr(hub, '_mpy_abi_version', 0):
+        return None
+    if flags & HubCapabilityFlag.USER_PROG_MULTI_FILE_MPY6_1_NATIVE:
+        return (6, 1)
+    if flags & HubCapabilityFlag.USER_PROG_MULTI_FILE_MPY6:
+        return 6
+    return None
+
+
+def hub_id(hub, fallback=None):
+    """Kennung des Hubs, unter der der hochgeladene Stand gespeichert wird."""
+    device = getattr(hub, '_device', None)
+    return getattr(device, 'address', None) or getattr(device, 'name', None) or fallback
+
+
+class ProgramCache:
+    """Übersetzte Hub-Programme nach Inhalt, dazu der Stand je Hub (thread-sicher)."""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._hubs = None   # Hub-Kennung -> Hash, wird beim ersten Zugriff geladen
+        self._compiling = {}   # Hash -> laufende Übersetzung
+
+    def digest(self, path, abi):
+        """Hash über Programm, lokale Module, ABI und pybricksdev-Version."""
+        path = os.path.abspath(path)
+        finder = ModuleFinder([os.path.dirname(path)])
+        finder.run_script(path)
+        h = hashlib.sha256(f"{abi}|{getattr(pybricksdev, '__version__', '')}".encode())
+        for name, module in sorted(finder.modules.items()):
+            if module.__file__:
+                h.update(b'\0' + name.encode() + b'\0')
+                h.update(Path(module.__file__).read_bytes())
+        return h.hexdigest()
+
+    async def compile(self, path, abi, digest=None):
+        """Gibt das übersetzte Programm zurück; mpy-cross läuft nur bei neuem Inhalt.
+
+        Verbinden sich mehrere Hubs gleichzeitig (siehe fleet.py), wird
+        dasselbe Programm trotzdem nur einmal übersetzt.
+        """
+        digest = digest or self.digest(path, abi)
+        cached = self.directory / f'{digest}.mpy'
+        try:
+            return cached.read_bytes()
+        except FileNotFoundError:
+            pass
+        task = self._compiling.get(digest)
+        if task is None:
+            task = self._compiling[digest] = asyncio.ensure_future(self._compile(path, abi, digest, cached))
+            task.add_done_callback(lambda _: self._compiling.pop(digest, None))
+        return await asyncio.shield(task)
+
+    async def _compile(self, path, abi, digest, cached):
+        # Die Hub-Programme importieren lokale Module, das Ergebnis ist also
+        # im Mehrdatei-Format (Größe, Name, mpy je Modul) und lässt sich
+        # einfach um program_id erweitern
+        mpy = await compile_multi_file(os.path.abspath(path), abi)
+        mpy += await _compile_program_id(program_id(digest), abi)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp = cached.with_suffix(f'.{threading.get_ident()}.tmp')
+        temp.write_bytes(mpy)
+        os.replace(temp, cached)
+        return mpy
+
+    # --- Stand auf den Hubs ------------------------------------------------
+
+    def _load_hubs(self):
+        if self._hubs is None:
+            try:
+                self._hubs = json.loads((self.directory / 'hubs.json').read_text())
+            except (FileNotFoundError, ValueError):
+                self._hubs = {}
+        return self._hubs
+
+    def _save_hubs(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp = self.directory / f'hubs.{threading.get_ident()}.tmp'
+        temp.write_text(json.dumps(self._hubs, indent=2))
+        os.replace(temp, self.directory / 'hubs.json')
+
+    def uploaded(self, hub):
+        """Hash des Programms, das zuletzt auf hub (Kennung) geladen wurde, sonst None."""
+        with self._lock:
+            return self._load_hubs().get(hub)
+
+    def remember(self, hub, digest):
+        with self._lock:
+            self._load_hubs()[hub] = digest
+            self._save_hubs()
+
+    def forget(self, hub):
+        with self._lock:
+            if self._load_hubs().pop(hub, None) is not None:
+                self._save_hubs()
+
+
+async def _compile_program_id(ident, abi):
+    """Übersetztes Modul program_id mit PROGRAM_ID = ident, im Mehrdatei-Format."""
+    with tempfile.TemporaryDirectory() as directory:
+        source = f'{PROGRAM_ID_MODULE}.py'
+        Path(directory, source).write_text(f"PROGRAM_ID = '{ident}'\n")
+        mpy = await compile_file(directory, source, abi if isinstance(abi, int) else abi[0])
+    return len(mpy).to_bytes(4, 'little') + PROGRAM_ID_MODULE.encode() + b'\0' + mpy
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_cache():
+    """Gibt den gemeinsamen ProgramCache zurück."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ProgramCache()
+        return _shared_cache
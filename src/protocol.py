@@ -0,0 +1,206 @@
+"""
+Binäres Befehlsprotokoll zwischen Mac und Hub.
+
+Dieses Modul wird sowohl auf dem Mac (CPython) als auch auf dem Hub
+(Pybricks MicroPython) verwendet und benutzt deshalb nur einfache
+Sprachmittel (kein struct, keine Typ-Annotationen).
+
+Ein Befehl ist ein Rahmen aus 6 Bytes:
+
+    0xA5 | Opcode | Sequenz | Argument (low) | Argument (high) | Prüfsumme
+
+- Sequenz: 0..255, wird für jeden gesendeten Befehl hochgezählt
+- Argument: vorzeichenbehaftete 16-Bit-Zahl, z. B. eine Geschwindigkeit
+- Prüfsumme: XOR über Opcode, Sequenz und die beiden Argument-Bytes
+
+Der Hub bestätigt jeden ausgeführten Befehl mit der Zeile "ACK:<seq>".
+Wird ein Befehl doppelt empfangen (seine Sequenznummer ist unter den
+letzten DUP_WINDOW ausgeführten), antwortet er mit "DUP:<seq>" und führt
+ihn nicht noch einmal aus. Beschädigte Rahmen meldet er mit "ERR:CHECKSUM".
+
+Ist die Telemetrie eingeschaltet, schickt der Hub regelmäßig die Zeile
+
+    TEL:<zeit>,<abstand>,<winkel A>,<tempo A>,...,<winkel D>,<tempo D>
+
+mit der Zeit in ms seit Programmstart, dem Abstand in mm sowie Winkel (Grad)
+und Geschwindigkeit (Grad/Sekunde) der Motoren A bis D. Felder fehlender
+Geräte bleiben leer.
+
+Auf OP_PROFILE mit Argument PROFILE_REPORT antwortet der Hub mit
+
+    PROF:<durchläufe>,<verpasst>,<max>,<h0>/<h1>/...,<phase>=<ms>/<anzahl>,...
+
+(Anzahl Schleifendurchläufe, davon zu spät, längste Periode in ms,
+Histogramm der Perioden nach PROFILE_BUCKETS und Zeit je Phase).
+
+Bremst der Kollisionsschutz den Antrieb (siehe hub_reflex.py), meldet der
+Hub das mit "REFLEX:<abstand>" (Abstand zum Hindernis in mm). Der nächste
+Geschwindigkeits-Befehl für den Antrieb fährt wieder an, auch wenn er
+denselben Wert wie vor dem Eingriff hat.
+
+Makros (siehe hub_macro.py) melden Speichern, Fortschritt und Ende mit
+
+    MACRO:<platz>,<zustand>,<schritt>,<anzahl>
+
+Zustand STORED (gespeichert), RUN (Schritt <schritt> beginnt), DONE
+(fertig) oder CANCEL (abgebrochen); ungültige Makro-Befehle mit "ERR:MACRO".
+
+Beim Start meldet jedes Programm vor dem Bereit-Signal, wie lange die
+einzelnen Schritte gedauert haben (ms, siehe hub_devices.BootTimer):
+
+    BOOT:A=<ms>,B=<ms>,...,center=<ms>,total=<ms>,id=<kennung>
+
+Das Feld id fehlt, wenn das Programm nicht über den Programm-Cache
+hochgeladen wurde (siehe program_cache.py).
+
+Auf dem Mac macht hub_events.py aus diesen und allen übrigen Zeilen
+Ereignisse.
+"""
+
+SYNC = 0xA5
+FRAME_SIZE = 6
+# Zuletzt ausgeführte Sequenznummern, gegen die ein Rahmen auf Wiederholung
+# geprüft wird. Muss deutlich kleiner als 256 sein: erst nach 256 Befehlen
+# kommt dieselbe Sequenznummer regulär wieder.
+DUP_WINDOW = 16
+
+# Opcodes
+OP_FORWARD = 0x01
+OP_BACKWARD = 0x02
+OP_LEFT = 0x03
+OP_RIGHT = 0x04
+OP_ARM_UP = 0x05
+OP_ARM_DOWN = 0x06
+OP_ARM_LEFT = 0x07
+OP_ARM_RIGHT = 0x08
+OP_STOP = 0x09
+OP_CENTER = 0x0A
+OP_MEASURE = 0x0B
+
+# Kontinuierlicher Fahrmodus (siehe hub_drive.py). Argument: Geschwindigkeit
+# in Grad/Sekunde, Lenkwinkel in Grad bzw. Watchdog-Zeit in Millisekunden.
+OP_DRIVE_SPEED = 0x10
+OP_STEER_ANGLE = 0x11
+OP_ARM_ROTATE_SPEED = 0x12
+OP_ARM_LIFT_SPEED = 0x13
+OP_WATCHDOG = 0x14
+
+# Telemetrie (siehe hub_io.Telemetry). Argument: Zeilen pro Sekunde, 0 = aus.
+OP_TELEMETRY = 0x20
+
+# Reihenfolge der Motoren in der Telemetrie-Zeile
+TELEMETRY_PORTS = ('A', 'B', 'C', 'D')
+
+# Profiling der Hauptschleife (siehe hub_profile.py). Argument: PROFILE_OFF,
+# PROFILE_ON (Zähler zurücksetzen und messen) oder PROFILE_REPORT.
+OP_PROFILE = 0x21
+PROFILE_OFF = 0
+PROFILE_ON = 1
+PROFILE_REPORT = 2
+
+# Kollisionsschutz (siehe hub_reflex.py). Argument: Sicherheitsabstand in mm,
+# 0 = aus.
+OP_REFLEX = 0x22
+
+# Makros (siehe hub_macro.py). Nach OP_MACRO_BEGIN (Argument: Platz) nimmt
+# der Hub alle Rahmen bis OP_MACRO_END als Schritte auf, statt sie
+# auszuführen; OP_MACRO_WAIT (Argument: ms) legt dabei die Dauer des
+# vorigen Schritts fest. OP_MACRO_END mit MACRO_START startet das Makro
+# sofort, OP_MACRO_RUN (Argument: Platz) startet ein gespeichertes.
+# OP_STOP bricht die Aufnahme ab; als Schritt steht stattdessen
+# OP_MACRO_STOP, das der Hub als OP_STOP aufnimmt.
+OP_MACRO_BEGIN = 0x23
+OP_MACRO_WAIT = 0x24
+OP_MACRO_END = 0x25
+OP_MACRO_RUN = 0x26
+OP_MACRO_CANCEL = 0x27
+OP_MACRO_STOP = 0x28
+MACRO_STORE = 0
+MACRO_START = 1
+MACRO_SLOTS = 16        # Plätze 0..15
+MACRO_MAX_STEPS = 64    # Schritte je Makro
+
+# Obergrenzen (ms) der Histogramm-Klassen für die Schleifenperiode;
+# die letzte Klasse zählt alles darüber
+PROFILE_BUCKETS = (10, 25, 50, 75, 100, 200)
+
+# Tastenbefehle der Controller -> Opcode
+COMMAND_OPCODES = {
+    'w': OP_FORWARD,
+    's': OP_BACKWARD,
+    'a': OP_LEFT,
+    'd': OP_RIGHT,
+    'i': OP_ARM_UP,
+    'k': OP_ARM_DOWN,
+    'j': OP_ARM_LEFT,
+    'l': OP_ARM_RIGHT,
+    'x': OP_STOP,
+    ' ': OP_STOP,
+    '0': OP_CENTER,
+    'm': OP_MEASURE,
+}
+
+
+def _checksum(opcode, seq, lo, hi):
+    return opcode ^ seq ^ lo ^ hi
+
+
+def encode_frame(opcode, seq, arg=0):
+    """Baut einen Befehlsrahmen (6 Bytes)."""
+    value = arg & 0xFFFF
+    lo = value & 0xFF
+    hi = value >> 8
+    seq = seq & 0xFF
+    return bytes((SYNC, opcode, seq, lo, hi, _checksum(opcode, seq, lo, hi)))
+
+
+class FrameDecoder:
+    """Setzt Rahmen aus beliebig zerstückelten Eingabe-Bytes zusammen."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._recent = [-1] * DUP_WINDOW   # Ring der zuletzt ausgeführten Sequenznummern
+        self._next = 0
+        self.checksum_errors = 0
+
+    def feed(self, data):
+        """Nimmt neue Bytes auf.
+
+        Gibt eine Liste von Tupeln (opcode, seq, arg, duplicate) für alle
+        vollständigen, gültigen Rahmen zurück.
+        """
+        self._buf.extend(data)
+        frames = []
+        buf = self._buf
+        start = 0
+        end = len(buf)
+
+        while end - start >= FRAME_SIZE:
+            if buf[start] != SYNC:
+                # Bis zum nächsten Sync-Byte überspringen
+                start += 1
+                continue
+            opcode = buf[start + 1]
+            seq = buf[start + 2]
+            lo = buf[start + 3]
+            hi = buf[start + 4]
+            if buf[start + 5] != _checksum(opcode, seq, lo, hi):
+                self.checksum_errors += 1
+                start += 1
+                continue
+
+            arg = lo | (hi << 8)
+            if arg & 0x8000:
+                arg -= 0x10000
+            # Auch eine Wiederholung, die erst nach anderen Rahmen ankommt,
+            # wird erkannt
+            duplicate = seq in self._recent
+            if not duplicate:
+                self._recent[self._next] = seq
+                self._next = (self._next + 1) % DUP_WINDOW
+            frames.append((opcode, seq, arg, duplicate))
+            start += FRAME_SIZE
+
+        if start:
+            self._buf = buf[start:]
+        return frames
@@ -0,0 +1,246 @@
+"""
+Automatisches Wiederverbinden einer HubSession.
+
+ReconnectSupervisor hängt sich an eine HubSession. Reißt die Verbindung ab
+(Bluetooth weg, Hub aus, Sendefehler), verbindet er im Hintergrund neu,
+mit wachsenden Pausen zwischen den Versuchen (Backoff). Bis dahin:
+
+- nimmt die Sitzung weiter Befehle an und legt sie in eine Warteschlange;
+  was älter als COMMAND_TTL ist, wenn die Verbindung wieder steht, wird
+  verworfen statt verspätet ausgeführt; ein Stop-Befehl ersetzt die ganze
+  Warteschlange und verfällt nie
+- merkt sich der Supervisor den zuletzt gewünschten Zustand des Roboters
+  (Fahr- und Armgeschwindigkeiten, Lenkung, Watchdog, Telemetrie,
+  Kollisionsschutz) und
+  schickt ihn nach dem Neustart des Hub-Programms erneut
+
+Zustände, die ein Rahmen in der Warteschlange setzt, stellt dieser Rahmen
+selbst wieder her (in der Reihenfolge der Warteschlange, also nach einem
+wartenden Stop); solche Rahmen verfallen nicht. Jeder Rahmen geht so nur
+einmal an den Hub.
+
+Dauer und Anzahl der Wiederverbindungen liefert stats().
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import random
+import threading
+import time
+
+from protocol import (
+    OP_ARM_LIFT_SPEED, OP_ARM_ROTATE_SPEED, OP_CENTER, OP_DRIVE_SPEED, OP_LEFT,
+    OP_MACRO_BEGIN, OP_MACRO_CANCEL, OP_MACRO_END, OP_REFLEX, OP_RIGHT,
+    OP_STEER_ANGLE, OP_STOP, OP_TELEMETRY, OP_WATCHDOG,
+)
+
+COMMAND_TTL = 1.0       # s, die ein Befehl in der Warteschlange gültig bleibt
+MAX_QUEUED = 64         # Befehle in der Warteschlange, danach fallen die ältesten weg
+BACKOFF_START = 0.2     # s vor dem ersten Versuch
+BACKOFF_MAX = 5.0       # s, längste Pause zwischen zwei Versuchen
+BACKOFF_JITTER = 0.2    # zufällige Abweichung der Pausen (Anteil)
+RECONNECT_TIMEOUT = 15.0   # s pro Verbindungsversuch
+HISTORY = 20            # Wiederverbindungen, über die stats() mittelt
+
+# Opcodes, deren letzter Wert den Zustand des Roboters beschreibt -> Slot.
+# Einzelbefehle mit fester Dauer (vorwärts für 1 s usw.) gehören nicht dazu.
+STATE_SLOTS = {
+    OP_WATCHDOG: 'watchdog',
+    OP_TELEMETRY: 'telemetry',
+    OP_REFLEX: 'reflex',
+    OP_STEER_ANGLE: 'steering',
+    OP_LEFT: 'steering',
+    OP_RIGHT: 'steering',
+    OP_CENTER: 'steering',
+    OP_DRIVE_SPEED: 'drive',
+    OP_ARM_ROTATE_SPEED: 'arm_rotate',
+    OP_ARM_LIFT_SPEED: 'arm_lift',
+}
+# Reihenfolge beim Wiederherstellen: erst Watchdog, Telemetrie und
+# Kollisionsschutz, dann Motoren
+REPLAY_ORDER = ('watchdog', 'telemetry', 'reflex', 'steering', 'drive', 'arm_rotate', 'arm_lift')
+# Slots, die ein Stop-Befehl zurücksetzt. Die Lenkung wird danach nicht
+# wiederhergestellt, ein neu gestartetes Hub-Programm zentriert sie.
+STOPPED_SLOTS = ('drive', 'arm_rotate', 'arm_lift', 'steering')
+
+
+def backoff_delays(start=BACKOFF_START, maximum=BACKOFF_MAX, jitter=BACKOFF_JITTER):
+    """Pausen zwischen den Versuchen: verdoppelt sich bis maximum, leicht gestreut."""
+    delay = start
+    while True:
+        yield delay * random.uniform(1 - jitter, 1 + jitter)
+        delay = min(delay * 2, maximum)
+
+
+class ReconnectSupervisor:
+    """Verbindet eine HubSession nach einem Abbruch selbstständig neu."""
+
+    def __init__(self, session, command_ttl=COMMAND_TTL, max_queued=MAX_QUEUED,
+                 timeout=RECONNECT_TIMEOUT):
+        self.session = session
+        self.command_ttl = command_ttl
+        self.timeout = timeout
+        self.reconnecting = False
+
+        self.reconnects = 0     # erfolgreiche Wiederverbindungen
+        self.attempts = 0       # Versuche insgesamt
+        self.expired = 0        # Befehle, die zu lange gewartet haben
+        self.replayed = 0       # nach dem Wiederverbinden erneut gesendete Zustände
+        self._durations = collections.deque(maxlen=HISTORY)   # s vom Abbruch bis bereit
+
+        self._state = {}        # Slot -> (opcode, arg)
+        self._recording = False   # zwischen OP_MACRO_BEGIN und OP_MACRO_END
+        # (Zeitpunkt, opcode, arg, Future, Slot des Zustands oder None)
+        self._queue = collections.deque(maxlen=max_queued)
+        self._lock = threading.Lock()
+        self._task = None
+
+        session.supervisor = self
+        session.add_drop_listener(self._on_drop)
+
+    # --- Aufrufe aus HubSession ----------------------------------------------
+
+    def track(self, opcode, arg):
+        """Merkt sich einen gesendeten Rahmen, falls er den Zustand beschreibt.
+
+        Rahmen eines Makros führt der Hub nicht sofort aus, sie zählen nicht.
+        """
+        with self._lock:
+            if opcode == OP_MACRO_BEGIN:
+                self._recording = True
+                return
+            if opcode == OP_MACRO_END or opcode == OP_MACRO_CANCEL:
+                self._recording = False
+                return
+            if self._recording:
+                return
+            slot = STATE_SLOTS.get(opcode)
+            if slot:
+                self._state[slot] = (opcode, arg)
+            elif opcode == OP_STOP:
+                for slot in STOPPED_SLOTS:
+                    self._state.pop(slot, None)
+
+    def hold(self, opcode, arg):
+        """Legt einen Rahmen zurück, solange keine Verbindung besteht.
+
+        Gibt ein Future zurück, das nach dem Senden erfüllt und bei Ablauf
+        abgebrochen wird. Ein Stop-Befehl verwirft alles davor Wartende.
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            queue = self._queue
+            if opcode == OP_STOP:
+                for entry in queue:
+                    entry[3].cancel()
+                queue.clear()
+            elif len(queue) == queue.maxlen:
+                # Den ältesten Befehl verwerfen, aber nie einen Stop
+                index = 1 if queue[0][1] == OP_STOP else 0
+                self.expired += 1
+                queue[index][3].cancel()
+                del queue[index]
+            # Schritte eines Makros setzen keinen Zustand (siehe track())
+            slot = None if self._recording else STATE_SLOTS.get(opcode)
+            queue.append((time.monotonic(), opcode, arg, future, slot))
+        return future
+
+    def cancel(self):
+        """Beendet laufende Versuche und verwirft die Warteschlange (Trennen durch den Nutzer)."""
+        self.reconnecting = False
+        task = self._task
+        if task is not None:
+            self.session.loop_thread.loop.call_soon_threadsafe(task.cancel)
+        with self._lock:
+            for entry in self._queue:
+                entry[3].cancel()
+            self._queue.clear()
+
+    # --- Wiederverbinden -----------------------------------------------------
+
+    def _on_drop(self):
+        # Läuft im Loop-Thread
+        if self._task is None:
+            self.reconnecting = True
+            self._task = asyncio.ensure_future(self._reconnect(time.perf_counter()))
+
+    async def _reconnect(self, dropped_at):
+        session = self.session
+        print("⚠️  Verbindung verloren, verbinde neu...")
+        try:
+            for delay in backoff_delays():
+                await asyncio.sleep(delay)
+                self.attempts += 1
+                try:
+                    await session._disconnect()
+                except Exception:
+                    pass   # die alte Verbindung ist ohnehin weg
+                try:
+                    await session._connect(self.timeout)
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Wiederverbinden fehlgeschlagen: {e}")
+            self._durations.append(time.perf_counter() - dropped_at)
+            self.reconnects += 1
+            self.reconnecting = False
+            self._resume()
+            print(f"✅ Wieder verbunden nach {self._durations[-1] * 1000:.0f} ms")
+        finally:
+            self.reconnecting = False
+            self._task = None
+
+    def _resume(self):
+        # Zustand wiederherstellen, soweit ihn nicht ein wartender Rahmen
+        # setzt, dann die Warteschlange nachholen
+        with self._lock:
+            queued = [entry for entry in self._queue if not entry[3].cancelled()]
+            self._queue.clear()
+            covered = {entry[4] for entry in queued}
+            state = [self._state[slot] for slot in REPLAY_ORDER
+                     if slot in self._state and slot not in covered]
+        # Die Rahmen sind schon beim Einreihen eingetragen worden
+        # (track(), Rahmen-Listener), daher direkt schreiben
+        for opcode, arg in state:
+            self.session._write_frame(opcode, arg)
+            self.replayed += 1
+        now = time.monotonic()
+        for queued_at, opcode, arg, future, slot in queued:
+            if opcode != OP_STOP and slot is None and now - queued_at > self.command_ttl:
+                self.expired += 1
+                future.cancel()
+                continue
+            sent = self.session._write_frame(opcode, arg)
+            if sent is None:
+                future.cancel()
+            else:
+                sent.add_done_callback(lambda done, future=future: _chain(done, future))
+
+    def stats(self):
+        """Kennzahlen der Wiederverbindungen (Zeiten in ms)."""
+        durations = [d * 1000 for d in self._durations]
+        return {
+            'reconnecting': self.reconnecting,
+            'reconnects': self.reconnects,
+            'attempts': self.attempts,
+            'last_ms': durations[-1] if durations else None,
+            'mean_ms': sum(durations) / len(durations) if durations else None,
+            'max_ms': max(durations) if durations else None,
+            'queued': len(self._queue),
+            'expired': self.expired,
+            'replayed': self.replayed,
+        }
+
+
+def _chain(done, future):
+    # Ergebnis des tatsächlichen Sendens an das Future aus hold() weitergeben
+    if future.done():
+        return
+    if done.cancelled():
+        future.cancel()
+    elif done.exception() is not None:
+        future.set_exception(done.exception())
+    else:
+        future.set_result(None)
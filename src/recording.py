@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Aufzeichnen und Wiederabspielen von Fahrten.
+
+Recorder hängt sich an eine HubSession und schreibt jeden gesendeten
+Befehlsrahmen und jede Telemetrie-Zeile mit Zeitstempel (µs seit Beginn) in
+eine Binärdatei. Die Datei wird per mmap beschrieben und in Blöcken
+vergrößert, auch lange Fahrten belegen also keinen Arbeitsspeicher.
+RecordingReader liest sie ebenfalls per mmap, Eintrag für Eintrag.
+
+Abspielen:
+- replay(): schickt die Befehle mit den ursprünglichen Abständen (oder
+  schneller) an einen echten oder simulierten Hub
+- simulate(): speist die Befehle zu ihren Zeitpunkten in ein Hub-Programm
+  im Simulator (hub_sim) ein; ohne Echtzeit und damit bei jedem Lauf
+  identisch, z. B. für Regressionstests von Fahrabläufen
+
+Dateiformat: 8 Bytes Kennung, danach Einträge aus Typ (1 Byte) und Zeit
+(8 Bytes, µs), gefolgt von
+- RECORD_FRAME: Opcode (1 Byte), Argument (int16)
+- RECORD_TELEMETRY: Hub-Zeit (ms), Abstand, je Motor A-D Winkel und Tempo
+  (alles int32, MISSING für fehlende Werte)
+Ein Typ 0 markiert das Ende (der Rest eines Blocks ist mit Nullen gefüllt).
+
+Kommandozeile (im Ordner src/):
+    python recording.py info fahrt.rec
+    python recording.py replay fahrt.rec --program main.py --speed 2
+    python recording.py simulate fahrt.rec main.py
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+from hub_events import EVENT_READY, EVENT_TELEMETRY, parse_line
+from protocol import TELEMETRY_PORTS, encode_frame
+
+MAGIC = b'LEGOREC1'
+RECORD_END = 0
+RECORD_FRAME = 1
+RECORD_TELEMETRY = 2
+
+HEADER = struct.Struct('<BQ')
+FRAME = struct.Struct('<Bh')
+TELEMETRY = struct.Struct('<' + 'i' * (2 + 2 * len(TELEMETRY_PORTS)))
+MISSING = -2 ** 31
+
+CHUNK = 1 << 20   # Bytes, um die die Datei jeweils wächst
+STARTUP_LIMIT = 60000   # ms, die simulate() auf das Bereit-Signal wartet
+
+
+class Recorder:
+    """Schreibt Befehle und Telemetrie einer HubSession in eine Datei (thread-sicher)."""
+
+    def __init__(self, path, session=None):
+        self.path = path
+        self.frames = 0
+        self.telemetry = 0
+        self._file = open(path, 'w+b')
+        self._file.write(MAGIC)
+        self._size = 0
+        self._map = None
+        self._pos = len(MAGIC)
+        self._grow(CHUNK)
+        self._start = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self.session = session
+        if session is not None:
+            session.add_frame_listener(self.record_frame)
+            session.events.subscribe(self.record_telemetry, EVENT_TELEMETRY)
+
+    def _grow(self, size):
+        if self._map is not None:
+            self._map.close()
+        self._file.truncate(size)
+        self._size = size
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def _append(self, kind, body, values):
+        record_size = HEADER.size + body.size
+        with self._lock:
+            if self._map is None:
+                return
+            if self._pos + record_size + 1 > self._size:
+                self._grow(self._size + CHUNK)
+            elapsed = (time.perf_counter_ns() - self._start) // 1000
+            HEADER.pack_into(self._map, self._pos, kind, elapsed)
+            body.pack_into(self._map, self._pos + HEADER.size, *values)
+            self._pos += record_size
+
+    def record_frame(self, opcode, arg):
+        """Trägt einen gesendeten Befehlsrahmen ein."""
+        self._append(RECORD_FRAME, FRAME, (opcode, arg))
+        self.frames += 1
+
+    def record_telemetry(self, frame):
+        """Trägt ein Telemetrie-Ereignis des Hubs ein (siehe hub_events.py)."""
+        values = [frame['time'], _value(frame['distance'])]
+        for port in TELEMETRY_PORTS:
+            motor = frame['motors'].get(port)
+            values += (motor['angle'], motor['speed']) if motor else (MISSING, MISSING)
+        self._append(RECORD_TELEMETRY, TELEMETRY, values)
+        self.telemetry += 1
+
+    def close(self):
+        """Beendet die Aufzeichnung und kürzt die Datei auf ihren Inhalt."""
+        if self.session is not None:
+            self.session.remove_frame_listener(self.record_frame)
+            self.session.events.unsubscribe(self.record_telemetry)
+            self.session = None
+        with self._lock:
+            if self._map is None:
+                return
+            self._map.close()
+            self._map = None
+            self._file.truncate(self._pos)
+            self._file.close()
+
+
+def _value(value):
+    return MISSING if value is None else value
+
+
+def _optional(value):
+    return None if value == MISSING else value
+
+
+class RecordingReader:
+    """Liest eine Aufzeichnung per mmap; Iteration liefert (kind, zeit_s, daten).
+
+    daten ist bei RECORD_FRAME ein Tupel (opcode, arg), bei RECORD_TELEMETRY
+    ein Dictionary wie von hub_events.parse_telemetry().
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} ist keine Aufzeichnung")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) if size > len(MAGIC) else None
+
+    def __iter__(self):
+        data = self._map
+        if data is None:
+            return
+        pos = len(MAGIC)
+        end = len(data)
+        while pos + HEADER.size <= end:
+            kind, elapsed = HEADER.unpack_from(data, pos)
+            pos += HEADER.size
+            if kind == RECORD_FRAME:
+                yield kind, elapsed / 1e6, FRAME.unpack_from(data, pos)
+                pos += FRAME.size
+            elif kind == RECORD_TELEMETRY:
+                values = TELEMETRY.unpack_from(data, pos)
+                pos += TELEMETRY.size
+                motors = {}
+                for i, port in enumerate(TELEMETRY_PORTS):
+                    if values[2 + 2 * i] != MISSING:
+                        motors[port] = {'angle': values[2 + 2 * i], 'speed': values[3 + 2 * i]}
+                yield kind, elapsed / 1e6, {
+                    'time': values[0], 'distance': _optional(values[1]), 'motors': motors,
+                }
+            else:
+                # Ende, oder eine nicht abgeschlossene Aufzeichnung
+                return
+
+    def frames(self):
+        """Nur die Befehle als (zeit_s, opcode, arg)."""
+        for kind, t, data in self:
+            if kind == RECORD_FRAME:
+                yield (t,) + data
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def summary(path):
+    """Anzahl Befehle und Telemetrie-Zeilen sowie Dauer einer Aufzeichnung."""
+    counts = {RECORD_FRAME: 0, RECORD_TELEMETRY: 0}
+    duration = 0.0
+    with RecordingReader(path) as reader:
+        for kind, t, _ in reader:
+            counts[kind] += 1
+            duration = t
+    return {'frames': counts[RECORD_FRAME], 'telemetry': counts[RECORD_TELEMETRY],
+            'duration_s': duration}
+
+
+def replay(path, session, speed=1.0):
+    """Schickt die Befehle einer Aufzeichnung über session an den Hub.
+
+    Die Abstände zwischen den Befehlen werden durch speed geteilt. Gibt die
+    Verspätungen der einzelnen Befehle in ms zurück.
+    """
+    lateness = []
+    with RecordingReader(path) as reader:
+        start = time.perf_counter()
+        for t, opcode, arg in reader.frames():
+            due = start + t / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            lateness.append(max(0.0, time.perf_counter() - due) * 1000)
+            session.send_frame(opcode, arg)
+    return lateness
+
+
+def simulate(path, program='main.py', speed=1.0, tail=1000, **world_options):
+    """Spielt die Befehle in ein Hub-Programm im Simulator ein.
+
+    Die Zeiten zählen wie bei einer echten Verbindung ab dem Bereit-Signal
+    des Programms und werden durch speed geteilt; nach dem letzten Befehl
+    läuft das Programm noch tail ms. Gibt die World des Laufs zurück.
+    """
+    from hub_sim import World, run_program
+
+    with RecordingReader(path) as reader:
+        frames = list(reader.frames())
+    last = frames[-1][0] * 1000 / speed if frames else 0.0
+
+    world = World(duration=STARTUP_LIMIT, **world_options)
+
+    def on_ready(line):
+        if parse_line(line)['type'] == EVENT_READY:
+            world.line_listeners.remove(on_ready)
+            start = world.now
+            for seq, (t, opcode, arg) in enumerate(frames):
+                world.stdin.feed(encode_frame(opcode, seq % 256, arg), at=start + t * 1000 / speed)
+            world.clock.duration = start + last + tail
+
+    world.line_listeners.append(on_ready)
+    run_program(program, world)
+    return world
+
+
+def main():
+    import argparse
+    import statistics
+
+    parser = argparse.ArgumentParser(description="Aufgezeichnete Fahrten anzeigen und abspielen")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    info = commands.add_parser('info', help="Inhalt einer Aufzeichnung zusammenfassen")
+    info.add_argument('file')
+
+    play = commands.add_parser('replay', help="Befehle an einen Hub schicken")
+    play.add_argument('file')
+    play.add_argument('--speed', type=float, default=1.0, help="Abspielgeschwindigkeit")
+    play.add_argument('--program', help="Hub-Programm im Simulator statt echtem Roboter")
+    play.add_argument('--record', help="den Lauf selbst wieder aufzeichnen")
+
+    sim = commands.add_parser('simulate', help="Befehle ohne Echtzeit im Simulator einspielen")
+    sim.add_argument('file')
+    sim.add_argument('program', nargs='?', default='main.py')
+    sim.add_argument('--speed', type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        result = summary(args.file)
+        print(f"{result['frames']} Befehle, {result['telemetry']} Telemetrie-Zeilen, "
+              f"{result['duration_s']:.1f} s")
+    elif args.command == 'replay':
+        from hub_session import HubSession
+        if args.program:
+            from hub_sim.transport import ProgramHub
+
+            async def transport():
+                return ProgramHub(args.program)
+            session = HubSession(program=args.program, transport=transport)
+        else:
+            session = HubSession()
+        if not session.connect():
+            raise SystemExit(1)
+        recorder = Recorder(args.record, session) if args.record else None
+        try:
+            lateness = replay(args.file, session, args.speed)
+            time.sleep(0.5)   # letzte Bestätigungen abwarten
+        finally:
+            if recorder:
+                recorder.close()
+            session.disconnect()
+        if lateness:
+            print(f"{len(lateness)} Befehle, Verspätung median {statistics.median(lateness):.2f} ms, "
+                  f"max {max(lateness):.2f} ms")
+        print(f"Verbindung: {session.acks.stats()}")
+    else:
+        world = simulate(args.file, args.program, args.speed)
+        for port, motor in sorted(world.motors.items()):
+            print(f"Motor {port}: Winkel {motor.angle()}")
+        print(f"{len(world.output)} Ausgabezeilen, {world.now / 1000:.1f} s simuliert")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,19 +11,23 @@ Drücke einfach die Tasten (kein Enter nötig!):
 import sys
 import tty
 import termios
-import subprocess
-import threading
-import time
 from queue import Queue
 
+from command_history import CommandHistory
+from command_scheduler import CommandScheduler
+from hub_session import HubSession
+from reconnect import ReconnectSupervisor
+
 
 class SimpleRobotController:
     """Einfacher Terminal-Controller mit direkter Tasteneingabe."""
     
-    def __init__(self):
+    def __init__(self, transport=None):
         self.running = True
         self.command_queue = Queue()
-        self.process = None
+        self.session = HubSession(transport=transport)
+        self.supervisor = ReconnectSupervisor(self.session)
+        self.scheduler = CommandScheduler(self.session)
         
     def get_key(self):
         """Liest eine Taste ohne Enter."""
@@ -70,15 +74,12 @@ class SimpleRobotController:
         print("Letzte Befehle: ", end="", flush=True)
     
     def send_to_robot(self, command):
-        """Sendet Befehl zum Roboter über pybricksdev."""
-        if self.process and self.process.poll() is None:
-            try:
-                # Sende Python-Befehl zum laufenden Programm
-                cmd = f"execute_command('{command}')\n"
-                self.process.stdin.write(cmd)
-                self.process.stdin.flush()
-            except:
-                pass
+        """Sendet Befehl zum Roboter über die offene Bluetooth-Verbindung.
+        
+        Tasten-Wiederholungen werden vom Scheduler zusammengefasst. Gibt
+        zurück, ob der Scheduler den Befehl angenommen hat.
+        """
+        return self.scheduler.submit(command)
     
     def start_robot_connection(self):
         """Startet die Verbindung zum Roboter."""
@@ -86,22 +87,9 @@ class SimpleRobotController:
         print("   (Das kann einen Moment dauern...)")
         
         try:
-            # Starte pybricksdev im interaktiven Modus
-            self.process = subprocess.Popen(
-                ['uv', 'run', 'pybricksdev', 'run', 'ble', 'src/main.py', '--wait'],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1
-            )
-            
-            # Warte kurz
-            time.sleep(3)
-            
-            if self.process.poll() is None:
+            # Verbinden und warten, bis das Programm auf dem Hub bereit ist
+            if self.session.connect():
                 print("✅ Roboter verbunden!\n")
-                time.sleep(1)
                 return True
             else:
                 print("❌ Verbindung fehlgeschlagen")
@@ -131,7 +119,7 @@ class SimpleRobotController:
             'm': '📏 Dist'
         }
         
-        command_history = []
+        command_history = CommandHistory(capacity=15)
         
         try:
             while self.running:
@@ -149,8 +137,6 @@ class SimpleRobotController:
                     
                     # Füge zu Historie hinzu
                     command_history.append(label)
-                    if len(command_history) > 15:
-                        command_history.pop(0)
                     
                     # Zeige in der letzten Zeile
                     print(f"[{label}] ", end="", flush=True)
@@ -161,9 +147,11 @@ class SimpleRobotController:
         except KeyboardInterrupt:
             print("\n\n⚠️ Unterbrochen")
         finally:
-            if self.process:
-                self.process.terminate()
-            print("\n\n👋 Controller beendet\n")
+            self.session.disconnect()
+            stats = self.scheduler.stats()
+            print(f"\n\n📊 Gesendet: {stats['sent']}, zusammengefasst: {stats['merged']}, "
+                  f"verworfen: {stats['dropped']}, fehlgeschlagen: {stats['failed']}")
+            print("\n👋 Controller beendet\n")
 
 
 def main():
@@ -3,77 +3,228 @@ Web-Interface für Lego Mindstorms Roboter-Steuerung.
 
 Startet einen Webserver auf http://localhost:5000
 Steuere den Roboter über Browser mit Maus oder Tastatur!
+
+Die Seite hält eine WebSocket-Verbindung (/ws) offen: Befehle gehen darüber
+zum Server, Status, Befehlshistorie und Sensorwerte kommen darüber zurück.
+Die Telemetrie des Hubs (Abstand, Motorwinkel und -geschwindigkeiten) gibt
+es als Server-Sent-Events unter /api/telemetry.
+
+Reißt die Verbindung zum Hub ab, verbindet der Server selbst neu (siehe
+reconnect.py); Befehle werden so lange zurückgehalten.
+
+Es können beliebig viele Browser zuschauen, steuern darf aber immer nur
+einer: Der erste Client, der einen Befehl schickt, wird Fahrer, alle anderen
+sind Zuschauer, bis der Fahrer die Seite schließt oder die Steuerung abgibt.
+
+Mit --fleet steuert derselbe Server zusätzlich mehrere Roboter (siehe
+fleet.py), angesprochen über ihren Hub-Namen:
+- GET  /api/fleet                  Zustand und Antwortzeiten aller Roboter
+- POST /api/fleet/connect          alle Roboter gleichzeitig verbinden
+- POST /api/fleet/command          Befehl an alle, z. B. {"command": "x"}
+- POST /api/fleet/<name>/command   Befehl an einen Roboter
 """
 
-from flask import Flask, render_template, jsonify, request
-import subprocess
+from flask import Flask, Response, render_template, jsonify, request
+from flask_sock import Sock
+import atexit
+import json
+import queue
 import threading
 import time
-from pathlib import Path
+
+from command_history import CommandHistory
+from command_scheduler import STOP_COMMANDS, CommandScheduler
+from fleet import Fleet
+from hub_session import HubSession, simulated_transport
+from hub_events import EVENT_DISTANCE, EVENT_REFLEX, EVENT_TELEMETRY
+from protocol import COMMAND_OPCODES, OP_TELEMETRY
+from reconnect import ReconnectSupervisor
+from recording import Recorder
 
 app = Flask(__name__)
+sock = Sock(app)
+
+command_history = CommandHistory()
+HISTORY_WINDOW = 10     # Einträge, die der Browser anzeigt
+
+STATUS_INTERVAL = 1.0   # s zwischen zwei Status-Prüfungen für die WebSockets
+TELEMETRY_RATE = 10     # Telemetrie-Zeilen pro Sekunde, solange jemand zuschaut
+SSE_KEEPALIVE = 15.0    # s ohne Daten, nach denen ein Kommentar gesendet wird
+
+NOT_DRIVER = 'Ein anderer Browser steuert gerade'
+
+
+class Broadcaster:
+    """Verteilt Nachrichten an alle offenen WebSocket-Verbindungen."""
+    
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._clients = set()
+        self._lock = threading.Lock()
+    
+    def subscribe(self):
+        """Meldet einen Client an und gibt seine Nachrichten-Queue zurück."""
+        client = queue.Queue(self.maxsize)
+        with self._lock:
+            self._clients.add(client)
+        return client
+    
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+    
+    @property
+    def has_clients(self):
+        return bool(self._clients)
+    
+    def publish(self, message):
+        """Schickt message an alle Clients, ohne zu blockieren."""
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                # Zu langsamer Client - Nachricht für ihn verwerfen
+                pass
+
+
+events = Broadcaster()
+telemetry_feed = Broadcaster()
+
+
+class ClientRegistry:
+    """Merkt sich die verbundenen Browser und wer von ihnen steuert.
+    
+    Jeder Browser schickt eine eigene Client-ID mit (WebSocket-Parameter
+    bzw. Feld "client" bei /api/command). Nur der Fahrer darf Befehle senden.
+    """
+    
+    def __init__(self):
+        self.driver = None
+        self._clients = {}   # Client-ID -> Nachrichten-Queue
+        self._lock = threading.Lock()
+    
+    def register(self, client_id, messages):
+        with self._lock:
+            self._clients[client_id] = messages
+    
+    def unregister(self, client_id):
+        """Meldet einen Client ab; war er Fahrer, wird die Steuerung frei."""
+        with self._lock:
+            self._clients.pop(client_id, None)
+            released = self.driver == client_id
+            if released:
+                self.driver = None
+        if released:
+            self._announce()
+    
+    def role(self, client_id):
+        return 'driver' if client_id == self.driver else 'observer'
+    
+    def claim(self, client_id):
+        """Macht client_id zum Fahrer, falls gerade niemand steuert.
+        
+        Ein Fahrer ohne offenen WebSocket (nur HTTP) hält die Steuerung nicht fest.
+        """
+        with self._lock:
+            if self.driver != client_id and self.driver in self._clients:
+                return False
+            changed = self.driver != client_id
+            self.driver = client_id
+        if changed:
+            self._announce()
+        return True
+    
+    def release(self, client_id):
+        """Gibt die Steuerung ab (nur der Fahrer selbst)."""
+        with self._lock:
+            if self.driver != client_id:
+                return
+            self.driver = None
+        self._announce()
+    
+    @property
+    def count(self):
+        return len(self._clients)
+    
+    def _announce(self):
+        # Jedem WebSocket-Client seine (neue) Rolle mitteilen
+        with self._lock:
+            clients = list(self._clients.items())
+        for client_id, messages in clients:
+            try:
+                messages.put_nowait({'type': 'role', 'role': self.role(client_id)})
+            except queue.Full:
+                pass
 
-# Globale Variablen
-robot_process = None
-robot_connected = False
-command_history = []
+
+clients = ClientRegistry()
 
 
 class RobotController:
     """Verwaltet die Verbindung zum Roboter."""
     
-    def __init__(self):
-        self.process = None
-        self.connected = False
+    def __init__(self, transport=None, record=None):
+        self.session = HubSession(transport=transport)
+        # Aufzeichnung der Fahrt (siehe recording.py), beginnt beim ersten Verbinden
+        self.record_path = record
+        self.recorder = None
+        self.supervisor = ReconnectSupervisor(self.session)
+        self.scheduler = CommandScheduler(self.session)
+        self.session.events.subscribe(self._on_event, EVENT_TELEMETRY, EVENT_REFLEX, EVENT_DISTANCE)
+        self.telemetry_rate = 0
+        self._telemetry_lock = threading.Lock()
+    
+    def update_telemetry_rate(self, force=False):
+        """Schaltet die Telemetrie des Hubs ein, solange SSE-Clients zuhören."""
+        rate = TELEMETRY_RATE if telemetry_feed.has_clients else 0
+        with self._telemetry_lock:
+            if (rate != self.telemetry_rate or force) and self.connected:
+                self.session.send_frame(OP_TELEMETRY, rate)
+            self.telemetry_rate = rate
+    
+    def _on_event(self, event):
+        """Leitet Sensorwerte aus der Ausgabe des Hubs an die Browser weiter."""
+        kind = event['type']
+        if kind == EVENT_TELEMETRY:
+            # Einmal serialisieren, egal wie viele Clients zuhören
+            telemetry_feed.publish(f"data: {json.dumps(event)}\n\n")
+        elif kind == EVENT_REFLEX:
+            # Der Hub hat vor einem Hindernis gebremst
+            events.publish({'type': 'reflex', 'distance': event['distance']})
+        elif event['distance'] is not None:
+            events.publish({'type': 'sensor', 'distance': event['distance']})
+    
+    @property
+    def connected(self):
+        return self.session.connected
         
     def connect(self):
-        """Startet die Verbindung zum Roboter."""
-        try:
-            self.process = subprocess.Popen(
-                ['uv', 'run', 'pybricksdev', 'run', 'ble', 'src/main.py', '--wait'],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                cwd=Path(__file__).parent.parent
-            )
-            
-            # Warte auf Verbindung
-            time.sleep(3)
-            
-            if self.process.poll() is None:
-                self.connected = True
-                return True
-            return False
-            
-        except Exception as e:
-            print(f"Verbindungsfehler: {e}")
+        """Verbindet mit dem Roboter und wartet, bis das Programm bereit ist."""
+        if not self.session.connect():
             return False
+        if self.record_path and self.recorder is None:
+            self.recorder = Recorder(self.record_path, self.session)
+            atexit.register(self.recorder.close)
+            print(f"⏺  Zeichne auf in {self.record_path}")
+        return True
     
     def send_command(self, cmd):
-        """Sendet einen Befehl an den Roboter."""
-        if self.connected and self.process:
-            try:
-                command = f"execute_command('{cmd}')\n"
-                self.process.stdin.write(command)
-                self.process.stdin.flush()
-                return True
-            except:
-                self.connected = False
-                return False
-        return False
+        """Sendet einen Befehl an den Roboter (zusammengefasst und gedrosselt)."""
+        return self.scheduler.submit(cmd)
     
     def disconnect(self):
         """Trennt die Verbindung."""
-        if self.process:
-            self.process.terminate()
-            self.connected = False
+        self.session.disconnect()
 
 
 # Globaler Controller
 controller = RobotController()
 
+# Weitere Roboter, nur mit --fleet
+fleet = Fleet()
+
 
 @app.route('/')
 def index():
@@ -81,13 +232,69 @@ def index():
     return render_template('index.html')
 
 
+def status_payload():
+    """Aktueller Status für /api/status und die WebSockets."""
+    return {
+        'connected': controller.connected,
+        'available': controller.session.available,
+        'reconnect': controller.supervisor.stats(),
+        'driver': clients.driver is not None,
+        'clients': clients.count,
+        'link': controller.session.acks.stats(),
+        'scheduler': controller.scheduler.stats()
+    }
+
+
+def publish_status():
+    events.publish({'type': 'status', **status_payload()})
+
+
+def submit_command(cmd, client_id=None):
+    """Sendet einen Befehl und trägt ihn in die Historie ein.
+    
+    Stop ('x') darf jeder senden, alle anderen Befehle nur der Fahrer.
+    Gibt (success, message) zurück.
+    """
+    if cmd not in COMMAND_OPCODES:
+        return False, f'Unbekannter Befehl "{cmd}"'
+    if not controller.session.available:
+        return False, 'Nicht verbunden'
+    if cmd not in STOP_COMMANDS and not clients.claim(client_id):
+        return False, NOT_DRIVER
+    
+    if controller.send_command(cmd):
+        entry = command_history.append(cmd)
+        events.publish({'type': 'history', 'entry': entry})
+        return True, f'Befehl "{cmd}" gesendet'
+    return False, 'Fehler beim Senden'
+
+
+def submit_fleet_command(cmd, client_id=None, name=None):
+    """Wie submit_command, aber an den Roboter name der Flotte (None = an alle).
+    
+    Gibt (success, message, angenommen je Roboter) zurück.
+    """
+    if cmd not in COMMAND_OPCODES:
+        return False, f'Unbekannter Befehl "{cmd}"', {}
+    if cmd not in STOP_COMMANDS and not clients.claim(client_id):
+        return False, NOT_DRIVER, {}
+    if name is None:
+        accepted = fleet.broadcast(cmd)
+    else:
+        accepted = {name: fleet.send_command(name, cmd)}
+    if not any(accepted.values()):
+        return False, 'Nicht verbunden', accepted
+    entry = command_history.append(cmd, robot=name or '*')
+    events.publish({'type': 'history', 'entry': entry})
+    return True, f'Befehl "{cmd}" gesendet', accepted
+
+
 @app.route('/api/connect', methods=['POST'])
 def connect():
     """Verbindet mit dem Roboter."""
-    global robot_connected
-    
     if controller.connect():
-        robot_connected = True
+        controller.update_telemetry_rate(force=True)
+        publish_status()
         return jsonify({'success': True, 'message': 'Roboter verbunden!'})
     else:
         return jsonify({'success': False, 'message': 'Verbindung fehlgeschlagen'}), 500
@@ -96,44 +303,184 @@ def connect():
 @app.route('/api/disconnect', methods=['POST'])
 def disconnect():
     """Trennt die Verbindung."""
-    global robot_connected
-    
     controller.disconnect()
-    robot_connected = False
+    publish_status()
     return jsonify({'success': True, 'message': 'Verbindung getrennt'})
 
 
 @app.route('/api/status')
 def status():
-    """Status der Verbindung."""
-    return jsonify({
-        'connected': controller.connected,
-        'history': command_history[-10:]  # Letzte 10 Befehle
-    })
+    """Status der Verbindung.
+    
+    Mit ?since=<seq> enthält 'history' nur die Befehle nach seq, sonst die
+    letzten HISTORY_WINDOW.
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        history = command_history.last(HISTORY_WINDOW)
+    else:
+        history = command_history.since(since)
+    return jsonify({**status_payload(), 'history': history})
 
 
 @app.route('/api/command', methods=['POST'])
 def command():
     """Sendet einen Befehl an den Roboter."""
     data = request.json
-    cmd = data.get('command', '')
-    
-    if not controller.connected:
-        return jsonify({'success': False, 'message': 'Nicht verbunden'}), 400
+    success, message = submit_command(data.get('command', ''), data.get('client'))
     
-    if controller.send_command(cmd):
-        # Füge zu Historie hinzu
-        command_history.append({
-            'command': cmd,
-            'time': time.strftime('%H:%M:%S')
-        })
-        
-        return jsonify({'success': True, 'message': f'Befehl "{cmd}" gesendet'})
+    if success:
+        return jsonify({'success': True, 'message': message})
+    if not controller.session.available:
+        code = 400
+    elif message == NOT_DRIVER:
+        code = 409
     else:
-        return jsonify({'success': False, 'message': 'Fehler beim Senden'}), 500
+        code = 500
+    return jsonify({'success': False, 'message': message}), code
+
+
+@app.route('/api/fleet')
+def fleet_status():
+    """Zustand, Antwortzeiten und Wiederverbindungen aller Roboter der Flotte."""
+    return jsonify({'robots': fleet.health()})
+
+
+@app.route('/api/fleet/connect', methods=['POST'])
+def fleet_connect():
+    """Verbindet alle Roboter der Flotte gleichzeitig."""
+    results = fleet.connect()
+    return jsonify({'success': all(results.values()), 'results': results})
+
+
+@app.route('/api/fleet/command', methods=['POST'])
+@app.route('/api/fleet/<name>/command', methods=['POST'])
+def fleet_command(name=None):
+    """Sendet einen Befehl an einen Roboter der Flotte oder an alle."""
+    if name is not None and name not in fleet:
+        return jsonify({'success': False, 'message': f'Unbekannter Roboter "{name}"'}), 404
+    data = request.json
+    success, message, accepted = submit_fleet_command(data.get('command', ''), data.get('client'), name)
+    
+    if success:
+        return jsonify({'success': True, 'message': message, 'robots': accepted})
+    code = 409 if message == NOT_DRIVER else 400
+    return jsonify({'success': False, 'message': message, 'robots': accepted}), code
+
+
+@sock.route('/ws')
+def websocket(ws):
+    """Dauerhafter Kanal zum Browser.
+    
+    Der Browser gibt seine Client-ID als Parameter an (/ws?client=...).
+    Von ihm kommen Befehle als {"type": "command", "command": "w"} sowie
+    {"type": "release"}, um die Steuerung abzugeben. Zum Browser gehen
+    Nachrichten vom Typ "status", "history", "sensor", "role" und "error".
+    """
+    client_id = request.args.get('client') or f'ws-{id(ws)}'
+    client = events.subscribe()
+    clients.register(client_id, client)
+    
+    def sender():
+        # Eigener Thread, damit ws.receive() im Handler blockieren darf
+        while True:
+            message = client.get()
+            if message is None:
+                break
+            try:
+                ws.send(json.dumps(message))
+            except Exception:
+                break
+    
+    # Startzustand: Status, die letzten Befehle und die eigene Rolle
+    client.put({'type': 'status', **status_payload(), 'history': command_history.last(HISTORY_WINDOW)})
+    client.put({'type': 'role', 'role': clients.role(client_id)})
+    sender_thread = threading.Thread(target=sender, daemon=True)
+    sender_thread.start()
+    
+    try:
+        while True:
+            try:
+                data = json.loads(ws.receive())
+            except ValueError:
+                continue
+            if data.get('type') == 'command':
+                success, message = submit_command(data.get('command', ''), client_id)
+                if not success:
+                    client.put({'type': 'error', 'message': message})
+            elif data.get('type') == 'release':
+                clients.release(client_id)
+    finally:
+        clients.unregister(client_id)
+        events.unsubscribe(client)
+        try:
+            client.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+@app.route('/api/telemetry')
+def telemetry_stream():
+    """Telemetrie als Server-Sent-Events.
+    
+    Alle Clients hängen an derselben Telemetrie des Hubs; sie wird nur
+    eingeschaltet, solange mindestens ein Client zuhört.
+    """
+    client = telemetry_feed.subscribe()
+    controller.update_telemetry_rate()
+    
+    def generate():
+        try:
+            while True:
+                try:
+                    yield client.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            telemetry_feed.unsubscribe(client)
+            controller.update_telemetry_rate()
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+def status_publisher():
+    """Schickt den Status an die WebSockets, wenn er sich geändert hat."""
+    last = None
+    while True:
+        time.sleep(STATUS_INTERVAL)
+        if not events.has_clients:
+            continue
+        payload = status_payload()
+        if payload != last:
+            events.publish({'type': 'status', **payload})
+            last = payload
+
+
+threading.Thread(target=status_publisher, daemon=True).start()
 
 
 if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Web-Interface für den Roboter")
+    parser.add_argument('--simulator', action='store_true',
+                        help="Simulierten Hub statt echtem Roboter verwenden")
+    parser.add_argument('--telemetry-rate', type=int, default=TELEMETRY_RATE,
+                        help="Telemetrie-Zeilen pro Sekunde (Standard: %(default)s)")
+    parser.add_argument('--record', metavar='DATEI',
+                        help="Befehle und Telemetrie aufzeichnen (siehe recording.py)")
+    parser.add_argument('--fleet', nargs='+', default=[], metavar='HUB',
+                        help="weitere Roboter nach Hub-Namen, steuerbar über /api/fleet")
+    args = parser.parse_args()
+    TELEMETRY_RATE = args.telemetry_rate
+    
+    transport = simulated_transport if args.simulator else None
+    if args.simulator or args.record:
+        controller = RobotController(transport=transport, record=args.record)
+    for name in args.fleet:
+        fleet.add(name, transport=transport)
+    
     print("\n" + "="*70)
     print("🤖 LEGO MINDSTORMS WEB-INTERFACE".center(70))
     print("="*70)